@@ -0,0 +1,203 @@
+# ml_scripts/async_collector.py
+"""
+asyncio variant of daily_collector.py.
+
+One event loop runs three stages connected by bounded queues
+(config.ASYNC_COLLECTOR_QUEUE_SIZE), so downloads, feature computation and
+database writes overlap instead of alternating per ticker:
+
+    fetch     downloads in a thread pool (rate-limited, MARKET_DATA_MAX_WORKERS at a time)
+    features  daily_collector.prepare_records in a worker thread
+    write     upserts through PyMongo's asyncio client (AsyncMongoWriter)
+
+A full queue suspends the stage feeding it, which bounds the memory held by
+downloaded frames. Outcomes, --jsonl events and --resume work as in
+daily_collector (CollectionRun). With the "npy" backend, or in tests against
+mongomock, ThreadedWriter runs the synchronous db_handler writes in a thread.
+
+    python3 ml_scripts/async_collector.py [--jsonl] [--resume]
+"""
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import config
+import metrics
+import startup_profile
+from startup_profile import lazy_module
+
+db_handler = lazy_module("db_handler")
+daily_collector = lazy_module("daily_collector")
+incremental_features = lazy_module("incremental_features")
+market_data = lazy_module("market_data")
+scaled_windows = lazy_module("scaled_windows")
+
+class AsyncMongoWriter:
+    """
+    Record and state writes through pymongo.AsyncMongoClient: the upserts, retry policy and
+    cache invalidation of save_data_to_db. `database` is the synchronous client's database,
+    whose prediction cache is invalidated after each write (db_handler.written).
+    """
+
+    def __init__(self, database, uri: str = config.MONGO_URI):
+        from pymongo import AsyncMongoClient
+
+        self.client = AsyncMongoClient(
+            uri,
+            maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+            minPoolSize=config.MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=config.MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=config.MONGO_SOCKET_TIMEOUT_MS,
+        )
+        self.database = database
+        async_database = self.client[config.DATABASE_NAME]
+        self.collection = async_database[config.COLLECTION_NAME]
+        self.states = async_database[config.FEATURE_STATE_COLLECTION]
+
+    async def save(self, records, chunk_size=config.DB_WRITE_CHUNK_SIZE, max_retries=config.DB_WRITE_MAX_RETRIES) -> int:
+        """Upserts the records in unordered bulk writes. Returns the number of new records."""
+        upsert_count = 0
+        with metrics.timer("db_write_seconds", driver="async"):
+            for start in range(0, len(records), chunk_size):
+                operations = db_handler.upsert_operations(records[start:start + chunk_size])
+                for attempt in range(max_retries + 1):
+                    try:
+                        result = await self.collection.bulk_write(operations, ordered=False)
+                        upsert_count += result.upserted_count
+                        break
+                    except db_handler.RETRYABLE_WRITE_ERRORS as e:
+                        upsert_count += db_handler.upserted_before_failure(e)
+                        await asyncio.sleep(db_handler.retry_delay(e, attempt, max_retries))
+            await asyncio.to_thread(db_handler.written, self.database,
+                                    {record["ticker"] for record in records}, upsert_count)
+        return upsert_count
+
+    async def save_state(self, state: dict):
+        await self.states.replace_one({"ticker": state["ticker"]}, state, upsert=True)
+
+    async def close(self):
+        await self.client.close()
+
+class ThreadedWriter:
+    """The synchronous db_handler writes, run in a worker thread (npy backend, mongomock)."""
+
+    def __init__(self, collection, state_collection):
+        self.collection = collection
+        self.state_collection = state_collection
+
+    async def save(self, records) -> int:
+        return await asyncio.to_thread(db_handler.save_data_to_db, self.collection, records)
+
+    async def save_state(self, state: dict):
+        await asyncio.to_thread(incremental_features.save_state, self.state_collection, state)
+
+    async def close(self):
+        pass
+
+async def collect_latest_data_async(source=None, events=None, resume=False, writer=None):
+    """
+    Async counterpart of daily_collector.collect_latest_data (same arguments).
+    `writer` defaults to AsyncMongoWriter, or ThreadedWriter with the "npy" backend.
+    """
+    print("--- Starting Daily Data Collection (async) ---")
+    print("📋 Model Features: ['Close', 'Volume', 'RSI_14', 'MACD_12_26_9', 'volatility_20d']")
+
+    run = daily_collector.CollectionRun(events, resume)
+    # States are read once up front and the scaled windows refreshed at the end, on the sync client.
+    collection = db_handler.get_db_collection()
+    state_collection = incremental_features.get_state_collection(collection.database)
+    states = incremental_features.load_states(state_collection, run.tickers)
+    start_date, full_start_date = daily_collector.fetch_start_dates(states, run.tickers)
+    if writer is None:
+        writer = (ThreadedWriter(collection, state_collection) if collection.database is None
+                  else AsyncMongoWriter(collection.database))
+
+    loop = asyncio.get_running_loop()
+    fetched = asyncio.Queue(maxsize=config.ASYNC_COLLECTOR_QUEUE_SIZE)
+    prepared = asyncio.Queue(maxsize=config.ASYNC_COLLECTOR_QUEUE_SIZE)
+    limiter = market_data.TokenBucket(config.MARKET_DATA_RATE_LIMIT, config.MARKET_DATA_BURST)
+    slots = asyncio.Semaphore(config.MARKET_DATA_MAX_WORKERS)
+
+    def download(ticker):
+        limiter.acquire()
+        with metrics.timer("market_data_fetch_seconds"):
+            return market_data.fetch_history(ticker, start=start_date, source=source)
+
+    async def fetch(executor, ticker):
+        # The slot is held until the frame is queued: a full queue stops new downloads.
+        async with slots:
+            try:
+                item = (ticker, await loop.run_in_executor(executor, download, ticker), None)
+            except Exception as e:
+                metrics.inc("market_data_fetch_errors_total", ticker=ticker)
+                item = (ticker, None, e)
+            await fetched.put(item)
+
+    async def fetch_stage():
+        with ThreadPoolExecutor(max_workers=config.MARKET_DATA_MAX_WORKERS) as executor:
+            await asyncio.gather(*(fetch(executor, ticker) for ticker in run.tickers))
+        await fetched.put(None)
+
+    async def feature_stage():
+        while (item := await fetched.get()) is not None:
+            ticker, stock_data, fetch_error = item
+            print(f"📈 Processing {ticker}...")
+            try:
+                if fetch_error is not None:
+                    raise fetch_error
+                records, state, failure = await asyncio.to_thread(
+                    daily_collector.prepare_records, ticker, stock_data, states.get(ticker), full_start_date, source)
+            except Exception as e:
+                print(f"❌ Error processing {ticker}: {e}")
+                run.report(ticker, "failed", message=str(e))
+                continue
+            if failure:
+                print(f"❌ {failure} for {ticker}")
+                run.report(ticker, "failed", message=failure)
+            elif not records:
+                print(f"ℹ️  No new records to save for {ticker}")
+                run.report(ticker, "success")
+            else:
+                await prepared.put((ticker, records, state))
+        await prepared.put(None)
+
+    async def write_stage():
+        while (item := await prepared.get()) is not None:
+            ticker, records, state = item
+            try:
+                new_records_count = await writer.save(records)
+                await writer.save_state(state)
+            except Exception as e:
+                print(f"❌ Error processing {ticker}: {e}")
+                run.report(ticker, "failed", message=str(e))
+                continue
+            if new_records_count > 0:
+                print(f"✅ Saved {new_records_count} new record(s) for {ticker}")
+            else:
+                print(f"ℹ️  No new records to save for {ticker}")
+            run.report(ticker, "success", new_records_count)
+
+    try:
+        with startup_profile.phase("pipeline"):
+            await asyncio.gather(fetch_stage(), feature_stage(), write_stage())
+    finally:
+        await writer.close()
+
+    # Ready-to-use scaled model inputs for the tickers whose data is now current.
+    with startup_profile.phase("db_write"):
+        await asyncio.to_thread(scaled_windows.refresh, collection, sorted(run.completed))
+    return run.finish()
+
+if __name__ == "__main__":
+    # Same flags as daily_collector.py (--jsonl, --resume, --profile-startup, --metrics).
+    args = metrics.enable_from_argv(startup_profile.enable_from_argv(sys.argv[1:]))
+    events = None
+    if "--jsonl" in args:
+        events, sys.stdout = sys.stdout, sys.stderr
+
+    print(f"🚀 Daily Stock Data Collection (async) - {datetime.now():%Y-%m-%d %H:%M:%S}")
+    asyncio.run(collect_latest_data_async(events=events, resume="--resume" in args))
+    startup_profile.emit()
+    metrics.emit()
@@ -0,0 +1,355 @@
+# ml_scripts/backtest.py
+"""
+Walk-forward backtest of the GRU model over the stored feature history.
+
+The history of every ticker is read once (db_handler.fetch_feature_history) and
+scaled once; every LOOKBACK_PERIOD window is then a strided view into it
+(sliding_window_view, no copies). Windows are scored in batches of
+BACKTEST_BATCH_SIZE on a thread pool, and each batch is rolled forward
+`forecast_days` steps like predict.make_multistep_forecast_batch, with the
+indicator state of every window origin held in arrays instead of dicts.
+
+Reported per ticker and overall:
+    mae, rmse, mape_pct      next-day Close error (step 1 of the rollout)
+    direction_accuracy       share of windows where the predicted move has the actual sign
+    best_day_hit_rate        share of windows where main.generate_recommendation's
+                             "best day to buy" is the cheapest of the next forecast_days bars
+    best_day_regret_pct      mean extra cost of buying on that day instead of the cheapest
+
+Steps are trading days (stored bars), whereas format_recommendation labels them
+with calendar days. Indicator states are replayed from each ticker's first stored
+bar, as incremental_features.state_from_history would do for that history.
+
+    python3 ml_scripts/backtest.py [--tickers T ...] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+                                   [--forecast-days N] [--workers N] [--model-version V] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import config
+import metrics
+import startup_profile
+from startup_profile import lazy_module
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+db_handler = lazy_module("db_handler")
+incremental_features = lazy_module("incremental_features")
+model_registry = lazy_module("model_registry")
+stride_tricks = lazy_module("numpy.lib.stride_tricks")
+
+def indicator_states(close: "np.ndarray") -> dict:
+    """
+    Incremental indicator state after every bar of a Close series, as arrays of length n
+    (the state update_state would hold after folding in bars 0..t), plus the returns.
+    """
+    alpha = 1.0 / incremental_features.RSI_LENGTH
+    change = pd.Series(np.diff(close, prepend=np.nan))
+    # pandas_ta rma of gains/losses; NaN after bar 0, whose state holds no change yet.
+    gain = change.clip(lower=0).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    loss = (-change).clip(lower=0).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+    def ema(length):
+        # pandas_ta ema: SMA of the first `length` closes, then ewm(span=length, adjust=False).
+        values = np.full(len(close), np.nan)
+        if len(close) >= length:
+            seeded = pd.Series(np.r_[close[:length].mean(), close[length:]])
+            values[length - 1:] = seeded.ewm(span=length, adjust=False).mean().to_numpy()
+        return values
+
+    return {
+        "avg_gain": gain, "avg_loss": loss,
+        "fast": ema(incremental_features.MACD_FAST), "slow": ema(incremental_features.MACD_SLOW),
+        "returns": close[1:] / close[:-1] - 1,  # returns[k] is the return of bar k + 1
+    }
+
+def rollout(model, X: "np.ndarray", last_rows: "np.ndarray", state: dict,
+            scale: "np.ndarray", offset: "np.ndarray", forecast_days: int,
+            features_to_use=config.FEATURES_TO_USE, target_column=config.TARGET_COLUMN) -> "np.ndarray":
+    """
+    make_multistep_forecast_batch over a batch of windows of any tickers: X is the scaled
+    (B, LOOKBACK_PERIOD, n_features) batch, last_rows the raw last bars, state the per-window
+    indicator arrays (see window_states) and scale/offset the per-window scaler rows.
+    Returns the (B, forecast_days) forecasted prices.
+    """
+    col = {name: i for i, name in enumerate(features_to_use)}
+    target_index = col[target_column]
+    alpha_rsi = 1.0 / incremental_features.RSI_LENGTH
+    alpha_fast = 2.0 / (incremental_features.MACD_FAST + 1)
+    alpha_slow = 2.0 / (incremental_features.MACD_SLOW + 1)
+    avg_gain, avg_loss = state["avg_gain"], state["avg_loss"]
+    fast, slow, returns = state["fast"], state["slow"], state["returns"]
+    last_close = last_rows[:, col['Close']]
+
+    forecasts = np.empty((len(X), forecast_days))
+    for step in range(forecast_days):
+        scaled_prediction = np.asarray(model.predict_on_batch(X))[:, 0]
+        prices = (scaled_prediction - offset[:, target_index]) / scale[:, target_index]
+        forecasts[:, step] = prices
+
+        # Same synthetic bar as predict.py, with incremental_features' updates vectorized.
+        change = prices - last_close
+        avg_gain = alpha_rsi * np.maximum(change, 0.0) + (1 - alpha_rsi) * avg_gain
+        avg_loss = alpha_rsi * np.maximum(-change, 0.0) + (1 - alpha_rsi) * avg_loss
+        total = avg_gain + avg_loss
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rsi = np.where(total > 0, 100.0 * avg_gain / total, np.nan)
+        returns = np.concatenate([returns[:, 1:], (prices / last_close - 1)[:, np.newaxis]], axis=1)
+        fast = alpha_fast * prices + (1 - alpha_fast) * fast
+        slow = alpha_slow * prices + (1 - alpha_slow) * slow
+        indicators = {"RSI_14": rsi, "MACD_12_26_9": fast - slow, "volatility_20d": returns.std(axis=1, ddof=1)}
+
+        next_rows = last_rows.copy()
+        next_rows[:, target_index] = prices
+        for name, values in indicators.items():
+            if name in col:
+                next_rows[:, col[name]] = np.where(np.isnan(values), next_rows[:, col[name]], values)
+        last_rows, last_close = next_rows, prices
+
+        scaled_rows = (next_rows * scale + offset).astype(X.dtype)
+        X = np.concatenate([X[:, 1:, :], scaled_rows[:, np.newaxis, :]], axis=1)
+    return forecasts
+
+class TickerHistory:
+    """One ticker's stored history, scaled once, with its windows as strided views."""
+
+    def __init__(self, ticker, dates, values, scale, offset, lookback=config.LOOKBACK_PERIOD):
+        self.ticker = ticker
+        self.dates = np.asarray(dates)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.close = self.values[:, config.FEATURES_TO_USE.index('Close')]
+        self.scale, self.offset = scale, offset
+        self.lookback = lookback
+        scaled = (self.values * scale + offset).astype(np.float32)
+        # (n - lookback + 1, lookback, n_features); window w ends at bar w + lookback - 1.
+        self.windows = stride_tricks.sliding_window_view(scaled, lookback, axis=0).transpose(0, 2, 1)
+        self.states = indicator_states(self.close)
+
+    def origins(self, start=None, end=None) -> range:
+        """Windows whose last bar falls in [start, end] and has a next bar to compare with."""
+        last_bars = self.dates[self.lookback - 1:-1]
+        first = 0 if start is None else int(np.searchsorted(last_bars, np.datetime64(start)))
+        stop = len(last_bars) if end is None else int(np.searchsorted(last_bars, np.datetime64(end), side="right"))
+        return range(first, max(first, stop))
+
+    def window_states(self, w0: int, w1: int) -> dict:
+        """Indicator state at the last bar of windows w0..w1-1."""
+        bars = slice(w0 + self.lookback - 1, w1 + self.lookback - 1)
+        returns = stride_tricks.sliding_window_view(self.states["returns"], incremental_features.VOLATILITY_WINDOW)
+        # The last VOLATILITY_WINDOW returns up to bar t are returns[t - VOLATILITY_WINDOW : t].
+        first = w0 + self.lookback - 1 - incremental_features.VOLATILITY_WINDOW
+        state = {name: self.states[name][bars] for name in ("avg_gain", "avg_loss", "fast", "slow")}
+        state["returns"] = returns[first:first + (w1 - w0)]
+        return state
+
+def _score_batch(model, segments, forecast_days):
+    """Rolls one batch of (history, w0, w1) window segments forward; returns their forecasts."""
+    parts = [(history, history.window_states(w0, w1), w0, w1) for history, w0, w1 in segments]
+    X = np.concatenate([history.windows[w0:w1] for history, _, w0, w1 in parts])
+    last_rows = np.concatenate([history.values[w0 + history.lookback - 1:w1 + history.lookback - 1]
+                                for history, _, w0, w1 in parts])
+    state = {name: np.concatenate([s[name] for _, s, _, _ in parts]) for name in parts[0][1]}
+    scale = np.concatenate([np.broadcast_to(h.scale, (w1 - w0, len(h.scale))) for h, _, w0, w1 in parts])
+    offset = np.concatenate([np.broadcast_to(h.offset, (w1 - w0, len(h.offset))) for h, _, w0, w1 in parts])
+    with metrics.timer("backtest_batch_seconds"):
+        return rollout(model, X, last_rows, state, scale, offset, forecast_days)
+
+def _batches(jobs, batch_size):
+    """Packs each ticker's origin range into batches of at most batch_size windows."""
+    batch, size = [], 0
+    for history, origins in jobs:
+        w0 = origins.start
+        while w0 < origins.stop:
+            w1 = min(origins.stop, w0 + batch_size - size)
+            batch.append((history, w0, w1))
+            size += w1 - w0
+            w0 = w1
+            if size == batch_size:
+                yield batch
+                batch, size = [], 0
+    if batch:
+        yield batch
+
+def score_metrics(history: TickerHistory, origins: range, forecasts: "np.ndarray") -> dict:
+    """Error metrics and best-day hit rate of one ticker's forecasts (rows = origins)."""
+    bars = np.arange(origins.start, origins.stop) + history.lookback - 1
+    close = history.close
+    predicted, actual, previous = forecasts[:, 0], close[bars + 1], close[bars]
+    error = predicted - actual
+    result = {
+        "windows": len(bars),
+        "mae": float(np.mean(np.abs(error))),
+        "rmse": float(np.sqrt(np.mean(error ** 2))),
+        "mape_pct": float(np.mean(np.abs(error) / np.abs(actual)) * 100),
+        "direction_accuracy": float(np.mean(np.sign(predicted - previous) == np.sign(actual - previous))),
+    }
+
+    # Windows with all forecast_days future bars stored.
+    forecast_days = forecasts.shape[1]
+    complete = bars + forecast_days < len(close)
+    paths = stride_tricks.sliding_window_view(close, forecast_days)[bars[complete] + 1]
+    if len(paths):
+        best_day = np.argmin(forecasts[complete], axis=1)  # as in main.format_recommendation
+        chosen = paths[np.arange(len(paths)), best_day]
+        result["best_day_windows"] = len(paths)
+        result["best_day_hit_rate"] = float(np.mean(chosen == paths.min(axis=1)))
+        result["best_day_regret_pct"] = float(np.mean(chosen / paths.min(axis=1) - 1) * 100)
+    return result
+
+def _pooled(results: dict) -> dict:
+    """Overall metrics, weighting every ticker by its number of windows."""
+    def mean(key, weight="windows"):
+        rows = [r for r in results.values() if key in r]
+        total = sum(r[weight] for r in rows)
+        return sum(r[key] * r[weight] for r in rows) / total if total else None
+
+    pooled = {"windows": sum(r["windows"] for r in results.values())}
+    for key in ("mae", "mape_pct", "direction_accuracy"):
+        pooled[key] = mean(key)
+    squared = [{"windows": r["windows"], "mse": r["rmse"] ** 2} for r in results.values()]
+    total = sum(r["windows"] for r in squared)
+    pooled["rmse"] = float(np.sqrt(sum(r["mse"] * r["windows"] for r in squared) / total)) if total else None
+    for key in ("best_day_hit_rate", "best_day_regret_pct"):
+        pooled[key] = mean(key, "best_day_windows")
+    return pooled
+
+def run_backtest(tickers=None, forecast_days=config.BACKTEST_FORECAST_DAYS, start=None, end=None,
+                 workers=config.BACKTEST_WORKERS, batch_size=config.BACKTEST_BATCH_SIZE,
+                 model=None, scalers=None, collection=None, version=None) -> dict:
+    """
+    Backtests a model version (default: the active one, see model_registry) over the
+    stored history of `tickers` (default: config.TICKERS). `start`/`end` limit the window
+    end dates; earlier bars still feed the windows and states.
+    Returns {"tickers": ticker -> metrics, "overall": pooled metrics, "seconds": ...}.
+    """
+    from numpy_gru import NumpyGRUModel
+    from scaler_table import stack_scaler_params
+
+    started = time.perf_counter()
+    tickers = list(tickers or config.TICKERS)
+    if model is None or scalers is None:
+        with startup_profile.phase("model_load"):
+            bundle = model_registry.load_version(version)
+            model, scalers, version = bundle.model, bundle.scalers, bundle.version
+    if collection is None:
+        collection = db_handler.get_db_collection()
+
+    skipped = {ticker: "no scaler" for ticker in tickers if not scalers.get(ticker)}
+    with startup_profile.phase("fetch"):
+        stored = db_handler.fetch_feature_history(collection, [t for t in tickers if t not in skipped])
+
+    jobs = []
+    for ticker in tickers:
+        if ticker in skipped:
+            continue
+        dates, values = stored.get(ticker, (np.empty(0), np.empty((0, len(config.FEATURES_TO_USE)))))
+        if len(dates) <= config.LOOKBACK_PERIOD:
+            skipped[ticker] = f"{len(dates)} stored rows, need more than {config.LOOKBACK_PERIOD}"
+            continue
+        scale, offset = stack_scaler_params(scalers, [ticker])
+        history = TickerHistory(ticker, dates, values, scale[0], offset[0])
+        origins = history.origins(start, end)
+        if len(origins):
+            jobs.append((history, origins))
+
+    # TensorFlow parallelizes a forward pass itself and its models are not safe to share across threads.
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not isinstance(model, NumpyGRUModel):
+        workers = 1
+    forecasts = {history.ticker: np.empty((len(origins), forecast_days)) for history, origins in jobs}
+    first_origin = {history.ticker: origins.start for history, origins in jobs}
+    with startup_profile.phase("inference"), ThreadPoolExecutor(max_workers=workers) as executor:
+        batches = list(_batches(jobs, batch_size))
+        for batch, result in zip(batches, executor.map(lambda b: _score_batch(model, b, forecast_days), batches)):
+            row = 0
+            for history, w0, w1 in batch:
+                first = w0 - first_origin[history.ticker]
+                forecasts[history.ticker][first:first + w1 - w0] = result[row:row + w1 - w0]
+                row += w1 - w0
+
+    results = {}
+    for history, origins in jobs:
+        results[history.ticker] = score_metrics(history, origins, forecasts[history.ticker])
+    overall = _pooled(results)
+    return {
+        "model_version": version,
+        "forecast_days": forecast_days,
+        "tickers": results,
+        "skipped": skipped,
+        "overall": overall,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+def verify_rollout(model, scalers, ticker: str, dates, values, forecast_days: int = config.BACKTEST_FORECAST_DAYS,
+                   samples: int = 5, tolerance: float = config.BACKTEST_TOLERANCE) -> dict:
+    """
+    Compares the vectorized rollout with predict.make_multistep_forecast_batch for a few
+    windows of one ticker's history (states replayed with state_from_history).
+    Returns the max absolute price difference and whether it is within `tolerance`.
+    """
+    import predict
+    from scaler_table import stack_scaler_params
+
+    scale, offset = stack_scaler_params(scalers, [ticker])
+    history = TickerHistory(ticker, dates, values, scale[0], offset[0])
+    origins = history.origins()
+    picks = np.unique(np.linspace(origins.start, origins.stop - 1, samples).astype(int))
+    actual = np.concatenate([_score_batch(model, [(history, w, w + 1)], forecast_days) for w in picks])
+
+    frame = pd.DataFrame(history.values, columns=config.FEATURES_TO_USE, index=pd.DatetimeIndex(history.dates))
+    expected = []
+    for w in picks:
+        last_bar = w + history.lookback - 1
+        window = frame.iloc[w:last_bar + 1]
+        state = incremental_features.state_from_history(ticker, frame.iloc[:last_bar + 1])
+        expected.append(predict.make_multistep_forecast_batch(
+            model, {ticker: window}, scalers, forecast_days, {ticker: state})[ticker])
+    difference = float(np.max(np.abs(actual - np.array(expected))))
+    return {"max_abs_diff": difference, "ok": difference <= tolerance}
+
+def _print_report(report: dict):
+    print(f"📊 Backtest of model {report['model_version']}, {report['forecast_days']}-day rollout ({report['seconds']}s)")
+    for ticker, r in report["tickers"].items():
+        hit = r.get("best_day_hit_rate")
+        print(f"  {ticker:<14} windows={r['windows']:<5} MAE={r['mae']:.2f} RMSE={r['rmse']:.2f} "
+              f"MAPE={r['mape_pct']:.2f}% direction={r['direction_accuracy']:.1%} "
+              f"best-day hit={'n/a' if hit is None else f'{hit:.1%}'}")
+    for ticker, reason in report["skipped"].items():
+        print(f"  ⚠️  {ticker}: skipped ({reason})")
+    o = report["overall"]
+    if o["windows"]:
+        print(f"✅ Overall: {o['windows']} windows, MAE={o['mae']:.2f} RMSE={o['rmse']:.2f} "
+              f"MAPE={o['mape_pct']:.2f}% direction={o['direction_accuracy']:.1%} "
+              f"best-day hit={o['best_day_hit_rate'] or 0:.1%} regret={o['best_day_regret_pct'] or 0:.2f}%")
+    else:
+        print("ℹ️  No windows to score")
+
+if __name__ == "__main__":
+    args = metrics.enable_from_argv(startup_profile.enable_from_argv(sys.argv[1:]))
+    parser = argparse.ArgumentParser(description="Walk-forward backtest over the stored feature history.")
+    parser.add_argument("--tickers", nargs="+", help="Subset of config.TICKERS.")
+    parser.add_argument("--start", type=date.fromisoformat, help="First window end date (YYYY-MM-DD).")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last window end date (YYYY-MM-DD).")
+    parser.add_argument("--forecast-days", type=int, default=config.BACKTEST_FORECAST_DAYS)
+    parser.add_argument("--workers", type=int, default=config.BACKTEST_WORKERS)
+    parser.add_argument("--model-version", help="Registered model version (default: the active one).")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON on stdout (logs go to stderr).")
+    args = parser.parse_args(args)
+
+    out = sys.stdout
+    if args.json:
+        sys.stdout = sys.stderr
+    report = run_backtest(args.tickers, args.forecast_days, args.start, args.end, args.workers,
+                          version=args.model_version)
+    if args.json:
+        print(json.dumps(report, indent=4), file=out)
+    else:
+        _print_report(report)
+    startup_profile.emit()
+    metrics.emit()
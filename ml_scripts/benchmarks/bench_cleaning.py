@@ -0,0 +1,13 @@
+# ml_scripts/benchmarks/bench_cleaning.py
+
+import backfill_db
+import features
+
+def bench_clean_raw_data(benchmark, ohlcv):
+    cleaned = benchmark(backfill_db.clean_raw_data, ohlcv, "BENCH.NS")
+    assert len(cleaned) > 0
+
+def bench_calculate_quality_score(benchmark, ohlcv):
+    featured = features.calculate_features(ohlcv).dropna().tail(60)
+    scores = benchmark(backfill_db.calculate_quality_score, featured)
+    assert scores.between(1.0, 5.0).all()
@@ -0,0 +1,28 @@
+# ml_scripts/benchmarks/bench_db.py
+
+import pytest
+
+import config
+import db_handler
+from synthetic_data import new_collection
+
+@pytest.fixture(scope="module")
+def daily_records(records):
+    """One daily collector run: the last 5 bars of every ticker."""
+    return [record for record in records if record["Date"] >= records[-5]["Date"]]
+
+def bench_save_data_to_db_insert(benchmark, daily_records):
+    # A fresh collection per round: every record is a new upsert.
+    def setup():
+        return (new_collection(), [dict(record) for record in daily_records]), {}
+    inserted = benchmark.pedantic(db_handler.save_data_to_db, setup=setup, rounds=10)
+    assert inserted == len(daily_records)
+
+def bench_save_data_to_db_update(benchmark, seeded_collection, daily_records):
+    # The same bars saved again: every upsert matches an existing document.
+    inserted = benchmark(db_handler.save_data_to_db, seeded_collection, [dict(r) for r in daily_records])
+    assert inserted == 0
+
+def bench_fetch_data_from_db(benchmark, seeded_collection, tickers):
+    window = benchmark(db_handler.fetch_data_from_db, seeded_collection, tickers[0], config.LOOKBACK_PERIOD)
+    assert len(window) == config.LOOKBACK_PERIOD
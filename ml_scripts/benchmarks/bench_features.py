@@ -0,0 +1,24 @@
+# ml_scripts/benchmarks/bench_features.py
+
+import pandas as pd
+import pytest
+
+import features
+from synthetic_data import synthetic_ohlcv
+
+def bench_calculate_features(benchmark, ohlcv):
+    featured = benchmark(features.calculate_features, ohlcv)
+    assert featured.dropna().shape[0] > 0
+
+def bench_pandas_ta_features(benchmark, ohlcv):
+    pytest.importorskip("pandas_ta")
+    featured = benchmark(features.pandas_ta_features, ohlcv)
+    assert featured.dropna().shape[0] > 0
+
+def bench_compute_features_panel(benchmark, tickers):
+    panel = pd.concat([
+        synthetic_ohlcv(seed)[["Close", "Volume"]].reset_index().assign(ticker=ticker)
+        for seed, ticker in enumerate(tickers)
+    ], ignore_index=True)
+    featured = benchmark(features.compute_features, panel)
+    assert len(featured) == len(panel)
@@ -0,0 +1,43 @@
+# ml_scripts/benchmarks/bench_prediction.py
+
+import prediction_cache
+
+def bench_generate_single_prediction(benchmark, prediction_assets, tickers, monkeypatch):
+    # Cache disabled: fetch + scaling + forward pass + inverse scaling on every call.
+    monkeypatch.setattr(prediction_cache, "get", lambda *args: None)
+    monkeypatch.setattr(prediction_cache, "put", lambda *args: None)
+    result = benchmark(prediction_assets.generate_single_prediction, tickers[0])
+    assert result["status"] == "success"
+
+def bench_generate_single_prediction_materialized(benchmark, prediction_assets, scalers, tickers, monkeypatch):
+    # Cache disabled, window scaled at ingest time: stored blob -> forward pass -> (y - offset) / scale.
+    import scaled_windows
+    monkeypatch.setattr(prediction_cache, "get", lambda *args: None)
+    monkeypatch.setattr(prediction_cache, "put", lambda *args: None)
+    registry, collection = prediction_assets._assets
+    monkeypatch.setattr(registry.get(), "scalers_fingerprint", "benchmark")
+    scaled_windows.refresh(collection, tickers[:1], scalers, "benchmark")
+    result = benchmark(prediction_assets.generate_single_prediction, tickers[0])
+    assert result["status"] == "success"
+
+def bench_generate_single_prediction_cached(benchmark, prediction_assets, tickers):
+    prediction_assets.generate_single_prediction(tickers[0])
+    result = benchmark(prediction_assets.generate_single_prediction, tickers[0])
+    assert result["status"] == "success"
+
+def bench_generate_batch_predictions(benchmark, prediction_assets, tickers, monkeypatch):
+    monkeypatch.setattr(prediction_cache, "get", lambda *args: None)
+    monkeypatch.setattr(prediction_cache, "put", lambda *args: None)
+    results = benchmark(prediction_assets.generate_batch_predictions, tickers)
+    assert all(result["status"] == "success" for result in results)
+
+def bench_backtest(benchmark, scalers, tickers):
+    # Every stored window of 10 tickers (~1.5k), rolled forward 5 days in batched forward passes.
+    import backtest
+    from conftest import HISTORY_DAYS, tiny_gru
+    from synthetic_data import computed_feature_records, new_collection
+    collection = new_collection()
+    collection.insert_many(computed_feature_records(tickers[:10], rows=HISTORY_DAYS))
+    report = benchmark.pedantic(backtest.run_backtest, args=(tickers[:10], 5),
+                                kwargs={"model": tiny_gru(), "scalers": scalers, "collection": collection}, rounds=3)
+    assert report["overall"]["windows"] > 1000 and not report["skipped"]
@@ -0,0 +1,82 @@
+# ml_scripts/benchmarks/conftest.py
+"""
+Fixtures for the hot-path benchmarks: synthetic OHLCV data, an in-memory
+MongoDB (mongomock) and a tiny randomly initialized GRU with the production
+input shape (LOOKBACK_PERIOD, len(FEATURES_TO_USE)). Everything is seeded, so
+runs on different commits measure the same work. The data helpers live in
+synthetic_data.py, shared with the tests.
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+
+import config
+from numpy_gru import NumpyGRUModel
+from synthetic_data import computed_feature_records, new_collection, synthetic_ohlcv
+
+N_TICKERS = 50
+HISTORY_DAYS = 250
+
+@pytest.fixture(scope="session")
+def tickers():
+    return config.TICKERS[:N_TICKERS]
+
+@pytest.fixture(scope="session")
+def ohlcv():
+    return synthetic_ohlcv(days=HISTORY_DAYS)
+
+@pytest.fixture(scope="session")
+def records(tickers):
+    return computed_feature_records(tickers)
+
+@pytest.fixture
+def empty_collection():
+    return new_collection()
+
+@pytest.fixture(scope="session")
+def seeded_collection(records):
+    collection = new_collection()
+    collection.insert_many([dict(record) for record in records])
+    return collection
+
+def tiny_gru(units=(16, 8), seed: int = 0) -> NumpyGRUModel:
+    """GRU -> GRU -> Dense with random weights, laid out like the exported production model."""
+    rng = np.random.default_rng(seed)
+    n_features = len(config.FEATURES_TO_USE)
+    layers, weights = [], {}
+    inputs = n_features
+    for i, u in enumerate(units):
+        name = f"gru_{i}"
+        layers.append({"type": "GRU", "name": name, "activation": "tanh", "units": u,
+                       "recurrent_activation": "sigmoid", "return_sequences": i < len(units) - 1})
+        weights[f"{name}/kernel"] = rng.normal(0, 0.3, (inputs, 3 * u)).astype(np.float32)
+        weights[f"{name}/recurrent_kernel"] = rng.normal(0, 0.3, (u, 3 * u)).astype(np.float32)
+        weights[f"{name}/bias"] = np.zeros((2, 3 * u), dtype=np.float32)
+        inputs = u
+    layers.append({"type": "Dense", "name": "dense", "activation": "linear"})
+    weights["dense/kernel"] = rng.normal(0, 0.3, (inputs, 1)).astype(np.float32)
+    weights["dense/bias"] = np.zeros(1, dtype=np.float32)
+    return NumpyGRUModel(layers, weights)
+
+@pytest.fixture(scope="session")
+def scalers(records):
+    frame = pd.DataFrame(records)
+    return {
+        ticker: MinMaxScaler().fit(group[config.FEATURES_TO_USE])
+        for ticker, group in frame.groupby("ticker")
+    }
+
+@pytest.fixture
+def prediction_assets(seeded_collection, scalers, monkeypatch):
+    """Points prediction_handler at the tiny model, fitted scalers and the mongomock collection."""
+    import prediction_handler
+    from model_registry import ModelBundle, ModelRegistry
+    registry = ModelRegistry.from_bundles([ModelBundle("benchmark", tiny_gru(), scalers)])
+    monkeypatch.setattr(prediction_handler, "_assets", (registry, seeded_collection))
+    return prediction_handler
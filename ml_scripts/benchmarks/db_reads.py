@@ -0,0 +1,55 @@
+# ml_scripts/benchmarks/db_reads.py
+"""
+Per-call latency and allocation of the lookback-window read, comparing the
+original fetch (full documents -> list of dicts -> DataFrame -> sort) with the
+projected, index-ordered fetch_data_from_db. Runs against config.MONGO_URI.
+
+    python3 ml_scripts/benchmarks/db_reads.py [TICKER] [--repeat N]
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import tracemalloc
+import pandas as pd
+
+import config
+import db_handler
+
+def legacy_fetch(collection, ticker, num_records):
+    """fetch_data_from_db as it was before the projection/array decode."""
+    data = list(collection.find({"ticker": ticker}).sort("Date", -1).limit(num_records))
+    return pd.DataFrame(data).sort_values(by="Date").reset_index(drop=True)
+
+def measure(fetch, collection, ticker, repeat):
+    """Returns (median latency in ms, peak traced allocation in KiB) of one call."""
+    fetch(collection, ticker, config.LOOKBACK_PERIOD)  # warm the connection pool and caches
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fetch(collection, ticker, config.LOOKBACK_PERIOD)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    fetch(collection, ticker, config.LOOKBACK_PERIOD)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sorted(latencies)[len(latencies) // 2], peak / 1024
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the lookback-window read.")
+    parser.add_argument("ticker", nargs="?", default=config.TICKERS[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    collection = db_handler.get_db_collection()
+    results = {
+        "legacy": measure(legacy_fetch, collection, args.ticker, args.repeat),
+        "fetch_data_from_db": measure(db_handler.fetch_data_from_db, collection, args.ticker, args.repeat),
+    }
+
+    for name, (latency_ms, peak_kib) in results.items():
+        print(f"{name:>20}: {latency_ms:8.3f} ms/call (median), peak alloc {peak_kib:9.1f} KiB")
@@ -0,0 +1,108 @@
+# ml_scripts/benchmarks/ingest_memory.py
+"""
+Peak RSS of a full-history ingest against universe size: synthetic yfinance
+frames (OHLCV plus Dividends/Stock Splits) -> one cleaned, featured panel ->
+a temporary feature store. Compares the original layout (every downloaded
+column, object tickers, float64, one record dict per row for save_data_to_db)
+with the compact one (market_data.select_columns, categorical tickers,
+db_handler.compact_panel and save_panel). Each run is a fresh child process,
+so the peaks do not mix.
+
+    python3 ml_scripts/benchmarks/ingest_memory.py [--universe 50 100 250 500] [--years 10]
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import resource
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+import cleaning
+import config
+import db_handler
+import feature_store
+import features
+import market_data
+
+def synthetic_download(ticker: str, years: int, seed: int) -> pd.DataFrame:
+    """A yfinance-like daily history: tz-aware index, OHLCV, Dividends and Stock Splits."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2025-12-31", periods=252 * years, tz="Asia/Kolkata", name="Date")
+    n = len(index)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    return pd.DataFrame({
+        "Open": close * (1 + rng.normal(0, 0.003, n)), "High": close * 1.01, "Low": close * 0.99,
+        "Close": close, "Volume": rng.integers(100_000, 10_000_000, n).astype(float),
+        "Dividends": 0.0, "Stock Splits": 0.0,
+    }, index=index)
+
+def featured_panel(raw: pd.DataFrame) -> pd.DataFrame:
+    """Cleaning, features and quality scores over the whole panel, as in backfill_db."""
+    cleaned, _counters = cleaning.clean_panel(raw)
+    panel = features.compute_features(cleaned[["ticker", "Date", "Close", "Volume"]])
+    panel = panel.dropna(subset=config.FEATURES_TO_USE)
+    panel["data_quality_score"] = cleaning.quality_scores(panel)
+    return panel
+
+def ingest_records(tickers, years, store) -> int:
+    frames = [synthetic_download(ticker, years, i).rename_axis("Date").reset_index().assign(ticker=ticker)
+              for i, ticker in enumerate(tickers)]
+    panel = featured_panel(pd.concat(frames, ignore_index=True))
+    del frames
+    records = panel[["Date"] + config.FEATURES_TO_USE + ["data_quality_score", "ticker"]].to_dict("records")
+    return db_handler.save_data_to_db(store, records)
+
+def ingest_compact(tickers, years, store) -> int:
+    ticker_type = db_handler.ticker_dtype(tickers)
+    frames = [market_data.select_columns(synthetic_download(ticker, years, i)).rename_axis("Date").reset_index()
+              .assign(ticker=pd.Categorical([ticker] * (252 * years), dtype=ticker_type))
+              for i, ticker in enumerate(tickers)]
+    panel = featured_panel(pd.concat(frames, ignore_index=True))
+    del frames
+    return db_handler.save_panel(store, db_handler.compact_panel(panel))
+
+PATHS = {"records": ingest_records, "compact": ingest_compact}
+
+def child(path: str, universe: int, years: int):
+    """Runs one ingest and prints its JSON result (peak RSS in MiB, seconds, rows)."""
+    tickers = [f"T{i:04d}.NS" for i in range(universe)]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        rows = PATHS[path](tickers, years, feature_store.FeatureStore(root))
+        seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(json.dumps({"peak_mib": peak, "baseline_mib": baseline, "seconds": seconds, "rows": rows}))
+
+def measure(path: str, universe: int, years: int) -> dict:
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", path,
+                             "--universe", str(universe), "--years", str(years)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark peak RSS of the backfill ingest.")
+    parser.add_argument("--universe", type=int, nargs="+", default=[50, 100, 250, 500])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--child", choices=PATHS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.universe[0], args.years)
+        sys.exit()
+
+    print(f"📏 Peak RSS of a {args.years}-year ingest, one process per run")
+    print(f"{'tickers':>8} {'rows':>10} {'records MiB':>12} {'compact MiB':>12} {'saved':>7} {'records s':>10} {'compact s':>10}")
+    for universe in args.universe:
+        records, compact = (measure(path, universe, args.years) for path in PATHS)
+        saved = 1 - (compact["peak_mib"] - compact["baseline_mib"]) / (records["peak_mib"] - records["baseline_mib"])
+        print(f"{universe:>8} {compact['rows']:>10} {records['peak_mib']:>12.0f} {compact['peak_mib']:>12.0f} "
+              f"{saved:>7.0%} {records['seconds']:>10.1f} {compact['seconds']:>10.1f}")
+    print(f"   (saved: reduction above the ≈{compact['baseline_mib']:.0f} MiB held after imports)")
@@ -0,0 +1,363 @@
+# ml_scripts/collector_daemon.py
+"""
+Warm daily-collection daemon around daily_collector.collect_latest_data.
+
+One long-lived process keeps pandas, yfinance and the Mongo pool loaded and
+runs the collection at config.COLLECTOR_SCHEDULE_TIME on NSE trading days
+(market_calendar: weekends and config.NSE_HOLIDAYS are skipped). It answers
+JSON-lines requests on config.COLLECTOR_DAEMON_HOST:COLLECTOR_DAEMON_PORT:
+
+    {"command": "trigger", "resume": false, "wait": false, "stream": false}
+    {"command": "status"}     current run, last run with its timings, next scheduled run
+    {"command": "metrics", "format": "json"|"prometheus"}
+    {"command": "ping"}
+
+A trigger that arrives while a run is in progress joins that run instead of
+starting another one; if it asked for a full run (resume false) and joined a
+resumed one, its response says so. A scheduled trigger joins only a run that started
+after today's COLLECTOR_SCHEDULE_TIME (which then counts as the scheduled run); an
+earlier run is followed by the scheduled run once it finishes. With "stream" the run's collector events (one line per
+ticker, then the summary, as with daily_collector.py --jsonl) are sent as they
+happen, followed by a {"type": "run"} line; "wait" answers with that line only.
+
+    python3 ml_scripts/collector_daemon.py [--no-schedule] [--host H] [--port P]
+    python3 ml_scripts/collector_daemon.py --trigger [--wait] | --status
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import itertools
+import json
+import socket
+import socketserver
+import threading
+import time
+from datetime import datetime
+
+import config
+import market_calendar
+import metrics
+import startup_profile
+from startup_profile import lazy_module
+
+daily_collector = lazy_module("daily_collector")
+
+def load_last_scheduled_run():
+    """Start time (exchange timezone) of the last completed scheduled or catch-up run, or None."""
+    try:
+        with open(config.COLLECTOR_SCHEDULE_STATE_PATH) as f:
+            return datetime.fromisoformat(json.load(f)["last_scheduled_run"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save_last_scheduled_run(started: datetime):
+    path = config.COLLECTOR_SCHEDULE_STATE_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"last_scheduled_run": started.isoformat()}, f)
+    os.replace(path + ".tmp", path)
+
+class RunEvents:
+    """
+    The `events` stream handed to collect_latest_data: keeps every JSON line of
+    the run so any number of clients can follow it, including late joiners.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self._changed = threading.Condition()
+
+    def write(self, text: str):
+        with self._changed:
+            self.events.extend(json.loads(line) for line in text.splitlines() if line.strip())
+            self._changed.notify_all()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    def follow(self):
+        """Yields every event of the run, from the first one, until the run has finished."""
+        position = 0
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self.done or len(self.events) > position)
+                new, done = self.events[position:], self.done
+            position += len(new)
+            yield from new
+            if done:
+                return
+
+class CollectionJob:
+    """One collection run of the daemon: why it started, its outcome and its timings."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, reason: str, resume: bool):
+        self.id = next(self._ids)
+        self.reason = reason        # "schedule", "catch-up" or "trigger"
+        self.resume = resume
+        self.joined = 0             # triggers coalesced into this run
+        self.scheduled = reason in ("schedule", "catch-up")  # records last_scheduled_run when it succeeds
+        self.exchange_started = market_calendar.exchange_now()
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.finished_at = None
+        self.seconds = None
+        self.phases_ms = {}
+        self.summary = None
+        self.error = None
+        self.events = RunEvents()
+        self.finished = threading.Event()
+
+    def describe(self, results: bool = False) -> dict:
+        description = {
+            "id": self.id, "reason": self.reason, "resume": self.resume, "joined": self.joined,
+            "scheduled": self.scheduled,
+            "started_at": self.started_at, "finished_at": self.finished_at, "seconds": self.seconds,
+            "phases_ms": self.phases_ms, "summary": self.summary, "error": self.error,
+        }
+        if results:
+            description["results"] = [event for event in self.events.events if event.get("type") == "ticker"]
+        return description
+
+class CollectorScheduler:
+    """
+    Runs `collect` (default daily_collector.collect_latest_data) one run at a time,
+    on the trading-day schedule and on trigger, and keeps the last run's timings.
+    """
+
+    def __init__(self, collect=None):
+        self.collect = collect
+        self.current = None
+        self.last_run = None
+        self.runs = 0
+        self.next_run = None
+        self.follow_up = None       # (reason, resume) of a scheduled run queued behind the current one
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def trigger(self, reason: str = "trigger", resume: bool = False):
+        """
+        Starts a run, or joins the one in progress. Returns (job, started).
+        A scheduled or catch-up trigger joins a run only if it started after today's
+        scheduled time (and is a full run, unless the trigger resumes too); otherwise
+        a run with that reason is queued to start after it.
+        """
+        with self._lock:
+            current = self.current
+            if current is not None:
+                if reason in ("schedule", "catch-up") and not current.scheduled:
+                    started = current.exchange_started
+                    # A resumed run skips tickers collected earlier today: it only stands in for a resumed one.
+                    if started < market_calendar.scheduled_time(started.date()) or (current.resume and not resume):
+                        self.follow_up = (reason, resume)
+                        metrics.inc("collector_triggers_total", outcome="queued")
+                        return current, False
+                    current.scheduled = True
+                current.joined += 1
+                metrics.inc("collector_triggers_total", outcome="joined")
+                return current, False
+            job = self.current = CollectionJob(reason, resume)
+        metrics.inc("collector_triggers_total", outcome="started")
+        threading.Thread(target=self._run, args=(job,), name=f"collection-{job.id}", daemon=True).start()
+        return job, True
+
+    def _run(self, job: CollectionJob):
+        print(f"🚀 Collection run {job.id} ({job.reason}) started")
+        before = startup_profile.report()
+        start = time.perf_counter()
+        try:
+            with metrics.timer("collector_run_seconds", reason=job.reason):
+                job.summary = (self.collect or daily_collector.collect_latest_data)(events=job.events, resume=job.resume)
+        except Exception as e:
+            job.error = str(e)
+            metrics.inc("collector_run_errors_total")
+            print(f"❌ Collection run {job.id} failed: {e}")
+        if job.error is None and job.scheduled:
+            save_last_scheduled_run(job.exchange_started)
+        job.seconds = round(time.perf_counter() - start, 3)
+        job.finished_at = datetime.now().isoformat(timespec="seconds")
+        # The collector's own phases (fetch, features, db_write), this run only.
+        after = startup_profile.report()
+        job.phases_ms = {name: round(ms - before.get(name, 0.0), 2) for name, ms in after.items()
+                         if name != "total" and ms != before.get(name)}
+        with self._lock:
+            self.current, self.last_run = None, job
+            self.runs += 1
+            follow_up, self.follow_up = self.follow_up, None
+        job.events.close()
+        job.finished.set()
+        print(f"✅ Collection run {job.id} finished in {job.seconds:.1f}s")
+        if follow_up is not None:
+            self.trigger(*follow_up)
+
+    def status(self) -> dict:
+        with self._lock:
+            current, last_run, runs, follow_up = self.current, self.last_run, self.runs, self.follow_up
+        today = market_calendar.exchange_now().date()
+        return {
+            "status": "success",
+            "running": current.describe() if current else None,
+            "last_run": last_run.describe() if last_run else None,
+            "runs": runs,
+            "queued": follow_up[0] if follow_up else None,
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "trading_day": market_calendar.is_trading_day(today),
+        }
+
+    def start_schedule(self) -> threading.Thread:
+        """Runs the collection at every scheduled time in a daemon thread, until stop()."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._schedule, name="collector-schedule", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def needs_catch_up(self, now: datetime) -> bool:
+        """Past today's collection time on a trading day, without a scheduled run since then."""
+        if not market_calendar.is_trading_day(now.date()):
+            return False
+        due = market_calendar.scheduled_time(now.date())
+        last_run = load_last_scheduled_run()
+        return now >= due and (last_run is None or last_run < due)
+
+    def _schedule(self):
+        if self.needs_catch_up(market_calendar.exchange_now()):
+            # Continues today's scheduled run if it was interrupted (e.g. by a restart).
+            self.trigger("catch-up", resume=True)
+        while True:
+            self.next_run = market_calendar.next_run(market_calendar.exchange_now())
+            print(f"⏰ Next scheduled collection: {self.next_run:%Y-%m-%d %H:%M %Z}")
+            # Short sleeps, so a suspended host or clock change does not skip a day.
+            while (remaining := (self.next_run - market_calendar.exchange_now()).total_seconds()) > 0:
+                if self._stop.wait(min(remaining, 60.0)):
+                    return
+            # A scheduled run refetches every ticker: earlier runs today predate the close.
+            self.trigger("schedule", resume=False)
+
+    def stop(self):
+        self._stop.set()
+
+scheduler = CollectorScheduler()
+
+def responses(request: dict):
+    """Yields the response objects to one request (several for a streamed trigger)."""
+    command = request.get("command")
+    if command == "ping":
+        yield {"status": "success", "message": "pong"}
+    elif command == "status":
+        yield scheduler.status()
+    elif command == "metrics":
+        if request.get("format") == "prometheus":
+            yield {"status": "success", "metrics": metrics.prometheus_text()}
+        else:
+            yield {"status": "success", "metrics": metrics.snapshot()}
+    elif command == "trigger":
+        resume = bool(request.get("resume", False))
+        job, started = scheduler.trigger(resume=resume)
+        if request.get("stream"):
+            yield from job.events.follow()
+        if request.get("stream") or request.get("wait"):
+            job.finished.wait()
+        status = "error" if job.error else "success"
+        response = {"type": "run", "status": status, "started": started,
+                    "run": job.describe(results=bool(request.get("wait")))}
+        if job.resume and not resume:
+            # The joined run skips the tickers an interrupted run finished earlier today.
+            response["message"] = (f"Joined run {job.id}, which resumes an interrupted run; "
+                                   "trigger again after it finishes for a full collection.")
+        yield response
+    else:
+        yield {"status": "error", "message": "Unknown command; expected trigger, status, metrics or ping."}
+
+def handle_line(line: str):
+    """Decodes one JSON-lines request and yields the encoded response lines."""
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object.")
+    except ValueError as e:
+        yield json.dumps({"status": "error", "message": f"Invalid request: {e}"}) + "\n"
+        return
+    for response in responses(request):
+        yield json.dumps(response) + "\n"
+
+class CollectorRequestHandler(socketserver.StreamRequestHandler):
+    """Serves JSON-lines requests on one client connection until it is closed."""
+
+    def handle(self):
+        for raw_line in self.rfile:
+            line = raw_line.decode("utf-8").strip()
+            if not line:
+                continue
+            for response_line in handle_line(line):
+                self.wfile.write(response_line.encode("utf-8"))
+                self.wfile.flush()
+
+class CollectorServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def warm_up():
+    """Imports the collector's modules and opens the Mongo pool before the first run."""
+    # The cold imports a per-request `python3 daily_collector.py` paid every time.
+    import yfinance  # noqa: F401
+    import db_handler, features, incremental_features, market_data, scaled_windows  # noqa: F401
+    db_handler.get_db_collection()
+
+def serve(host: str = config.COLLECTOR_DAEMON_HOST, port: int = config.COLLECTOR_DAEMON_PORT,
+          schedule: bool = True):
+    """Runs the daemon (schedule and request socket) until interrupted."""
+    warm_up()
+    if schedule:
+        scheduler.start_schedule()
+    with CollectorServer((host, port), CollectorRequestHandler) as server:
+        print(f"🚀 Collector daemon listening on {host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            scheduler.stop()
+            print("🛑 Collector daemon stopped")
+
+def request_daemon(request: dict, host: str = config.COLLECTOR_DAEMON_HOST,
+                   port: int = config.COLLECTOR_DAEMON_PORT, timeout: float = config.COLLECTOR_DAEMON_TIMEOUT):
+    """
+    Sends one request to a running daemon and yields its responses (a streamed
+    trigger's events, then the run line). `timeout` None waits for a run without limit.
+    Raises OSError when no daemon is reachable.
+    """
+    multi = request.get("command") == "trigger"
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as reader:
+            for line in reader:
+                response = json.loads(line)
+                yield response
+                if not multi or response.get("type") == "run":
+                    return
+    raise ConnectionError("Collector daemon closed the connection without a response.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm, scheduled daily-collection daemon.")
+    parser.add_argument("--host", default=config.COLLECTOR_DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=config.COLLECTOR_DAEMON_PORT)
+    parser.add_argument("--no-schedule", action="store_true", help="Only collect when triggered.")
+    parser.add_argument("--trigger", action="store_true", help="Ask a running daemon for a run.")
+    parser.add_argument("--wait", action="store_true", help="With --trigger: wait for the run to finish.")
+    parser.add_argument("--status", action="store_true", help="Print a running daemon's status.")
+    args = parser.parse_args()
+
+    if args.trigger or args.status:
+        request = {"command": "trigger", "wait": args.wait} if args.trigger else {"command": "status"}
+        for response in request_daemon(request, args.host, args.port, None if args.wait else config.COLLECTOR_DAEMON_TIMEOUT):
+            print(json.dumps(response, indent=2))
+    else:
+        serve(args.host, args.port, schedule=not args.no_schedule)
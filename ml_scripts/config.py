@@ -2,8 +2,16 @@
 
 # --- MongoDB Configuration ---
 MONGO_URI = "mongodb://localhost:27017/"
+MONGO_MAX_POOL_SIZE = 20                  # pooled connections per process
+MONGO_MIN_POOL_SIZE = 0
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+MONGO_CONNECT_TIMEOUT_MS = 5000
+MONGO_SOCKET_TIMEOUT_MS = 30000
 DATABASE_NAME = "Stock-Data"
 COLLECTION_NAME = "nifty50_daily"
+FEATURE_STATE_COLLECTION = "feature_state"  # per-ticker incremental indicator state
+PREDICTION_CACHE_COLLECTION = "prediction_cache"  # persistent prediction cache tier (None disables it)
+DATA_REVISION_COLLECTION = "data_revisions"  # per-ticker latest Date and last write time (cache keys)
 
 # --- Stock Tickers ---
 # A small list for testing. Expand this to all 50 for production.
@@ -23,6 +31,115 @@ TICKERS = [
 # --- Model & Data Parameters ---
 MODEL_PATH = "ml_scripts/models/gru_model.h5"
 SCALERS_PATH = "ml_scripts/models/scalers.pkl"
+NUMPY_MODEL_PATH = "ml_scripts/models/gru_model.npz"  # written by model_export.py
+MODEL_BACKEND = "auto"  # "auto" (NumPy artifact if up to date), "numpy" or "keras"
+NUMPY_MODEL_TOLERANCE = 1e-5  # max abs difference vs Keras predict
+NUMPY_SCALERS_PATH = "ml_scripts/models/scalers.npz"  # scalers.pkl as arrays (scaler_table.py)
+SCALER_BACKEND = "auto"  # "auto" (scalers.npz if up to date), "numpy" or "pickle"
+NUMPY_SCALERS_TOLERANCE = 1e-9  # max abs difference vs the sklearn scalers
+# Versioned bundles (model_registry.py); while the directory holds none,
+# MODEL_PATH/SCALERS_PATH are served as the single "default" version.
+MODEL_REGISTRY_PATH = "ml_scripts/models/registry"
+MODEL_REGISTRY_POLL_SECONDS = 5.0  # how often the prediction server checks it for new bundles
 LOOKBACK_PERIOD = 60
 FEATURES_TO_USE = ['Close', 'Volume', 'RSI_14', 'MACD_12_26_9', 'volatility_20d']
-TARGET_COLUMN = 'Close'
\ No newline at end of file
+TARGET_COLUMN = 'Close'
+
+# Incremental features (daily collector): bars re-downloaded before the last
+# stored bar, and the max allowed difference from a full pandas_ta recompute.
+INCREMENTAL_OVERLAP_DAYS = 10
+INCREMENTAL_FEATURE_TOLERANCE = 1e-6
+FEATURE_PARITY_TOLERANCE = 1e-6  # features.py vs the pandas_ta reference
+
+# --- Daily Collector Runs (daily_collector.py --jsonl/--resume) ---
+# Checkpoint of today's latest run (run id, finished flag, completed tickers); --resume
+# continues that run only if it was interrupted or timed out before its summary.
+COLLECTOR_PROGRESS_PATH = "ml_scripts/data/collector_progress.json"
+
+# --- Async Collector (async_collector.py) ---
+# Tickers buffered between the fetch -> features -> write stages; a full queue
+# pauses the stage before it (backpressure).
+ASYNC_COLLECTOR_QUEUE_SIZE = 8
+
+# --- Collector Daemon (collector_daemon.py) ---
+# A warm process runs the daily collection at COLLECTOR_SCHEDULE_TIME (exchange time) on
+# NSE trading days and answers trigger/status requests on this address.
+COLLECTOR_DAEMON_HOST = "127.0.0.1"
+COLLECTOR_DAEMON_PORT = 8766
+COLLECTOR_DAEMON_TIMEOUT = 10.0       # seconds, for status and non-waiting trigger requests
+COLLECTOR_SCHEDULE_TIME = "16:15"     # HH:MM, after MARKET_CLOSE_TIME
+EXCHANGE_TIMEZONE = "Asia/Kolkata"
+MARKET_CLOSE_TIME = "15:30"           # before it, today's bar is provisional (incremental_features)
+# Start time of the last completed scheduled (or catch-up) run: a daemon started after
+# today's COLLECTOR_SCHEDULE_TIME catches up only if that run predates it.
+COLLECTOR_SCHEDULE_STATE_PATH = "ml_scripts/data/collector_schedule.json"
+
+# --- NSE Trading Calendar (market_calendar.py) ---
+# Weekday trading holidays from NSE's yearly holiday circular (weekends are always closed).
+# Add the next year's dates when NSE publishes them.
+NSE_HOLIDAYS = [
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14", "2025-04-18",
+    "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02", "2025-10-21", "2025-10-22",
+    "2025-11-05", "2025-12-25",
+    "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31", "2026-04-03", "2026-04-14",
+    "2026-05-01", "2026-05-28", "2026-06-26", "2026-09-14", "2026-10-02", "2026-10-20",
+    "2026-11-10", "2026-11-24", "2026-12-25",
+]
+
+# --- Storage Backend ---
+# "mongo": one document per row in COLLECTION_NAME; "npy": columnar per-ticker
+# .npy files under FEATURE_STORE_PATH (feature_store.py), no MongoDB server needed.
+STORAGE_BACKEND = "mongo"
+FEATURE_STORE_PATH = "ml_scripts/data/feature_store"
+FEATURE_STORE_COLUMNS = FEATURES_TO_USE + ['data_quality_score']
+
+# --- Market Data Downloads ---
+MARKET_DATA_MAX_WORKERS = 8     # concurrent yfinance downloads
+MARKET_DATA_RATE_LIMIT = 4.0    # sustained requests per second (token bucket)
+MARKET_DATA_BURST = 8           # requests allowed in a burst
+
+# --- Database Writes ---
+DB_WRITE_CHUNK_SIZE = 500       # upserts per bulk_write call
+DB_WRITE_MAX_RETRIES = 3        # retries for a failed chunk
+DB_WRITE_RETRY_DELAY = 1.0      # seconds, multiplied by the attempt number
+
+# --- Compact Ingest (backfill_db.py) ---
+# Featured panels are held with categorical tickers and values in this dtype until
+# db_handler.save_panel writes them from the column arrays, DB_WRITE_CHUNK_SIZE rows at a time.
+# Precision change: with float32, backfilled features are stored rounded to ~7 significant
+# digits (relative error <= 6e-8), whereas save_data_to_db and the daily collector store float64.
+INGEST_FLOAT_DTYPE = "float32"  # "float64" keeps full precision in the stored features
+
+# --- Long-History Backfill (backfill_db.py --start/--end) ---
+BACKFILL_CHUNK_DAYS = 365           # calendar days per (ticker, date chunk) work unit
+BACKFILL_WARMUP_DAYS = 400          # extra history fetched before each chunk for cleaning/indicator warm-up
+BACKFILL_WORKERS = None             # cleaning/feature processes (None = one per core)
+BACKFILL_CHECKPOINT_COLLECTION = "backfill_checkpoints"  # completed chunks, skipped on rerun
+
+# --- Prediction Server ---
+# prediction_server.py keeps the model, scalers and Mongo connection warm and
+# answers JSON-lines requests on this address; prediction_handler.py uses it when running.
+PREDICTION_SERVER_HOST = "127.0.0.1"
+PREDICTION_SERVER_PORT = 8765
+PREDICTION_SERVER_TIMEOUT = 30.0  # seconds
+
+# --- Metrics (metrics.py) ---
+METRICS_FORMAT = None   # None (export only with --metrics), "json" or "prometheus"
+METRICS_PATH = None     # file to write the snapshot to; None = stderr (never stdout)
+
+# --- Prediction Cache ---
+PREDICTION_CACHE_SIZE = 1024                     # in-process LRU entries
+PREDICTION_CACHE_TTL_SECONDS = 7 * 24 * 3600     # expiry of persistent entries
+
+# --- Scaled Windows (scaled_windows.py) ---
+# Scaled float32 lookback windows written at ingest time, one per ticker; inference
+# feeds them to the model directly while they match the latest bar and scalers.pkl.
+SCALED_WINDOW_COLLECTION = "scaled_windows"
+# --- Backtest (backtest.py) ---
+# Walk-forward evaluation over the stored history: every LOOKBACK_PERIOD window is
+# scored in batches of BACKTEST_BATCH_SIZE and rolled forward BACKTEST_FORECAST_DAYS
+# steps to check main.py's "best day to buy".
+BACKTEST_BATCH_SIZE = 4096
+BACKTEST_FORECAST_DAYS = 5
+BACKTEST_WORKERS = None         # threads scoring batches (None = one per core; Keras always uses 1)
+BACKTEST_TOLERANCE = 1e-3       # max abs price difference vs predict.py's rollout (verify_rollout)
@@ -1,151 +1,231 @@
 # ml_scripts/daily_collector.py
 
-import yfinance as yf
-import pandas as pd
-import pandas_ta as ta
-from datetime import date, timedelta
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta
 import config
-import db_handler
-import time
+import metrics
+import startup_profile
+from startup_profile import lazy_module
 
-def calculate_features(df: pd.DataFrame) -> pd.DataFrame:
+# Heavy modules load on first use; verify_latest_data only needs pandas and db_handler.
+pd = lazy_module("pandas")
+db_handler = lazy_module("db_handler")
+features = lazy_module("features")
+incremental_features = lazy_module("incremental_features")
+market_data = lazy_module("market_data")
+market_calendar = lazy_module("market_calendar")
+scaled_windows = lazy_module("scaled_windows")
+
+def load_progress() -> dict:
     """
-    Calculates all required features for the model, ensuring consistency
-    with the backfill script and trained model features.
-    FEATURES_TO_USE = ['Close', 'Volume', 'RSI_14', 'MACD_12_26_9', 'volatility_20d']
+    Today's checkpoint (config.COLLECTOR_PROGRESS_PATH): {"run_id", "finished", "completed"}
+    of the latest run, or {} when no run was checkpointed today.
     """
-    # --- MODEL KE FEATURES CALCULATE KAREIN ---
-    # 1. RSI (Relative Strength Index)
-    df.ta.rsi(length=14, append=True)
-    
-    # 2. MACD (Moving Average Convergence Divergence)
-    df.ta.macd(fast=12, slow=26, signal=9, append=True)
-    
-    # 3. Volatility (20-day rolling standard deviation of returns)
-    df['returns'] = df['Close'].pct_change()
-    df['volatility_20d'] = df['returns'].rolling(window=20).std()
-    
-    # --- MODEL KE EXACT FEATURES SELECT KAREIN ---
-    required_columns = [
-        'Close', 
-        'Volume', 
-        'RSI_14', 
-        'MACD_12_26_9',  # pandas_ta creates this automatically
-        'volatility_20d'
-    ]
-    
-    # Check karein ki saare columns available hain
-    available_cols = []
-    missing_cols = []
-    
-    for col in required_columns:
-        if col in df.columns:
-            available_cols.append(col)
+    try:
+        with open(config.COLLECTOR_PROGRESS_PATH) as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return progress if progress.get("date") == date.today().isoformat() else {}
+
+def save_progress(run_id: str, completed: set, finished: bool = False):
+    """Records the completed tickers after each one, so an interrupted run can resume."""
+    path = config.COLLECTOR_PROGRESS_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"date": date.today().isoformat(), "run_id": run_id, "finished": finished,
+                   "completed": sorted(completed)}, f)
+    os.replace(path + ".tmp", path)
+
+class CollectionRun:
+    """
+    Bookkeeping of one collection run, shared by the sync and async collectors:
+    per-ticker outcome counters, the resume checkpoint and the --jsonl events.
+    `events` is an optional text stream that receives one JSON line per ticker as
+    soon as it finishes and a final summary line; `resume` continues today's
+    last run if it was interrupted before its summary, skipping the tickers it
+    completed. A finished run is never resumed: a later run fetches every ticker
+    again, e.g. for the closing bar after a run during market hours.
+    """
+
+    def __init__(self, events=None, resume=False, collector="daily"):
+        self.events = events
+        self.collector = collector
+        progress = load_progress() if resume else {}
+        if progress.get("finished"):
+            progress = {}
+        self.run_id = progress.get("run_id") or datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.completed = set(progress.get("completed", []))
+        self.tickers = [ticker for ticker in config.TICKERS if ticker not in self.completed]
+        if self.completed:
+            print(f"⏭️  Resuming run {self.run_id}: {len(self.completed)} ticker(s) already collected")
+        self.summary = {"successful": 0, "failed": 0, "skipped": len(config.TICKERS) - len(self.tickers),
+                        "new_records": 0}
+
+    def _emit(self, event: dict):
+        if self.events is not None:
+            self.events.write(json.dumps(event) + "\n")
+            self.events.flush()
+
+    def report(self, ticker, status, new_records=0, message=None):
+        """Counts one ticker's outcome, checkpoints it and streams it to `events`."""
+        self.summary["new_records"] += new_records
+        if status == "success":
+            self.summary["successful"] += 1
+            self.completed.add(ticker)
+            save_progress(self.run_id, self.completed)
         else:
-            missing_cols.append(col)
-    
-    if missing_cols:
-        print(f"⚠️  Warning: Missing columns: {missing_cols}")
-        print(f"📋 Available columns: {list(df.columns)}")
-    
-    # Sirf available columns ko select karein
-    if available_cols:
-        df_final = df[available_cols].copy()
+            self.summary["failed"] += 1
+            metrics.inc("ticker_failures_total", collector=self.collector, ticker=ticker)
+        event = {"type": "ticker", "ticker": ticker, "status": status, "new_records": new_records}
+        if message:
+            event["message"] = message
+        self._emit(event)
+
+    def finish(self) -> dict:
+        """Prints the summary report, marks the checkpoint finished and emits the summary event."""
+        save_progress(self.run_id, self.completed, finished=True)
+        print(f"\n--- Daily Data Collection Summary ---")
+        print(f"✅ Successful tickers: {self.summary['successful']}")
+        print(f"❌ Failed tickers: {self.summary['failed']}")
+        if self.summary["skipped"]:
+            print(f"⏭️  Skipped (completed before the interruption): {self.summary['skipped']}")
+        print(f"📊 Total new records added: {self.summary['new_records']}")
+        print(f"🎯 Data ready for model predictions!")
+        self._emit({"type": "summary", **self.summary})
+        return self.summary
+
+def fetch_start_dates(states: dict, tickers: list):
+    """
+    (start_date, full_start_date) of the downloads. Tickers with stored indicator
+    state only need the bars since their last run. Otherwise fetch a larger window
+    to calculate indicators accurately (extra days for technical indicators,
+    especially 26-day MACD).
+    """
+    full_start_date = date.today() - timedelta(days=100)
+    if tickers and len(states) == len(tickers):
+        oldest_state_date = min(pd.Timestamp(s["last_date"]).date() for s in states.values())
+        return max(full_start_date, oldest_state_date - timedelta(days=config.INCREMENTAL_OVERLAP_DAYS)), full_start_date
+    return full_start_date, full_start_date
+
+def prepare_records(ticker: str, stock_data, state, full_start_date, source=None):
+    """
+    Turns one ticker's download into the records to save (CPU-bound, no database access).
+    Returns (records, state to store, failure message or None); an empty record list
+    means there is nothing new to save.
+    """
+    if stock_data.empty:
+        return None, state, "No data found"
+
+    bars = incremental_features.new_bars(state, stock_data)
+    # Today's bar is provisional until the close: it is not folded into the stored state.
+    closed_through = market_calendar.last_closed_date()
+
+    if bars is not None:
+        # Incremental path: update the indicators from the bars after the last closed one.
+        with startup_profile.phase("features"), metrics.timer("feature_seconds", path="incremental"):
+            featured_data = incremental_features.apply_bars(state, bars, closed_through).dropna()
+        if featured_data.empty:
+            return [], state, None
     else:
-        print("❌ No required columns found!")
-        return pd.DataFrame()
-        
-    return df_final
+        # Full-recompute fallback (no state yet, or a gap since the last run).
+        if stock_data.index.min().date() > full_start_date + timedelta(days=config.INCREMENTAL_OVERLAP_DAYS):
+            stock_data = market_data.fetch_history(ticker, start=full_start_date, source=source)
+        with startup_profile.phase("features"), metrics.timer("feature_seconds", path="full"):
+            state = incremental_features.state_from_history(ticker, stock_data, closed_through)
+
+            # Calculate features with the shared pipeline (same as backfill_db)
+            featured_data = features.calculate_features(stock_data)
+
+        if featured_data.empty:
+            return None, state, "Failed to calculate features"
+
+        # Drop any rows with NaN values (created by technical indicators)
+        featured_data.dropna(inplace=True)
+
+        if featured_data.empty:
+            return None, state, "No valid data after cleaning"
+
+    # Reset index and add ticker info; dates are stored timezone-naive like backfill_db
+    featured_data.index = features.normalize_dates(featured_data.index).rename('Date')
+    featured_data.reset_index(inplace=True)
+    featured_data['ticker'] = ticker
 
-def collect_latest_data():
+    # Convert to records
+    records = featured_data.to_dict('records')
+
+    # Save only the most recent 5 records (adjust as needed); the
+    # incremental path already produced just the bars since the last run.
+    return (records if bars is not None else records[-5:]), state, None
+
+def collect_latest_data(source=None, events=None, resume=False):
     """
     Fetches latest data, calculates features matching the trained model,
     and saves it to MongoDB for daily predictions.
+    `source` optionally replaces yfinance (see market_data.fetch_histories);
+    `events` and `resume` are described in CollectionRun.
     """
     print("--- Starting Daily Data Collection ---")
     print("📋 Model Features: ['Close', 'Volume', 'RSI_14', 'MACD_12_26_9', 'volatility_20d']")
     
-    collection, client = db_handler.get_db_collection()
-    total_new_records = 0
-    successful_tickers = 0
-    failed_tickers = 0
+    run = CollectionRun(events, resume)
+    collection = db_handler.get_db_collection()
+    state_collection = incremental_features.get_state_collection(collection.database)
+    states = incremental_features.load_states(state_collection, run.tickers)
+    start_date, full_start_date = fetch_start_dates(states, run.tickers)
     
-    for ticker in config.TICKERS:
+    # Downloads run concurrently; each ticker is processed as soon as its data arrives.
+    for ticker, stock_data, fetch_error in startup_profile.timed_iter("fetch", market_data.fetch_histories(
+            run.tickers, start=start_date, source=source)):
         try:
             print(f"📈 Processing {ticker}...")
             
-            # Fetch larger window to calculate indicators accurately
-            # Need extra days for technical indicators (especially 26-day MACD)
-            start_date = date.today() - timedelta(days=100) 
-            stock_data = yf.Ticker(ticker).history(start=start_date)
-            
-            if stock_data.empty:
-                print(f"❌ No data found for {ticker}")
-                failed_tickers += 1
-                continue
-
-            # Calculate features using updated function
-            featured_data = calculate_features(stock_data)
+            if fetch_error is not None:
+                raise fetch_error
             
-            if featured_data.empty:
-                print(f"❌ Failed to calculate features for {ticker}")
-                failed_tickers += 1
+            recent_records, state, failure = prepare_records(ticker, stock_data, states.get(ticker),
+                                                             full_start_date, source)
+            if failure:
+                print(f"❌ {failure} for {ticker}")
+                run.report(ticker, "failed", message=failure)
                 continue
-            
-            # Drop any rows with NaN values (created by technical indicators)
-            featured_data.dropna(inplace=True)
-            
-            if featured_data.empty:
-                print(f"❌ No valid data after cleaning for {ticker}")
-                failed_tickers += 1
+            if not recent_records:
+                print(f"ℹ️  No new records to save for {ticker}")
+                run.report(ticker, "success")
                 continue
-
-            # Reset index and add ticker info
-            featured_data.reset_index(inplace=True)
-            featured_data['ticker'] = ticker
-            
-            # Convert to records
-            records = featured_data.to_dict('records')
-            
-            # Save only the most recent 5 records (adjust as needed)
-            recent_records = records[-5:] if len(records) >= 5 else records
             
             # Save to database
-            new_records_count = db_handler.save_data_to_db(collection, recent_records)
-            total_new_records += new_records_count
+            with startup_profile.phase("db_write"):
+                new_records_count = db_handler.save_data_to_db(collection, recent_records)
+                incremental_features.save_state(state_collection, state)
             
             if new_records_count > 0:
                 print(f"✅ Saved {new_records_count} new record(s) for {ticker}")
-                successful_tickers += 1
             else:
                 print(f"ℹ️  No new records to save for {ticker}")
-                successful_tickers += 1
-            
-            # Be polite to the API
-            time.sleep(0.5)
+            run.report(ticker, "success", new_records_count)
 
         except Exception as e:
             print(f"❌ Error processing {ticker}: {e}")
-            failed_tickers += 1
+            run.report(ticker, "failed", message=str(e))
             continue
-            
-    client.close()
     
-    # Summary report
-    print(f"\n--- Daily Data Collection Summary ---")
-    print(f"✅ Successful tickers: {successful_tickers}")
-    print(f"❌ Failed tickers: {failed_tickers}")
-    print(f"📊 Total new records added: {total_new_records}")
-    print(f"🎯 Data ready for model predictions!")
+    # Ready-to-use scaled model inputs for the tickers whose data is now current.
+    with startup_profile.phase("db_write"):
+        scaled_windows.refresh(collection, sorted(run.completed))
+
+    return run.finish()
 
 def verify_latest_data():
     """Verify the latest collected data structure and show sample."""
     print("\n--- Verifying Latest Data ---")
     
-    collection, client = db_handler.get_db_collection()
+    collection = db_handler.get_db_collection()
     
     # Get latest record for verification
-    latest_record = collection.find_one(sort=[("Date", -1)])
+    latest_record = db_handler.fetch_latest_record(collection)
     
     if latest_record:
         print("✅ Latest record structure:")
@@ -169,25 +249,31 @@ def verify_latest_data():
         print("❌ No records found in database")
     
     # Count records per ticker
-    pipeline = [
-        {"$group": {"_id": "$ticker", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    
-    ticker_counts = list(collection.aggregate(pipeline))
+    ticker_counts = db_handler.count_records_per_ticker(collection)
     if ticker_counts:
         print(f"\n📈 Records per ticker:")
         for item in ticker_counts[:5]:  # Show top 5
             print(f"   {item['_id']}: {item['count']} records")
-    
-    client.close()
 
 if __name__ == "__main__":
-    print("🚀 Daily Stock Data Collection")
-    print("🕒 Starting collection process...")
+    # --verify-only skips collection; --profile-startup reports per-phase timings on stderr,
+    # --metrics[=json|prometheus] the hot-path metrics.
+    # --jsonl streams one JSON line per ticker and a summary line on stdout (the log
+    # goes to stderr); --resume continues today's run if it was interrupted.
+    args = metrics.enable_from_argv(startup_profile.enable_from_argv(sys.argv[1:]))
+    events = None
+    if "--jsonl" in args:
+        events, sys.stdout = sys.stdout, sys.stderr
     
-    # Collect latest data
-    collect_latest_data()
+    if "--verify-only" not in args:
+        print("🚀 Daily Stock Data Collection")
+        print("🕒 Starting collection process...")
+
+        # Collect latest data
+        collect_latest_data(events=events, resume="--resume" in args)
     
     # Verify the collected data
-    verify_latest_data()
\ No newline at end of file
+    with startup_profile.phase("verify"):
+        verify_latest_data()
+    startup_profile.emit()
+    metrics.emit()
@@ -0,0 +1,58 @@
+# ml_scripts/data_handler.py
+
+import pandas as pd
+import config
+import db_handler
+import incremental_features
+
+def _as_feature_frame(window: pd.DataFrame) -> pd.DataFrame:
+    """DB window -> FEATURES_TO_USE frame indexed by Date (what the forecaster expects)."""
+    frame = window.set_index(pd.to_datetime(window['Date']))[config.FEATURES_TO_USE]
+    frame.index.name = 'Date'
+    return frame
+
+def get_latest_data(ticker: str, num_records: int) -> pd.DataFrame:
+    """
+    Returns the most recent N feature rows of a ticker from MongoDB, indexed by Date.
+    Raises ValueError if the ticker has too little data.
+    """
+    windows, short = get_latest_windows([ticker], num_records)
+    if ticker in short:
+        raise ValueError(short[ticker])
+    return windows[ticker]
+
+def get_latest_windows(tickers, num_records: int):
+    """
+    Fetches the most recent N feature rows (indexed by Date) of many tickers with one query.
+    Returns (ticker -> window, ticker -> message for the tickers with too little data).
+    """
+    collection = db_handler.get_db_collection()
+    windows = db_handler.fetch_windows_from_db(collection, tickers, num_records)
+
+    latest, short = {}, {}
+    for ticker in tickers:
+        window = windows.get(ticker)
+        found = 0 if window is None else len(window)
+        if found < num_records:
+            short[ticker] = f"Insufficient data in DB for {ticker}. Need {num_records}, found {found}."
+        else:
+            latest[ticker] = _as_feature_frame(window)
+    return latest, short
+
+def get_feature_states(windows: dict) -> dict:
+    """
+    Returns ticker -> incremental indicator state positioned at the last bar of its window.
+    Uses the daily collector's stored state when it matches that bar; otherwise
+    replays the window's Close prices (indicators then warm up from the window start).
+    """
+    state_collection = incremental_features.get_state_collection(db_handler.get_database())
+    stored = incremental_features.load_states(state_collection, list(windows))
+
+    states = {}
+    for ticker, window in windows.items():
+        state = stored.get(ticker)
+        last_date = incremental_features.to_state_date(window.index[-1])
+        if state is None or pd.Timestamp(state["last_date"]) != pd.Timestamp(last_date):
+            state = incremental_features.state_from_history(ticker, window)
+        states[ticker] = state
+    return states
@@ -1,46 +1,407 @@
 # ml_scripts/db_handler.py
 
-from pymongo import MongoClient
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+import numpy as np
 import pandas as pd
 import config
+import feature_store
+import metrics
+import prediction_cache
+import startup_profile
+
+# Process-wide connection manager: one pooled MongoClient per process (re-created
+# after a fork) and index creation done once per collection.
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_ensured_indexes = set()
+
+def get_client() -> MongoClient:
+    """Returns the process-wide pooled MongoClient, creating it on first use."""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = MongoClient(
+                    config.MONGO_URI,
+                    maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+                    minPoolSize=config.MONGO_MIN_POOL_SIZE,
+                    serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    connectTimeoutMS=config.MONGO_CONNECT_TIMEOUT_MS,
+                    socketTimeoutMS=config.MONGO_SOCKET_TIMEOUT_MS,
+                )
+                _client_pid = os.getpid()
+                _ensured_indexes.clear()
+    return _client
+
+def close_client():
+    """Closes the pooled client (registered to run at interpreter exit)."""
+    global _client
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+
+atexit.register(close_client)
+
+def ensure_index(collection, keys, **kwargs):
+    """create_index, but only once per process for a given collection and key spec."""
+    cache_key = (collection.full_name, repr(keys), repr(sorted(kwargs.items())))
+    if cache_key not in _ensured_indexes:
+        collection.create_index(keys, **kwargs)
+        _ensured_indexes.add(cache_key)
+
+def get_database():
+    """Returns the application database on the pooled client (None with the "npy" backend)."""
+    if config.STORAGE_BACKEND == "npy":
+        return None
+    return get_client()[config.DATABASE_NAME]
+
+def get_feature_store() -> feature_store.FeatureStore:
+    """Returns the columnar feature store used when config.STORAGE_BACKEND is "npy"."""
+    return feature_store.FeatureStore(config.FEATURE_STORE_PATH)
 
 def get_db_collection():
-    """Establishes a connection to MongoDB and returns the collection object."""
-    client = MongoClient(config.MONGO_URI)
-    db = client[config.DATABASE_NAME]
-    collection = db[config.COLLECTION_NAME]
-    # Create an index to prevent duplicates and speed up queries
-    collection.create_index([("Date", 1), ("ticker", 1)], unique=True)
-    return collection, client
-
-def save_data_to_db(collection, data_records):
-    """Saves a list of data records to the database, avoiding duplicates."""
+    """
+    Returns the daily-data collection on the pooled client. The client is shared by the
+    whole process and closed at interpreter exit (close_client): callers never close it.
+    With the "npy" storage backend the "collection" is a FeatureStore;
+    the functions below accept either.
+    """
+    if config.STORAGE_BACKEND == "npy":
+        return get_feature_store()
+    with startup_profile.phase("mongo_connect"):
+        client = get_client()
+        collection = client[config.DATABASE_NAME][config.COLLECTION_NAME]
+        # Create an index to prevent duplicates and speed up queries
+        ensure_index(collection, [("Date", 1), ("ticker", 1)], unique=True)
+        # Serves the per-ticker "latest N bars" lookups (equality on ticker, sort on Date).
+        ensure_index(collection, [("ticker", 1), ("Date", -1)])
+    return collection
+
+@metrics.timed("db_write_seconds")
+def save_data_to_db(collection, data_records, chunk_size=config.DB_WRITE_CHUNK_SIZE,
+                    max_retries=config.DB_WRITE_MAX_RETRIES):
+    """
+    Saves a list of data records to the database, avoiding duplicates.
+    Records are upserted on (Date, ticker) through unordered bulk writes of
+    `chunk_size` operations; a failed chunk is retried up to `max_retries` times.
+    Returns the number of newly inserted records.
+    """
     if not data_records:
         return 0
     
+    if isinstance(collection, feature_store.FeatureStore):
+        upsert_count = collection.upsert(data_records)
+        written(None, {record["ticker"] for record in data_records}, upsert_count)
+        return upsert_count
+
     upsert_count = 0
-    for record in data_records:
-        # update_one with upsert=True is the key to avoiding duplicates.
-        # It finds a document with the same Date & ticker and updates it,
-        # or inserts a new one if it doesn't exist.
-        result = collection.update_one(
-            {"Date": record["Date"], "ticker": record["ticker"]},
-            {"$set": record},
-            upsert=True
-        )
-        if result.upserted_id:
-            upsert_count += 1
+    for start in range(0, len(data_records), chunk_size):
+        operations = upsert_operations(data_records[start:start + chunk_size])
+        upsert_count += _bulk_write_with_retry(collection, operations, max_retries)
+
+    written(collection.database, {record["ticker"] for record in data_records}, upsert_count)
             
     return upsert_count
 
+def written(db, tickers, upsert_count: int):
+    """Bookkeeping after every write, by either driver: data revisions, cache invalidation and the upsert count."""
+    # New or revised bars change the lookback windows of these tickers.
+    if db is not None:
+        record_revisions(db[config.COLLECTION_NAME], tickers)
+        # Their scaled windows (scaled_windows.py, one document per ticker) are stale until the
+        # collector's refresh; npy entries are rejected by their revision instead.
+        db[config.SCALED_WINDOW_COLLECTION].delete_many({"_id": {"$in": list(tickers)}})
+    prediction_cache.invalidate_tickers(db, tickers)
+    metrics.inc("db_records_upserted_total", upsert_count)
+
+def record_revisions(collection, tickers, seed: bool = False):
+    """
+    Upserts the revision document of each ticker (config.DATA_REVISION_COLLECTION): its
+    latest Date, read from the (ticker, Date) index, the time of the write and a write
+    counter, which fetch_data_revisions combines into the data revision (two writes in
+    the same millisecond still differ). seed=True fills in tickers stored before
+    revisions were recorded and never overwrites an existing document.
+    """
+    updated_at = datetime.now(timezone.utc)
+    operations = []
+    for ticker in tickers:
+        latest = collection.find_one({"ticker": ticker}, {"_id": 0, "Date": 1}, sort=[("Date", -1)])
+        if latest is None:
+            continue
+        if seed:
+            update = {"$setOnInsert": {"Date": latest["Date"], "updated_at": updated_at, "writes": 0}}
+        else:
+            # $max: a concurrent writer of later bars is never rolled back.
+            update = {"$max": {"Date": latest["Date"]}, "$set": {"updated_at": updated_at}, "$inc": {"writes": 1}}
+        operations.append(UpdateOne({"_id": ticker}, update, upsert=True))
+    if operations:
+        collection.database[config.DATA_REVISION_COLLECTION].bulk_write(operations, ordered=False)
+
+def upsert_operations(records) -> list:
+    """
+    UpdateOne with upsert=True is the key to avoiding duplicates.
+    It finds a document with the same Date & ticker and updates it,
+    or inserts a new one if it doesn't exist. `updated_at` marks the write;
+    the ticker's data revision is recorded separately (written / record_revisions).
+    """
+    updated_at = datetime.now(timezone.utc)
+    return [
+        UpdateOne({"Date": record["Date"], "ticker": record["ticker"]},
+                  {"$set": {**record, "updated_at": updated_at}}, upsert=True)
+        for record in records
+    ]
+
+# Bulk-write retry policy, shared with async_collector.AsyncMongoWriter: a failed chunk
+# is retried whole (upserts are idempotent) after a linearly growing delay.
+RETRYABLE_WRITE_ERRORS = (BulkWriteError, AutoReconnect)
+
+def upserted_before_failure(error) -> int:
+    """Operations that succeeded before a bulk write failed still count as inserts."""
+    return error.details.get("nUpserted", 0) if isinstance(error, BulkWriteError) else 0
+
+def retry_delay(error, attempt: int, max_retries: int) -> float:
+    """Counts a failed attempt and returns the delay before the next one; re-raises after the last."""
+    metrics.inc("db_write_errors_total")
+    if attempt == max_retries:
+        raise error
+    print(f"⚠️  Bulk write failed ({error}), retrying chunk ({attempt + 1}/{max_retries})...")
+    return config.DB_WRITE_RETRY_DELAY * (attempt + 1)
+
+def _bulk_write_with_retry(collection, operations, max_retries):
+    """Runs one unordered bulk write under the retry policy. Returns the number of upserts."""
+    upserted = 0
+    for attempt in range(max_retries + 1):
+        try:
+            result = collection.bulk_write(operations, ordered=False)
+            return upserted + result.upserted_count
+        except RETRYABLE_WRITE_ERRORS as e:
+            upserted += upserted_before_failure(e)
+            time.sleep(retry_delay(e, attempt, max_retries))
+
+# --- Compact ingest: float32 column arrays and categorical tickers ---
+
+def ticker_dtype(tickers) -> pd.CategoricalDtype:
+    """One categorical dtype for a universe: frames built with it concatenate without object columns."""
+    return pd.CategoricalDtype(sorted(set(tickers)))
+
+def compact_panel(panel: pd.DataFrame, columns=config.FEATURE_STORE_COLUMNS) -> pd.DataFrame:
+    """
+    The Date, ticker and stored `columns` of a long-format panel in the ingest layout:
+    tickers as categorical codes, values as config.INGEST_FLOAT_DTYPE. Other columns are dropped.
+    """
+    tickers = panel["ticker"]
+    compact = pd.DataFrame({
+        "Date": panel["Date"].to_numpy(dtype="datetime64[ns]"),
+        "ticker": tickers.array if isinstance(tickers.dtype, pd.CategoricalDtype) else pd.Categorical(tickers),
+    })
+    for column in columns:
+        if column in panel:
+            compact[column] = panel[column].to_numpy(dtype=config.INGEST_FLOAT_DTYPE)
+    return compact
+
+@metrics.timed("db_write_seconds")
+def save_panel(collection, panel: pd.DataFrame, chunk_size=config.DB_WRITE_CHUNK_SIZE,
+               max_retries=config.DB_WRITE_MAX_RETRIES) -> int:
+    """
+    Upserts a long-format panel (Date, ticker and stored columns, e.g. from compact_panel)
+    like save_data_to_db, but straight from its column arrays: the update documents of
+    one chunk exist at a time instead of one dict per row for the whole panel.
+    Returns the number of newly inserted records.
+    """
+    if panel.empty:
+        return 0
+    columns = [column for column in config.FEATURE_STORE_COLUMNS if column in panel]
+    tickers = panel["ticker"].astype("category")
+    codes, names = tickers.cat.codes.to_numpy(), tickers.cat.categories
+    dates = panel["Date"].to_numpy(dtype="datetime64[ns]")
+    present = names[np.unique(codes)]
+
+    if isinstance(collection, feature_store.FeatureStore):
+        # Stored values are float64; missing columns are NaN, as with save_data_to_db.
+        indices = [collection.columns.index(column) for column in columns]
+        panel_values = panel[columns].to_numpy()
+        upsert_count = 0
+        for code in np.unique(codes):
+            rows = np.flatnonzero(codes == code)
+            values = np.full((len(rows), len(collection.columns)), np.nan)
+            values[:, indices] = panel_values[rows]
+            upsert_count += collection.upsert_arrays(names[code], dates[rows], values)
+        written(None, present, upsert_count)
+        return upsert_count
+
+    upsert_count = 0
+    updated_at = datetime.now(timezone.utc)
+    arrays = [panel[column].to_numpy() for column in columns]
+    for start in range(0, len(panel), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        chunk_dates = pd.DatetimeIndex(dates[chunk]).to_pydatetime()
+        chunk_tickers = names[codes[chunk]]
+        chunk_values = [array[chunk].astype(np.float64).tolist() for array in arrays]
+        operations = []
+        for row, (bar_date, ticker) in enumerate(zip(chunk_dates, chunk_tickers)):
+            document = {"Date": bar_date, "ticker": ticker, "updated_at": updated_at,
+                        **{column: values[row] for column, values in zip(columns, chunk_values)}}
+            operations.append(UpdateOne({"Date": bar_date, "ticker": ticker}, {"$set": document}, upsert=True))
+        upsert_count += _bulk_write_with_retry(collection, operations, max_retries)
+
+    written(collection.database, present, upsert_count)
+    return upsert_count
+
+def window_projection(features=config.FEATURES_TO_USE) -> dict:
+    """Only the model inputs and the bar date are read back; _id, quality scores etc. stay on the server."""
+    return {"_id": 0, "Date": 1, **{feature: 1 for feature in features}}
+
+@metrics.timed("db_fetch_seconds", op="window")
+def fetch_window_arrays(collection, ticker, num_records, features=config.FEATURES_TO_USE):
+    """
+    Fetches the most recent N records for a ticker as NumPy arrays:
+    (dates as datetime64[ns], values of shape (N, len(features)) in chronological order).
+    Documents are decoded straight into preallocated arrays; the cursor walks the
+    (ticker, Date) index newest-first, so rows are filled from the end and need no sort.
+    """
+    if isinstance(collection, feature_store.FeatureStore):
+        dates, values = collection.window(ticker, num_records, features)
+        if len(dates) < num_records:
+            raise ValueError(f"Insufficient data in DB for {ticker}. Need {num_records}, found {len(dates)}.")
+        return dates, values
+
+    cursor = (collection.find({"ticker": ticker}, window_projection(features))
+              .sort("Date", -1).limit(num_records).batch_size(num_records))
+
+    dates = np.empty(num_records, dtype="datetime64[ns]")
+    values = np.empty((num_records, len(features)), dtype=np.float64)
+    row = num_records
+    for doc in cursor:
+        row -= 1
+        dates[row] = doc["Date"]
+        values[row] = [doc.get(feature, np.nan) for feature in features]
+
+    found = num_records - row
+    if found < num_records:
+        raise ValueError(f"Insufficient data in DB for {ticker}. Need {num_records}, found {found}.")
+    return dates, values
+
 def fetch_data_from_db(collection, ticker, num_records):
-    """Fetches the most recent N records for a ticker from the database."""
-    cursor = collection.find({"ticker": ticker}).sort("Date", -1).limit(num_records)
-    data = list(cursor)
-    
-    if len(data) < num_records:
-        raise ValueError(f"Insufficient data in DB for {ticker}. Need {num_records}, found {len(data)}.")
-        
-    # Convert to DataFrame and sort chronologically
-    df = pd.DataFrame(data).sort_values(by="Date").reset_index(drop=True)
-    return df
\ No newline at end of file
+    """Fetches the most recent N records (Date + FEATURES_TO_USE) for a ticker, oldest first."""
+    dates, values = fetch_window_arrays(collection, ticker, num_records)
+    df = pd.DataFrame(values, columns=config.FEATURES_TO_USE)
+    df.insert(0, "Date", dates)
+    return df
+
+@metrics.timed("db_fetch_seconds", op="latest_dates")
+def fetch_data_revisions(collection, tickers):
+    """
+    Returns a dict of ticker -> (Date of its most recent record, data revision), from one
+    query on the per-ticker revision documents. The revision is the time of the ticker's
+    latest write, so it also changes when an already stored bar is revised.
+    """
+    if isinstance(collection, feature_store.FeatureStore):
+        return collection.revisions(tickers)
+    tickers = list(tickers)
+    revisions = collection.database[config.DATA_REVISION_COLLECTION]
+    docs = {doc["_id"]: doc for doc in revisions.find({"_id": {"$in": tickers}})}
+    unrecorded = [ticker for ticker in tickers if ticker not in docs]
+    if unrecorded:
+        # Stored before revisions were recorded: seeded once, from the (ticker, Date) index.
+        record_revisions(collection, unrecorded, seed=True)
+        docs.update({doc["_id"]: doc for doc in revisions.find({"_id": {"$in": unrecorded}})})
+    return {ticker: (doc["Date"], f"{doc['updated_at'].isoformat()}#{doc['writes']}") for ticker, doc in docs.items()}
+
+@metrics.timed("db_fetch_seconds", op="windows")
+def fetch_windows_from_db(collection, tickers, num_records):
+    """
+    Fetches the most recent N records for many tickers, one newest-first query per
+    ticker on the (ticker, Date) index, so only N documents per ticker are read.
+    Returns a dict of ticker -> chronologically sorted DataFrame; tickers without
+    any data are missing from the dict and callers must check the window lengths.
+    """
+    if isinstance(collection, feature_store.FeatureStore):
+        windows = {}
+        for ticker in tickers:
+            dates, values = collection.window(ticker, num_records)
+            if len(dates):
+                windows[ticker] = pd.DataFrame(values, columns=config.FEATURES_TO_USE)
+                windows[ticker].insert(0, "Date", dates)
+        return windows
+
+    windows = {}
+    for ticker in tickers:
+        rows = list(collection.find({"ticker": ticker}, window_projection())
+                    .sort("Date", -1).limit(num_records).batch_size(num_records))
+        if rows:
+            windows[ticker] = pd.DataFrame(rows[::-1])
+    return windows
+
+@metrics.timed("db_fetch_seconds", op="history")
+def fetch_feature_history(collection, tickers, features=config.FEATURES_TO_USE) -> dict:
+    """
+    Full stored history of many tickers in one pass over the collection.
+    Returns ticker -> (dates as datetime64[ns], values of shape (n, len(features))), oldest first;
+    tickers without data are missing. With the npy backend the values are memory-mapped.
+    """
+    if isinstance(collection, feature_store.FeatureStore):
+        history = {}
+        for ticker in tickers:
+            count = len(collection.read(ticker)[0])
+            if count:
+                history[ticker] = collection.window(ticker, count, features)
+        return history
+
+    cursor = (collection.find({"ticker": {"$in": list(tickers)}}, {**window_projection(features), "ticker": 1})
+              .sort([("ticker", 1), ("Date", 1)]).batch_size(10_000))
+    rows = {}
+    for doc in cursor:
+        dates, values = rows.setdefault(doc["ticker"], ([], []))
+        dates.append(doc["Date"])
+        values.append([doc.get(feature, np.nan) for feature in features])
+    return {ticker: (np.array(dates, dtype="datetime64[ns]"), np.array(values, dtype=np.float64))
+            for ticker, (dates, values) in rows.items()}
+
+def fetch_latest_record(collection):
+    """The most recent record in the store (any ticker), or None if it is empty."""
+    if isinstance(collection, feature_store.FeatureStore):
+        return collection.latest_record()
+    return collection.find_one(sort=[("Date", -1)])
+
+def count_records_per_ticker(collection) -> list:
+    """[{"_id": ticker, "count": n}, ...] sorted by count, largest first."""
+    if isinstance(collection, feature_store.FeatureStore):
+        counts = [{"_id": ticker, "count": count} for ticker, count in collection.count_records().items()]
+        return sorted(counts, key=lambda item: item["count"], reverse=True)
+    pipeline = [
+        {"$group": {"_id": "$ticker", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}}
+    ]
+    return list(collection.aggregate(pipeline))
+
+# --- Backfill checkpoints (one entry per completed ticker/date chunk) ---
+
+def load_backfill_checkpoints(collection) -> set:
+    """Ids of the backfill chunks already completed against this store."""
+    if isinstance(collection, feature_store.FeatureStore):
+        path = os.path.join(collection.root, "backfill_checkpoints.jsonl")
+        if not os.path.exists(path):
+            return set()
+        with open(path) as f:
+            return {json.loads(line)["_id"] for line in f if line.strip()}
+    checkpoints = collection.database[config.BACKFILL_CHECKPOINT_COLLECTION]
+    return {doc["_id"] for doc in checkpoints.find({}, {"_id": 1})}
+
+def save_backfill_checkpoint(collection, checkpoint: dict):
+    """Records a completed chunk; `checkpoint["_id"]` identifies it."""
+    if isinstance(collection, feature_store.FeatureStore):
+        os.makedirs(collection.root, exist_ok=True)
+        with open(os.path.join(collection.root, "backfill_checkpoints.jsonl"), "a") as f:
+            f.write(json.dumps(checkpoint, default=str) + "\n")
+        return
+    checkpoints = collection.database[config.BACKFILL_CHECKPOINT_COLLECTION]
+    checkpoints.replace_one({"_id": checkpoint["_id"]}, checkpoint, upsert=True)
@@ -0,0 +1,255 @@
+# ml_scripts/feature_store.py
+"""
+Columnar on-disk feature store, the "npy" alternative to the nifty50_daily
+collection (config.STORAGE_BACKEND). Each ticker is a partition directory:
+
+    <FEATURE_STORE_PATH>/<TICKER>/Date.npy     datetime64[ns], shape (n,)
+    <FEATURE_STORE_PATH>/<TICKER>/values.npy   float64, shape (n, len(FEATURE_STORE_COLUMNS))
+    <FEATURE_STORE_PATH>/<TICKER>/state.json   incremental feature state
+
+Rows are kept sorted by Date. Reads memory-map the files, so a lookback window
+is a zero-copy slice of the tail. Appending bars newer than the last stored one
+rewrites the .npy header in place and writes only the new rows; revising
+existing bars overwrites them in place; only an out-of-order insert rewrites
+the partition. db_handler dispatches to this class when the backend is "npy".
+
+    python3 ml_scripts/feature_store.py --import-mongo   # copy nifty50_daily into the store
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+import config
+
+DATES_FILE = "Date.npy"
+VALUES_FILE = "values.npy"
+STATE_FILE = "state.json"
+
+def _append_npy(path: str, rows: np.ndarray) -> bool:
+    """
+    Appends rows to a C-ordered .npy file along axis 0 without rewriting it.
+    Returns False when the header cannot be rewritten in place (caller rewrites the file).
+    """
+    with open(path, "r+b") as f:
+        if np.lib.format.read_magic(f) != (1, 0):
+            return False
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        if fortran_order or dtype != rows.dtype or shape[1:] != rows.shape[1:]:
+            return False
+        data_offset = f.tell()
+
+        # numpy pads the header so the row count can grow without changing its length.
+        f.seek(0)
+        header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False,
+                  "shape": (shape[0] + len(rows),) + shape[1:]}
+        np.lib.format.write_array_header_1_0(f, header)
+        if f.tell() != data_offset:
+            # Header grew: restore it and let the caller rewrite the file.
+            f.seek(0)
+            np.lib.format.write_array_header_1_0(f, {**header, "shape": shape})
+            return False
+
+        f.seek(data_offset + shape[0] * dtype.itemsize * int(np.prod(shape[1:], dtype=np.int64)))
+        f.write(np.ascontiguousarray(rows).tobytes())
+    return True
+
+def _save_npy(path: str, array: np.ndarray):
+    """Writes a whole .npy file atomically (temp file + rename)."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+class FeatureStore:
+    """Per-ticker columnar feature series stored as memory-mapped .npy files."""
+
+    # There is no MongoDB behind the store: the prediction cache keeps only its
+    # in-process tier and incremental states live in state.json (see StateFiles).
+    database = None
+
+    def __init__(self, root: str = config.FEATURE_STORE_PATH, columns=config.FEATURE_STORE_COLUMNS):
+        self.root = root
+        self.columns = list(columns)
+        self.full_name = f"npy:{os.path.abspath(root)}"
+
+    def _partition(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker)
+
+    def tickers(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, name, DATES_FILE)))
+
+    def read(self, ticker: str):
+        """
+        Returns (dates, values) of a ticker as read-only memory maps (empty arrays if absent).
+        Date.npy is the row count: values.npy rows beyond it (an append torn between the two
+        files) are not returned.
+        """
+        partition = self._partition(ticker)
+        if not os.path.exists(os.path.join(partition, DATES_FILE)):
+            return np.empty(0, dtype="datetime64[ns]"), np.empty((0, len(self.columns)))
+        dates = np.load(os.path.join(partition, DATES_FILE), mmap_mode="r")
+        values = np.load(os.path.join(partition, VALUES_FILE), mmap_mode="r")
+        return dates, values[:len(dates)]
+
+    def window(self, ticker: str, num_records: int, features=config.FEATURES_TO_USE):
+        """
+        The most recent `num_records` rows of the given feature columns, oldest first.
+        A zero-copy view when the features are consecutive stored columns (FEATURES_TO_USE are).
+        """
+        dates, values = self.read(ticker)
+        indices = [self.columns.index(feature) for feature in features]
+        if indices == list(range(indices[0], indices[0] + len(indices))):
+            selected = values[-num_records:, indices[0]:indices[-1] + 1]
+        else:
+            selected = values[-num_records:, indices]
+        return dates[-num_records:], selected
+
+    def to_frame(self, ticker: str) -> pd.DataFrame:
+        """Full history of a ticker as a DataFrame (Date column + stored columns), for offline analysis."""
+        dates, values = self.read(ticker)
+        df = pd.DataFrame(np.asarray(values), columns=self.columns)
+        df.insert(0, "Date", np.asarray(dates))
+        return df
+
+    def revisions(self, tickers) -> dict:
+        """ticker -> (last Date, revision): values.npy's modification time changes with every write."""
+        revisions = {}
+        for ticker in tickers:
+            dates, _ = self.read(ticker)
+            if len(dates):
+                stamp = os.stat(os.path.join(self._partition(ticker), VALUES_FILE)).st_mtime_ns
+                revisions[ticker] = (pd.Timestamp(dates[-1]).to_pydatetime(), str(stamp))
+        return revisions
+
+    def upsert(self, records) -> int:
+        """Upserts records on (Date, ticker), like save_data_to_db. Returns the number of new rows."""
+        by_ticker = {}
+        for record in records:
+            by_ticker.setdefault(record["ticker"], []).append(record)
+
+        inserted = 0
+        for ticker, ticker_records in by_ticker.items():
+            dates = pd.to_datetime([r["Date"] for r in ticker_records]).to_numpy(dtype="datetime64[ns]")
+            values = np.array([[r.get(c, np.nan) for c in self.columns] for r in ticker_records], dtype=np.float64)
+            inserted += self.upsert_arrays(ticker, dates, values)
+        return inserted
+
+    def upsert_arrays(self, ticker: str, dates: np.ndarray, values: np.ndarray) -> int:
+        """Upserts one ticker's rows given as arrays (values in self.columns order). Returns the new rows."""
+        # Later rows win for duplicate dates, as with successive Mongo upserts.
+        unique_dates, last_index = np.unique(np.asarray(dates, dtype="datetime64[ns]")[::-1], return_index=True)
+        return self._upsert_partition(ticker, unique_dates, np.asarray(values, dtype=np.float64)[::-1][last_index])
+
+    def _upsert_partition(self, ticker: str, dates: np.ndarray, values: np.ndarray) -> int:
+        partition = self._partition(ticker)
+        dates_path = os.path.join(partition, DATES_FILE)
+        values_path = os.path.join(partition, VALUES_FILE)
+        if not os.path.exists(dates_path):
+            os.makedirs(partition, exist_ok=True)
+            _save_npy(values_path, values)
+            _save_npy(dates_path, dates)
+            return len(dates)
+
+        stored_dates = np.load(dates_path, mmap_mode="r")
+        if np.load(values_path, mmap_mode="r").shape[0] != len(stored_dates):
+            # A previous append stopped after values.npy: drop its rows before writing new ones.
+            _save_npy(values_path, np.load(values_path)[:len(stored_dates)])
+        positions = np.searchsorted(stored_dates, dates)
+        exists = (positions < len(stored_dates)) & (stored_dates[np.minimum(positions, len(stored_dates) - 1)] == dates)
+        newer = ~exists & (positions == len(stored_dates))
+        if (~exists & ~newer).any():
+            # Out-of-order insert: merge and rewrite the partition.
+            stored_values = np.load(values_path)
+            merged_dates = np.concatenate([np.asarray(stored_dates), dates[~exists]])
+            merged_values = np.concatenate([stored_values, values[~exists]])
+            merged_values[positions[exists]] = values[exists]
+            order = np.argsort(merged_dates, kind="stable")
+            del stored_dates
+            _save_npy(values_path, merged_values[order])
+            _save_npy(dates_path, merged_dates[order])
+            return int((~exists).sum())
+
+        if exists.any():
+            stored_values = np.load(values_path, mmap_mode="r+")
+            stored_values[positions[exists]] = values[exists]
+            stored_values.flush()
+            del stored_values
+        del stored_dates
+        if newer.any():
+            # values first: read() sizes everything by Date.npy, which must never run ahead.
+            if not _append_npy(values_path, values[newer]):
+                _save_npy(values_path, np.concatenate([np.load(values_path), values[newer]]))
+            if not _append_npy(dates_path, dates[newer]):
+                _save_npy(dates_path, np.concatenate([np.load(dates_path), dates[newer]]))
+        return int(newer.sum())
+
+    def latest_record(self):
+        """The row with the most recent Date across all tickers, as a dict (None if empty)."""
+        latest = None
+        for ticker in self.tickers():
+            dates, values = self.read(ticker)
+            if len(dates) and (latest is None or dates[-1] > latest["Date"]):
+                latest = {"Date": dates[-1], "ticker": ticker, **dict(zip(self.columns, values[-1].tolist()))}
+        if latest is not None:
+            latest["Date"] = pd.Timestamp(latest["Date"]).to_pydatetime()
+        return latest
+
+    def count_records(self) -> dict:
+        return {ticker: len(self.read(ticker)[0]) for ticker in self.tickers()}
+
+class StateFiles:
+    """Incremental feature states stored next to each partition as state.json."""
+
+    def __init__(self, root: str = config.FEATURE_STORE_PATH):
+        self.root = root
+
+    def load(self, tickers) -> dict:
+        states = {}
+        for ticker in tickers:
+            path = os.path.join(self.root, ticker, STATE_FILE)
+            if os.path.exists(path):
+                with open(path) as f:
+                    state = json.load(f)
+                if state.get("last_date") is not None:
+                    state["last_date"] = pd.Timestamp(state["last_date"]).to_pydatetime()
+                states[ticker] = state
+        return states
+
+    def save(self, state: dict):
+        partition = os.path.join(self.root, state["ticker"])
+        os.makedirs(partition, exist_ok=True)
+        path = os.path.join(partition, STATE_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({**state, "last_date": None if state["last_date"] is None else state["last_date"].isoformat()}, f)
+        os.replace(path + ".tmp", path)
+
+def import_from_mongo(store: FeatureStore = None) -> int:
+    """Copies every row of the nifty50_daily collection into the store. Returns the rows written."""
+    from db_handler import get_client
+
+    store = store or FeatureStore()
+    collection = get_client()[config.DATABASE_NAME][config.COLLECTION_NAME]
+    projection = {"_id": 0, "Date": 1, "ticker": 1, **{column: 1 for column in store.columns}}
+    written = 0
+    for ticker in collection.distinct("ticker"):
+        records = list(collection.find({"ticker": ticker}, projection).sort("Date", 1))
+        written += store.upsert(records)
+    return written
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Columnar feature store utilities.")
+    parser.add_argument("--import-mongo", action="store_true", help="Copy nifty50_daily into the store.")
+    args = parser.parse_args()
+
+    if args.import_mongo:
+        written = import_from_mongo()
+        print(f"✅ Imported {written} rows into {config.FEATURE_STORE_PATH}")
+    else:
+        for ticker, count in FeatureStore().count_records().items():
+            print(f"   {ticker}: {count} records")
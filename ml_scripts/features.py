@@ -0,0 +1,143 @@
+# ml_scripts/features.py
+"""
+Shared feature pipeline for backfill_db and daily_collector.
+
+compute_features() takes a long-format panel (one row per ticker and date) and
+computes every config.FEATURES_TO_USE column for the whole universe at once:
+the panel is laid out as a (n_tickers, max_len) array and each indicator is one
+vectorized NumPy pass over it. The formulas follow pandas_ta:
+  - RSI_14: rma (ewm alpha=1/14, adjust=False, no warm-up) of gains and losses.
+  - MACD_12_26_9: difference of two SMA-seeded EMAs (ewm span, adjust=False).
+  - volatility_20d: 20-day rolling sample std of daily returns.
+`returns` are always computed from the (cleaned) Close series passed in.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import config
+
+RSI_LENGTH = 14
+MACD_FAST, MACD_SLOW = 12, 26
+VOLATILITY_WINDOW = 20
+
+def normalize_dates(index) -> pd.DatetimeIndex:
+    """Timezone-naive DatetimeIndex, matching what backfill_db stores as 'Date'."""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index
+
+def _to_matrix(values: np.ndarray, codes: np.ndarray, positions: np.ndarray, shape) -> np.ndarray:
+    """Scatters a long-format column into a left-aligned, NaN-padded (n_tickers, max_len) array."""
+    matrix = np.full(shape, np.nan)
+    matrix[codes, positions] = values
+    return matrix
+
+def _rma(x: np.ndarray, length: int) -> np.ndarray:
+    """Row-wise pandas_ta rma, ewm(alpha=1/length, adjust=False), over columns 1..T-1 (column 0 holds the NaN diff)."""
+    alpha = 1.0 / length
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] < 2:
+        return out
+    value = x[:, 1]
+    out[:, 1] = value
+    for t in range(2, x.shape[1]):
+        value = alpha * x[:, t] + (1 - alpha) * value
+        out[:, t] = value
+    return out
+
+def _sma_seeded_ema(x: np.ndarray, length: int) -> np.ndarray:
+    """Row-wise pandas_ta ema: SMA of the first `length` values, then ewm(span=length, adjust=False)."""
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] < length:
+        return out
+    alpha = 2.0 / (length + 1)
+    value = x[:, :length].mean(axis=1)
+    out[:, length - 1] = value
+    for t in range(length, x.shape[1]):
+        value = alpha * x[:, t] + (1 - alpha) * value
+        out[:, t] = value
+    return out
+
+def _rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    """Row-wise rolling sample std; windows containing NaN stay NaN."""
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] >= window:
+        out[:, window - 1:] = sliding_window_view(x, window, axis=1).std(axis=2, ddof=1)
+    return out
+
+def compute_features(panel: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes the model features for a long-format panel of many tickers in one pass.
+    `panel` needs 'ticker', 'Date', 'Close' and 'Volume' columns. Returns a frame
+    with 'ticker', 'Date' and config.FEATURES_TO_USE, sorted by ticker and date;
+    indicator warm-up rows are NaN.
+    """
+    panel = panel.sort_values(['ticker', 'Date'], kind='stable').reset_index(drop=True)
+    codes, _ = pd.factorize(panel['ticker'])
+    positions = panel.groupby(codes, sort=False).cumcount().to_numpy()
+    shape = (codes.max() + 1 if len(codes) else 0, positions.max() + 1 if len(positions) else 0)
+
+    close = _to_matrix(panel['Close'].to_numpy(dtype=np.float64), codes, positions, shape)
+
+    change = np.full(shape, np.nan)
+    change[:, 1:] = np.diff(close, axis=1)
+    returns = np.full(shape, np.nan)
+    returns[:, 1:] = close[:, 1:] / close[:, :-1] - 1
+
+    avg_gain = _rma(np.where(change > 0, change, 0.0), RSI_LENGTH)
+    avg_loss = _rma(np.where(change < 0, -change, 0.0), RSI_LENGTH)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rsi = 100.0 * avg_gain / (avg_gain + avg_loss)
+
+    macd = _sma_seeded_ema(close, MACD_FAST) - _sma_seeded_ema(close, MACD_SLOW)
+    volatility = _rolling_std(returns, VOLATILITY_WINDOW)
+
+    result = panel[['ticker', 'Date', 'Close', 'Volume']].copy()
+    result['RSI_14'] = rsi[codes, positions]
+    result['MACD_12_26_9'] = macd[codes, positions]
+    result['volatility_20d'] = volatility[codes, positions]
+    return result[['ticker', 'Date'] + config.FEATURES_TO_USE]
+
+def calculate_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculates all required features for a single ticker's OHLCV frame (index = Date).
+    Returns config.FEATURES_TO_USE indexed like the input.
+    """
+    panel = pd.DataFrame({
+        'ticker': 0,
+        'Date': np.arange(len(df)),
+        'Close': df['Close'].to_numpy(),
+        'Volume': df['Volume'].to_numpy(),
+    })
+    featured = compute_features(panel)
+    featured.index = df.index
+    return featured[config.FEATURES_TO_USE]
+
+def pandas_ta_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Reference per-ticker implementation with pandas_ta, used for parity checks."""
+    import pandas_ta  # noqa: F401  (registers the DataFrame.ta accessor)
+
+    df = df.copy()
+    df.ta.rsi(length=14, append=True)
+    df.ta.macd(fast=12, slow=26, signal=9, append=True)
+    df['returns'] = df['Close'].pct_change()
+    df['volatility_20d'] = df['returns'].rolling(window=20).std()
+    return df[config.FEATURES_TO_USE]
+
+def verify_feature_parity(df: pd.DataFrame, tolerance: float = config.FEATURE_PARITY_TOLERANCE,
+                          expected: pd.DataFrame = None) -> dict:
+    """
+    Compares calculate_features with the pandas_ta reference on one ticker's history
+    (or with `expected`, its saved pandas_ta_features output).
+    Returns the max absolute difference per feature and whether all are within `tolerance`.
+    """
+    expected = (pandas_ta_features(df) if expected is None else expected).dropna()
+    actual = calculate_features(df).loc[expected.index]
+
+    differences = {
+        col: float(np.abs(actual[col].to_numpy() - expected[col].to_numpy()).max()) if len(expected) else 0.0
+        for col in config.FEATURES_TO_USE
+    }
+    return {"max_abs_diff": differences, "ok": all(d <= tolerance for d in differences.values())}
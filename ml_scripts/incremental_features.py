@@ -0,0 +1,222 @@
+# ml_scripts/incremental_features.py
+"""
+O(1)-per-bar feature engine for the daily collector.
+
+Keeps, per ticker, the running state behind each model feature so that a new
+daily bar updates RSI_14, MACD_12_26_9 and volatility_20d from that bar alone:
+  - RSI_14: Wilder averages of gains/losses (pandas_ta `rma`, an EWM with
+    alpha=1/14 and adjust=False, seeded with the first change).
+  - MACD_12_26_9: fast/slow EMAs seeded with an SMA (pandas_ta `ema`), plus the
+    signal EMA of the MACD line.
+  - volatility_20d: a sliding-window Welford accumulator over the last 20 returns.
+The stored state stops at the last *closed* bar: a provisional bar (today's,
+before the close) gets its features from a copy of the state, and every run
+re-applies the bars after the checkpoint from the fresh download, so later
+revisions of those bars are picked up. If the checkpoint bar's own close has
+changed (e.g. dividend-adjusted history), new_bars() asks for a full recompute.
+State is a plain dict so it can be stored as one MongoDB document per ticker
+(or one state.json per ticker with the "npy" storage backend); states of an
+older STATE_VERSION are rebuilt from history.
+"""
+
+import copy
+import math
+import numpy as np
+import pandas as pd
+import config
+import feature_store
+
+RSI_LENGTH = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+VOLATILITY_WINDOW = 20
+STATE_VERSION = 2  # 2: RSI averages as pandas_ta 0.4's unadjusted rma
+
+def new_state(ticker: str) -> dict:
+    """Returns an empty feature state for a ticker with no history folded in yet."""
+    return {
+        "ticker": ticker,
+        "version": STATE_VERSION,
+        "last_date": None,
+        "last_close": None,
+        "n_bars": 0,
+        "rsi": {"avg_gain": None, "avg_loss": None},
+        "macd": {
+            "fast": _new_ema(MACD_FAST),
+            "slow": _new_ema(MACD_SLOW),
+            "signal": _new_ema(MACD_SIGNAL),
+        },
+        "volatility": {"window": [], "mean": 0.0, "m2": 0.0},
+    }
+
+def _new_ema(length: int) -> dict:
+    return {"length": length, "value": None, "seed": []}
+
+def _update_ema(ema: dict, x: float):
+    """pandas_ta ema: SMA of the first `length` values, then ewm(span=length, adjust=False)."""
+    if ema["value"] is None:
+        ema["seed"].append(x)
+        if len(ema["seed"]) < ema["length"]:
+            return math.nan
+        ema["value"] = sum(ema["seed"]) / ema["length"]
+        ema["seed"] = []
+        return ema["value"]
+    alpha = 2.0 / (ema["length"] + 1)
+    ema["value"] = alpha * x + (1 - alpha) * ema["value"]
+    return ema["value"]
+
+def _update_rsi(rsi: dict, change: float):
+    """pandas_ta rsi: rma (ewm alpha=1/length, adjust=False) of gains and losses, from the first change."""
+    gain, loss = max(change, 0.0), -min(change, 0.0)
+    if rsi["avg_gain"] is None:
+        rsi["avg_gain"], rsi["avg_loss"] = gain, loss
+    else:
+        alpha = 1.0 / RSI_LENGTH
+        rsi["avg_gain"] = alpha * gain + (1 - alpha) * rsi["avg_gain"]
+        rsi["avg_loss"] = alpha * loss + (1 - alpha) * rsi["avg_loss"]
+    total = rsi["avg_gain"] + rsi["avg_loss"]
+    return 100.0 * rsi["avg_gain"] / total if total else math.nan
+
+def _update_volatility(vol: dict, ret: float):
+    """Rolling sample std of the last VOLATILITY_WINDOW returns via sliding Welford."""
+    window = vol["window"]
+    window.append(ret)
+    if len(window) <= VOLATILITY_WINDOW:
+        # Still filling the window: standard Welford insert.
+        delta = ret - vol["mean"]
+        vol["mean"] += delta / len(window)
+        vol["m2"] += delta * (ret - vol["mean"])
+    else:
+        old = window.pop(0)
+        old_mean = vol["mean"]
+        vol["mean"] += (ret - old) / VOLATILITY_WINDOW
+        vol["m2"] += (ret - old) * (ret - vol["mean"] + old - old_mean)
+    if len(window) < VOLATILITY_WINDOW:
+        return math.nan
+    return math.sqrt(max(vol["m2"], 0.0) / (VOLATILITY_WINDOW - 1))
+
+def update_state(state: dict, bar_date, close: float) -> dict:
+    """
+    Folds one daily bar into the state and returns its derived features.
+    Features that are still warming up are NaN, like the pandas_ta output.
+    """
+    close = float(close)
+    features = {"RSI_14": math.nan, "MACD_12_26_9": math.nan, "volatility_20d": math.nan}
+
+    previous_close = state["last_close"]
+    if previous_close is not None:
+        features["RSI_14"] = _update_rsi(state["rsi"], close - previous_close)
+        features["volatility_20d"] = _update_volatility(state["volatility"], close / previous_close - 1)
+
+    macd = state["macd"]
+    fast = _update_ema(macd["fast"], close)
+    slow = _update_ema(macd["slow"], close)
+    if not (math.isnan(fast) or math.isnan(slow)):
+        features["MACD_12_26_9"] = fast - slow
+        _update_ema(macd["signal"], fast - slow)
+
+    state["last_date"] = to_state_date(bar_date)
+    state["last_close"] = close
+    state["n_bars"] += 1
+    return features
+
+def apply_bars(state: dict, bars: pd.DataFrame, closed_through=None) -> pd.DataFrame:
+    """
+    Folds the bars of an OHLCV frame (index = Date) into the state, in order.
+    Bars dated after `closed_through` (a date; None = every bar is closed) are
+    provisional: they are folded into a copy, so the state stays at the last
+    closed bar. Returns the model feature rows for all bars, indexed like `bars`.
+    """
+    closed = np.ones(len(bars), dtype=bool)
+    if closed_through is not None:
+        closed = _index_as_naive(bars.index).normalize() <= pd.Timestamp(closed_through)
+    rows, provisional = [], None
+    for is_closed, bar_date, close in zip(closed, bars.index, bars['Close']):
+        if not is_closed and provisional is None:
+            provisional = copy.deepcopy(state)
+        rows.append(update_state(state if provisional is None else provisional, bar_date, close))
+    # Explicit columns keep the frame well-formed when there are no new bars.
+    featured = pd.DataFrame(rows, index=bars.index, columns=['RSI_14', 'MACD_12_26_9', 'volatility_20d'])
+    featured.insert(0, 'Volume', bars['Volume'])
+    featured.insert(0, 'Close', bars['Close'])
+    return featured[config.FEATURES_TO_USE]
+
+def state_from_history(ticker: str, history: pd.DataFrame, closed_through=None) -> dict:
+    """Builds a fresh state by replaying a full price history (the recompute fallback)."""
+    state = new_state(ticker)
+    apply_bars(state, history, closed_through)
+    return state
+
+def new_bars(state: dict, history: pd.DataFrame):
+    """
+    Returns the bars of `history` that come after the state's last (closed) bar, or
+    None when the state cannot be continued from this history: missing state, a gap,
+    a different close for the state's last bar (history adjusted since, e.g. for
+    a dividend or split) or a state saved by an older STATE_VERSION.
+    """
+    if state is None or state["last_date"] is None or state.get("version") != STATE_VERSION:
+        return None
+    dates = _index_as_naive(history.index)
+    last_date = pd.Timestamp(state["last_date"])
+    at_checkpoint = history['Close'][dates == last_date]
+    if at_checkpoint.empty or not math.isclose(float(at_checkpoint.iloc[-1]), state["last_close"],
+                                               rel_tol=config.INCREMENTAL_FEATURE_TOLERANCE):
+        return None
+    return history[dates > last_date]
+
+def to_state_date(value):
+    """Timezone-naive bar date (local wall time), the same convention as the stored 'Date'."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_localize(None)
+    return ts.to_pydatetime()
+
+def _index_as_naive(index) -> pd.DatetimeIndex:
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index
+
+# --- Persistence (one document or state.json file per ticker) ---
+
+def get_state_collection(db):
+    """The MongoDB state collection, or the feature store's state files when there is no database."""
+    if db is None:
+        return feature_store.StateFiles(config.FEATURE_STORE_PATH)
+    from db_handler import ensure_index
+
+    collection = db[config.FEATURE_STATE_COLLECTION]
+    ensure_index(collection, "ticker", unique=True)
+    return collection
+
+def load_states(state_collection, tickers) -> dict:
+    """Loads the stored states for the given tickers in one query."""
+    if isinstance(state_collection, feature_store.StateFiles):
+        return state_collection.load(tickers)
+    return {
+        doc["ticker"]: doc
+        for doc in state_collection.find({"ticker": {"$in": list(tickers)}}, {"_id": 0})
+    }
+
+def save_state(state_collection, state: dict):
+    if isinstance(state_collection, feature_store.StateFiles):
+        return state_collection.save(state)
+    state_collection.replace_one({"ticker": state["ticker"]}, state, upsert=True)
+
+# --- Parity check against the full pandas_ta recompute ---
+
+def verify_incremental_features(history: pd.DataFrame, tolerance: float = config.INCREMENTAL_FEATURE_TOLERANCE) -> dict:
+    """
+    Compares the incremental engine with the pandas_ta reference
+    (features.pandas_ta_features) on the same history. Returns the max absolute
+    difference per feature and whether all of them are within `tolerance`.
+    """
+    from features import pandas_ta_features
+
+    expected = pandas_ta_features(history).dropna()
+    actual = apply_bars(new_state("verify"), history).loc[expected.index]
+
+    differences = {
+        col: float(np.nanmax(np.abs(actual[col].to_numpy() - expected[col].to_numpy()))) if len(expected) else 0.0
+        for col in config.FEATURES_TO_USE
+    }
+    return {"max_abs_diff": differences, "ok": all(d <= tolerance for d in differences.values())}
@@ -3,12 +3,17 @@
 import sys
 import json
 from datetime import timedelta
-import numpy as np
 
 import config
-from data_handler import get_latest_data
-from model_loader import load_prediction_assets
-from predict import make_multistep_forecast
+import metrics
+import startup_profile
+from startup_profile import lazy_module
+
+# Heavy modules load on first use, so usage errors return immediately.
+np = lazy_module("numpy")
+data_handler = lazy_module("data_handler")
+model_registry = lazy_module("model_registry")
+predict = lazy_module("predict")
 
 def generate_recommendation(ticker: str, forecast_days: int):
     """
@@ -16,62 +21,107 @@ def generate_recommendation(ticker: str, forecast_days: int):
     """
     try:
         # 1. Load assets
-        model, scalers = load_prediction_assets(config.MODEL_PATH, config.SCALERS_PATH)
+        with startup_profile.phase("model_load"):
+            bundle = model_registry.load_version()
+            model, scalers = bundle.model, bundle.scalers
         
         # 2. Get and prepare latest data
-        latest_data = get_latest_data(ticker, config.LOOKBACK_PERIOD)
+        with startup_profile.phase("fetch"):
+            latest_data = data_handler.get_latest_data(ticker, config.LOOKBACK_PERIOD)
         scaler = scalers.get(ticker)
         if not scaler:
             return {"error": f"No scaler found for ticker {ticker}."}
+        with startup_profile.phase("fetch"):
+            state = data_handler.get_feature_states({ticker: latest_data})[ticker]
 
         # 3. Make forecast
-        forecasted_prices = make_multistep_forecast(
-            model, 
-            latest_data, 
-            scaler, 
-            forecast_days,
-            config.FEATURES_TO_USE,
-            config.TARGET_COLUMN
-        )
+        with startup_profile.phase("inference"):
+            forecasted_prices = predict.make_multistep_forecast(
+                model,
+                latest_data,
+                scaler,
+                forecast_days,
+                config.FEATURES_TO_USE,
+                config.TARGET_COLUMN,
+                state
+            )
         
-        # 4. Generate recommendation
-        lowest_price = min(forecasted_prices)
-        best_day_index = int(np.argmin(forecasted_prices))
+        # 4. Generate recommendation & 5. Format the JSON output
+        return format_recommendation(ticker, latest_data.index[-1], forecasted_prices, forecast_days, bundle.version)
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def format_recommendation(ticker: str, last_date, forecasted_prices, forecast_days: int, model_version: str = None) -> dict:
+    """Picks the cheapest forecasted day and builds the JSON-ready recommendation."""
+    lowest_price = min(forecasted_prices)
+    best_day_index = int(np.argmin(forecasted_prices))
+
+    recommendation_date = last_date + timedelta(days=best_day_index + 1)
+
+    result = {
+        "status": "success",
+        "ticker": ticker,
+        "recommendation": f"The best day to purchase is expected to be {recommendation_date.strftime('%Y-%m-%d')}.",
+        "recommended_price": round(lowest_price, 2),
+        "forecast_window_days": forecast_days,
+        "model_version": model_version,
+        "forecast": [
+            {"date": (last_date + timedelta(days=i+1)).strftime('%Y-%m-%d'), "predicted_price": round(price, 2)}
+            for i, price in enumerate(forecasted_prices)
+        ]
+    }
+    return result
+
+def generate_recommendations(tickers: list, forecast_days: int) -> list:
+    """
+    Batched version of generate_recommendation: every ticker's rollout runs as one
+    (N, LOOKBACK_PERIOD, n_features) tensor per forecast step. Returns one result per
+    ticker, in the order given; failures are reported per ticker.
+    """
+    try:
+        with startup_profile.phase("model_load"):
+            bundle = model_registry.load_version()
+            model, scalers = bundle.model, bundle.scalers
         
-        last_date = latest_data.index[-1]
-        recommendation_date = last_date + timedelta(days=best_day_index + 1)
+        errors = {ticker: f"No scaler found for ticker {ticker}." for ticker in tickers if not scalers.get(ticker)}
+        with startup_profile.phase("fetch"):
+            windows, short = data_handler.get_latest_windows([t for t in tickers if t not in errors],
+                                                             config.LOOKBACK_PERIOD)
+            errors.update(short)
+            states = data_handler.get_feature_states(windows)
         
-        # 5. Format the JSON output
-        result = {
-            "status": "success",
-            "ticker": ticker,
-            "recommendation": f"The best day to purchase is expected to be {recommendation_date.strftime('%Y-%m-%d')}.",
-            "recommended_price": round(lowest_price, 2),
-            "forecast_window_days": forecast_days,
-            "forecast": [
-                {"date": (last_date + timedelta(days=i+1)).strftime('%Y-%m-%d'), "predicted_price": round(price, 2)}
-                for i, price in enumerate(forecasted_prices)
-            ]
-        }
-        return result
+        with startup_profile.phase("inference"):
+            forecasts = predict.make_multistep_forecast_batch(model, windows, scalers, forecast_days, states)
+        return [
+            {"status": "error", "ticker": ticker, "message": errors[ticker]} if ticker in errors
+            else format_recommendation(ticker, windows[ticker].index[-1], forecasts[ticker], forecast_days, bundle.version)
+            for ticker in tickers
+        ]
 
     except Exception as e:
-        return {"status": "error", "message": str(e)}
+        return [{"status": "error", "message": str(e)}]
 
 
 if __name__ == "__main__":
     # This part is executed when the script is called from the command line (e.g., by Node.js)
-    if len(sys.argv) != 3:
+    args = metrics.enable_from_argv(startup_profile.enable_from_argv(sys.argv[1:]))
+    if len(args) != 2:
         error_response = {
             "status": "error", 
-            "message": "Usage: python3 main.py <TICKER_SYMBOL.NS> <forecast_days>"
+            "message": "Usage: python3 main.py <TICKER_SYMBOL.NS | --all> <forecast_days> [--profile-startup] [--metrics[=json|prometheus]]"
         }
         print(json.dumps(error_response))
     else:
-        ticker_symbol = sys.argv[1].upper()
-        days_to_forecast = int(sys.argv[2])
-        
-        final_recommendation = generate_recommendation(ticker_symbol, days_to_forecast)
+        days_to_forecast = int(args[1])
+        if args[0] == "--all":
+            final_recommendation = generate_recommendations(config.TICKERS, days_to_forecast)
+        else:
+            final_recommendation = generate_recommendation(args[0].upper(), days_to_forecast)
         
         # Print the final result as a JSON string
-        print(json.dumps(final_recommendation, indent=4))
\ No newline at end of file
+        with startup_profile.phase("serialization"):
+            output = json.dumps(final_recommendation, indent=4)
+        print(output)
+    startup_profile.emit()
+    metrics.emit()
\ No newline at end of file
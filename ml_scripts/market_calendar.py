@@ -0,0 +1,50 @@
+# ml_scripts/market_calendar.py
+"""
+NSE trading days and the collector daemon's schedule.
+
+A day is a trading day unless it is a weekend or listed in config.NSE_HOLIDAYS.
+Times are in config.EXCHANGE_TIMEZONE; scheduled collections run at
+config.COLLECTOR_SCHEDULE_TIME on trading days only.
+"""
+
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+import config
+
+def holidays() -> set:
+    """config.NSE_HOLIDAYS as dates."""
+    return {date.fromisoformat(day) for day in config.NSE_HOLIDAYS}
+
+def is_trading_day(day: date) -> bool:
+    return day.weekday() < 5 and day not in holidays()
+
+def next_trading_day(day: date) -> date:
+    """The first trading day after `day`."""
+    closed = holidays()
+    day += timedelta(days=1)
+    while day.weekday() >= 5 or day in closed:
+        day += timedelta(days=1)
+    return day
+
+def exchange_now() -> datetime:
+    """The current time in the exchange's timezone."""
+    return datetime.now(ZoneInfo(config.EXCHANGE_TIMEZONE))
+
+def last_closed_date(now: datetime = None) -> date:
+    """The latest date whose daily bar is final: today once the market has closed, else yesterday."""
+    now = (now or exchange_now()).astimezone(ZoneInfo(config.EXCHANGE_TIMEZONE))
+    if now.time() >= time.fromisoformat(config.MARKET_CLOSE_TIME):
+        return now.date()
+    return now.date() - timedelta(days=1)
+
+def scheduled_time(day: date) -> datetime:
+    """The collection time of `day` (config.COLLECTOR_SCHEDULE_TIME, exchange time)."""
+    at = time.fromisoformat(config.COLLECTOR_SCHEDULE_TIME)
+    return datetime.combine(day, at, tzinfo=ZoneInfo(config.EXCHANGE_TIMEZONE))
+
+def next_run(now: datetime) -> datetime:
+    """The first scheduled collection strictly after `now` (timezone-aware)."""
+    today = now.astimezone(ZoneInfo(config.EXCHANGE_TIMEZONE)).date()
+    if is_trading_day(today) and scheduled_time(today) > now:
+        return scheduled_time(today)
+    return scheduled_time(next_trading_day(today))
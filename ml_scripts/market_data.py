@@ -0,0 +1,96 @@
+# ml_scripts/market_data.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import config
+import metrics
+
+# The only download columns the cleaning and feature code reads; yfinance also
+# returns Dividends, Stock Splits (and Capital Gains), dropped as soon as a frame arrives.
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+    Allows bursts of up to `capacity` calls, refilled at `rate` tokens per second.
+    `clock` and `sleep` default to time.monotonic and time.sleep (tests pass a fake clock).
+    """
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._last_refill = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+def yfinance_history(ticker: str, start=None, end=None):
+    """Default data source: daily OHLCV history from Yahoo Finance."""
+    import yfinance as yf
+    return yf.Ticker(ticker).history(start=start, end=end)
+
+def select_columns(df):
+    """Keeps only OHLCV_COLUMNS of a downloaded frame."""
+    return df[[column for column in OHLCV_COLUMNS if column in df.columns]]
+
+def fetch_history(ticker: str, start=None, end=None, source=None):
+    """Downloads a single ticker's history synchronously."""
+    return select_columns((source or yfinance_history)(ticker, start=start, end=end))
+
+def fetch_histories(tickers, start=None, end=None, source=None,
+                    max_workers=config.MARKET_DATA_MAX_WORKERS,
+                    rate=config.MARKET_DATA_RATE_LIMIT,
+                    burst=config.MARKET_DATA_BURST):
+    """
+    Downloads the history of every ticker concurrently on a bounded thread pool.
+    Yields (ticker, DataFrame, error) as soon as each download finishes, so callers
+    can clean and compute features while the remaining downloads are in flight.
+
+    `source(ticker, start=..., end=...)` replaces yfinance, e.g. with a local
+    stand-in returning canned DataFrames.
+    """
+    requests = [(ticker, start, end) for ticker in tickers]
+    for (ticker, _start, _end), df, error in fetch_ranges(requests, source, max_workers, rate, burst):
+        yield ticker, df, error
+
+def fetch_ranges(requests, source=None,
+                 max_workers=config.MARKET_DATA_MAX_WORKERS,
+                 rate=config.MARKET_DATA_RATE_LIMIT,
+                 burst=config.MARKET_DATA_BURST):
+    """
+    Like fetch_histories, for (ticker, start, end) requests with their own date ranges
+    (e.g. the chunks of a long backfill). Yields (request, DataFrame, error).
+    """
+    source = source or yfinance_history
+    limiter = TokenBucket(rate, burst)
+
+    def download(request):
+        ticker, start, end = request
+        limiter.acquire()
+        with metrics.timer("market_data_fetch_seconds"):
+            return select_columns(source(ticker, start=start, end=end))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(download, request): request for request in requests}
+        for future in as_completed(futures):
+            request = futures[future]
+            try:
+                yield request, future.result(), None
+            except Exception as e:
+                metrics.inc("market_data_fetch_errors_total", ticker=request[0])
+                yield request, None, e
@@ -0,0 +1,138 @@
+# ml_scripts/metrics.py
+"""
+In-process metrics for the prediction and collection hot paths.
+
+  - timer(name, **labels) / observe(): latency histograms (seconds),
+  - inc(name, **labels): counters (e.g. per-ticker failures).
+Series are keyed by name and labels, like Prometheus. Recording is always on
+(a lock and a few additions per call); exporting is opt-in and never touches
+stdout, which carries the JSON results the Node controllers parse:
+  - entry points accept --metrics=json|prometheus (or config.METRICS_FORMAT)
+    and write the snapshot to stderr, or append it to config.METRICS_PATH;
+  - the prediction server answers {"command": "metrics"} with the live values.
+"""
+
+import bisect
+import functools
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+import config
+
+METRICS_FLAG = "--metrics"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> {"buckets": per-bucket counts (last = +Inf), "sum", "count"}
+_counters = {}    # (name, labels) -> value
+_format = config.METRICS_FORMAT
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def enable_from_argv(argv: list) -> list:
+    """Turns export on for --metrics / --metrics=json|prometheus and returns argv without it."""
+    global _format
+    remaining = []
+    for arg in argv:
+        if arg == METRICS_FLAG or arg.startswith(METRICS_FLAG + "="):
+            _format = arg.partition("=")[2] or "json"
+        else:
+            remaining.append(arg)
+    return remaining
+
+def observe(name: str, seconds: float, **labels):
+    """Adds one observation to the histogram `name`."""
+    key = _key(name, labels)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = {"buckets": [0] * (len(DEFAULT_BUCKETS) + 1), "sum": 0.0, "count": 0}
+        series["buckets"][bisect.bisect_left(DEFAULT_BUCKETS, seconds)] += 1
+        series["sum"] += seconds
+        series["count"] += 1
+
+@contextmanager
+def timer(name: str, **labels):
+    """Times the block into the histogram `name` (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+def timed(name: str, **labels):
+    """Decorator form of timer()."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def inc(name: str, value: float = 1, **labels):
+    """Increments the counter `name`."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def snapshot() -> dict:
+    """Current values as a JSON-ready dict: counters, and histograms with count/sum/buckets."""
+    with _lock:
+        counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in _counters.items()]
+        histograms = []
+        for (name, labels), series in _histograms.items():
+            cumulative, buckets = 0, {}
+            for bound, count in zip(DEFAULT_BUCKETS + ("+Inf",), series["buckets"]):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            histograms.append({"name": name, "labels": dict(labels), "count": series["count"],
+                               "sum": series["sum"], "buckets": buckets})
+    return {"counters": counters, "histograms": histograms}
+
+def _labels_text(labels: dict, **extra) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in items.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(items, escaped)) + "}"
+
+def prometheus_text() -> str:
+    """Current values in the Prometheus text exposition format."""
+    data = snapshot()
+    lines, typed = [], set()
+    for counter in sorted(data["counters"], key=lambda c: c["name"]):
+        if counter["name"] not in typed:
+            lines.append(f"# TYPE {counter['name']} counter")
+            typed.add(counter["name"])
+        lines.append(f"{counter['name']}{_labels_text(counter['labels'])} {counter['value']}")
+    for histogram in sorted(data["histograms"], key=lambda h: h["name"]):
+        name, labels = histogram["name"], histogram["labels"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        for bound, count in histogram["buckets"].items():
+            lines.append(f"{name}_bucket{_labels_text(labels, le=bound)} {count}")
+        lines.append(f"{name}_sum{_labels_text(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_labels_text(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+def render(fmt: str = "json") -> str:
+    if fmt == "prometheus":
+        return prometheus_text()
+    return json.dumps({"metrics": snapshot()}) + "\n"
+
+def emit():
+    """Writes the metrics to stderr (or appends them to config.METRICS_PATH) when export is on."""
+    if not _format:
+        return
+    text = render(_format)
+    if config.METRICS_PATH:
+        # A Prometheus textfile holds the latest snapshot; JSON snapshots accumulate as lines.
+        with open(config.METRICS_PATH, "w" if _format == "prometheus" else "a") as f:
+            f.write(text)
+    else:
+        sys.stderr.write(text)
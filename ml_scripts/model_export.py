@@ -0,0 +1,133 @@
+# ml_scripts/model_export.py
+"""
+Converts the Keras GRU model (.h5) into the lean NumPy inference artifact (.npz)
+used by model_loader when config.MODEL_BACKEND allows it, and scalers.pkl into
+the scalers.npz array pair used when config.SCALER_BACKEND allows it.
+
+    python3 ml_scripts/model_export.py              # export both + equivalence checks
+    python3 ml_scripts/model_export.py --verify     # only re-run the checks
+    python3 ml_scripts/model_export.py --scalers    # scalers only (no TensorFlow needed)
+"""
+
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import json
+import pickle
+import numpy as np
+import pandas as pd
+
+import config
+from model_loader import file_sha256
+from numpy_gru import NumpyGRUModel
+from scaler_table import ScalerTable
+
+SUPPORTED_LAYERS = ("GRU", "Dropout", "Dense")
+
+def export_numpy_model(model_path: str = config.MODEL_PATH, output_path: str = config.NUMPY_MODEL_PATH) -> str:
+    """Extracts the layer configs and weight arrays of the Keras model into one .npz file."""
+    from tensorflow.keras.saving import load_model
+
+    model = load_model(model_path, compile=False)
+    layers, arrays = [], {}
+    for layer in model.layers:
+        layer_type = type(layer).__name__
+        if layer_type not in SUPPORTED_LAYERS:
+            raise ValueError(f"Layer {layer.name} ({layer_type}) is not supported by the NumPy backend.")
+        if layer_type == "Dropout":
+            continue  # identity at inference time
+
+        layer_config = layer.get_config()
+        entry = {"type": layer_type, "name": layer.name, "activation": layer_config["activation"]}
+        if layer_type == "GRU":
+            if not layer_config.get("reset_after", True):
+                raise ValueError(f"GRU layer {layer.name} uses reset_after=False, which is not supported.")
+            entry.update({
+                "units": layer_config["units"],
+                "recurrent_activation": layer_config["recurrent_activation"],
+                "return_sequences": layer_config["return_sequences"],
+            })
+        layers.append(entry)
+        for weight in layer.weights:
+            arrays[f"{layer.name}/{weight.name.split('/')[-1]}"] = np.asarray(weight.numpy(), dtype=np.float32)
+
+    meta = {"layers": layers, "source_sha256": file_sha256(model_path)}
+    np.savez(output_path, __meta__=np.array(json.dumps(meta)), **arrays)
+    return output_path
+
+def verify_numpy_model(model_path: str = config.MODEL_PATH, numpy_path: str = config.NUMPY_MODEL_PATH,
+                       n_samples: int = 256, tolerance: float = config.NUMPY_MODEL_TOLERANCE) -> dict:
+    """
+    Numerical-equivalence check: compares Keras predict with the NumPy forward pass
+    on random inputs of the production shape (n_samples, LOOKBACK_PERIOD, n_features).
+    """
+    from tensorflow.keras.saving import load_model
+
+    keras_model = load_model(model_path, compile=False)
+    numpy_model = NumpyGRUModel.load(numpy_path)
+
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0.0, 1.0, size=(n_samples, config.LOOKBACK_PERIOD, len(config.FEATURES_TO_USE))).astype(np.float32)
+    expected = keras_model.predict(X, verbose=0)
+    actual = numpy_model.predict_on_batch(X)
+
+    max_abs_diff = float(np.max(np.abs(expected - actual)))
+    return {"max_abs_diff": max_abs_diff, "ok": max_abs_diff <= tolerance}
+
+def export_numpy_scalers(scalers_path: str = config.SCALERS_PATH, output_path: str = config.NUMPY_SCALERS_PATH) -> str:
+    """Flattens the pickled per-ticker scalers into one scale/offset array pair (.npz)."""
+    with open(scalers_path, 'rb') as f:
+        scalers = pickle.load(f)
+    ScalerTable.from_scalers(scalers, config.FEATURES_TO_USE, file_sha256(scalers_path)).save(output_path)
+    return output_path
+
+def verify_numpy_scalers(scalers_path: str = config.SCALERS_PATH, numpy_path: str = config.NUMPY_SCALERS_PATH,
+                         n_samples: int = 64, tolerance: float = config.NUMPY_SCALERS_TOLERANCE) -> dict:
+    """
+    Numerical-equivalence check: sklearn transform/inverse_transform against the
+    ScalerTable broadcast for every ticker, on random inputs around the fitted range.
+    """
+    with open(scalers_path, 'rb') as f:
+        scalers = pickle.load(f)
+    table = ScalerTable.load(numpy_path)
+
+    tickers = sorted(scalers)
+    # Same column names the scalers were fitted with (avoids sklearn's feature-name warning).
+    frame = lambda ticker, X: pd.DataFrame(X, columns=getattr(scalers[ticker], "feature_names_in_", None))
+    rng = np.random.default_rng(0)
+    scaled = rng.uniform(-0.5, 1.5, size=(len(tickers), n_samples, len(config.FEATURES_TO_USE)))
+    raw = np.stack([scalers[t].inverse_transform(frame(t, scaled[i])) for i, t in enumerate(tickers)])
+    expected_scaled = np.stack([scalers[t].transform(frame(t, raw[i])) for i, t in enumerate(tickers)])
+    actual_scaled = table.transform(tickers, raw)
+    actual_raw = np.stack([table[t].inverse_transform(scaled[i]) for i, t in enumerate(tickers)])
+
+    max_abs_diff = float(max(np.max(np.abs(expected_scaled - actual_scaled)), np.max(np.abs(raw - actual_raw))))
+    return {"max_abs_diff": max_abs_diff, "ok": set(table.tickers) == set(scalers) and max_abs_diff <= tolerance}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the GRU model and scalers to the NumPy inference artifacts.")
+    parser.add_argument("--verify", action="store_true", help="Only compare the existing artifacts with Keras/sklearn.")
+    parser.add_argument("--scalers", action="store_true", help="Only the scalers (no TensorFlow needed).")
+    args = parser.parse_args()
+
+    ok = True
+    if not args.scalers:
+        if not args.verify:
+            path = export_numpy_model()
+            print(f"✅ Exported NumPy inference model to {path}")
+        report = verify_numpy_model()
+        status = "✅" if report["ok"] else "❌"
+        print(f"{status} Max abs difference vs Keras predict: {report['max_abs_diff']:.2e}")
+        ok = report["ok"]
+
+    if not args.verify:
+        path = export_numpy_scalers()
+        print(f"✅ Exported scaler arrays to {path}")
+    report = verify_numpy_scalers()
+    status = "✅" if report["ok"] else "❌"
+    print(f"{status} Max abs difference vs sklearn scalers: {report['max_abs_diff']:.2e}")
+    sys.exit(0 if ok and report["ok"] else 1)
@@ -1,18 +1,99 @@
 # ml_scripts/model_loader.py
 
+import hashlib
+import os
 import pickle
-from tensorflow.keras.saving import load_model
+
+_digests = {}  # ((path, mtime, size), ...) -> SHA-256
+
+def file_sha256(*paths) -> str:
+    """
+    SHA-256 (hex) over the contents of the given files, in order: the checksum of model
+    and scaler artifacts, and (first 16 characters) their cache fingerprints.
+    Files are re-hashed only when their modification time or size changes.
+    """
+    stamp = tuple((path, os.path.getmtime(path), os.path.getsize(path)) for path in paths)
+    if stamp not in _digests:
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        _digests[stamp] = digest.hexdigest()
+    return _digests[stamp]
+
+def load_model_backend(model_path: str):
+    """
+    Loads the model with the fastest available backend (config.MODEL_BACKEND):
+      - "numpy": the exported .npz artifact (see model_export.py), no TensorFlow import;
+      - "keras": the .h5 model, loaded for inference only (no compile/optimizer state);
+      - "auto":  numpy when the artifact exists and was exported from this .h5, else keras.
+    """
+    import config
+    from numpy_gru import NumpyGRUModel
+
+    backend = config.MODEL_BACKEND
+    numpy_path = config.NUMPY_MODEL_PATH
+    if backend == "auto":
+        backend = "keras"
+        if os.path.exists(numpy_path):
+            numpy_model = NumpyGRUModel.load(numpy_path)
+            if numpy_model.source_sha256 == file_sha256(model_path):
+                return numpy_model
+    if backend == "numpy":
+        return NumpyGRUModel.load(numpy_path)
+
+    from tensorflow.keras.saving import load_model
+    return load_model(model_path, compile=False)
+
+def load_scalers(scalers_path: str):
+    """
+    Loads the per-ticker scalers with the fastest available backend (config.SCALER_BACKEND):
+      - "numpy":  the exported scalers.npz as a ScalerTable, no pickle or sklearn import;
+      - "pickle": the dict of sklearn scalers in scalers.pkl;
+      - "auto":   numpy when scalers.npz exists and was exported from this scalers.pkl, else pickle.
+    Both behave as a ticker -> scaler mapping.
+    """
+    import config
+    from scaler_table import ScalerTable
+
+    backend = config.SCALER_BACKEND
+    numpy_path = config.NUMPY_SCALERS_PATH
+    if backend == "auto":
+        backend = "pickle"
+        if os.path.exists(numpy_path):
+            table = ScalerTable.load(numpy_path)
+            if table.source_sha256 == file_sha256(scalers_path):
+                return table
+    if backend == "numpy":
+        return ScalerTable.load(numpy_path)
+
+    with open(scalers_path, 'rb') as f:
+        return pickle.load(f)
+
+def load_model_file(path: str):
+    """Loads exactly this model file: an exported .npz (NumPy backend) or a Keras .h5."""
+    if path.endswith(".npz"):
+        from numpy_gru import NumpyGRUModel
+        return NumpyGRUModel.load(path)
+    from tensorflow.keras.saving import load_model
+    return load_model(path, compile=False)
+
+def load_scalers_file(path: str):
+    """Loads exactly this scalers file: an exported .npz (ScalerTable) or a pickled dict."""
+    if path.endswith(".npz"):
+        from scaler_table import ScalerTable
+        return ScalerTable.load(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
 
 def load_prediction_assets(model_path: str, scalers_path: str):
     """Loads the trained model and scalers from disk."""
     try:
-        model = load_model(model_path)
-        # Re-compile to avoid a warning when predicting
-        model.compile(optimizer='adam', loss='mean_squared_error')
-        
-        with open(scalers_path, 'rb') as f:
-            scalers = pickle.load(f)
-            
+        model = load_model_backend(model_path)
+
+        scalers = load_scalers(scalers_path)
+
         return model, scalers
     except FileNotFoundError:
-        raise FileNotFoundError("Model or scalers not found. Please ensure they are in the 'models' directory.")
\ No newline at end of file
+        raise FileNotFoundError("Model or scalers not found. Please ensure they are in the 'models' directory.")
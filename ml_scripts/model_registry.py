@@ -0,0 +1,310 @@
+# ml_scripts/model_registry.py
+"""
+Versioned model/scaler bundles, held in memory and hot-swapped.
+
+Layout under config.MODEL_REGISTRY_PATH:
+    registry.json              {"active": "v2", "shadow": ["v3"]}  (optional; default: newest version, no shadow)
+    <version>/manifest.json    model and scalers file names, features, lookback, target,
+                               SHA-256 of both files, created_at
+    <version>/<model file>     .npz (NumPy backend) or .h5 (Keras)
+    <version>/<scalers file>   .npz (ScalerTable) or .pkl
+
+register() writes a bundle into a temporary directory and renames it into place, so a
+reader never sees half-copied files. Until its first refresh(), a ModelRegistry loads
+versions on demand, one at a time (one-shot scripts). refresh() loads new or changed
+bundles and swaps the whole (bundles, active, shadow) set in one assignment: a request
+that already took its bundle finishes with it. watch() polls for changes in a daemon
+thread. Without a registry directory, config.MODEL_PATH/SCALERS_PATH form the single
+"default" version (with the same cache fingerprint as before the registry).
+
+    python3 ml_scripts/model_registry.py register v2 [--model PATH] [--scalers PATH] [--activate]
+    python3 ml_scripts/model_registry.py activate v2 [--shadow v3 ...]
+    python3 ml_scripts/model_registry.py list
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+import config
+import metrics
+import model_loader
+
+MANIFEST_FILE = "manifest.json"
+POINTER_FILE = "registry.json"
+DEFAULT_VERSION = "default"
+
+class ModelBundle:
+    """One model version: the loaded model and scalers plus the manifest they were loaded from."""
+
+    def __init__(self, version: str, model, scalers, manifest: dict = None,
+                 fingerprint: str = None, scalers_fingerprint: str = None):
+        self.version = version
+        self.model = model
+        self.scalers = scalers
+        self.manifest = manifest or {}
+        # Part of every prediction cache key, so each version is cached separately.
+        self.fingerprint = fingerprint or version
+        # Identifies the scalers file; materialized windows are used only when it matches theirs.
+        self.scalers_fingerprint = scalers_fingerprint
+
+    def describe(self) -> dict:
+        return {"version": self.version, "fingerprint": self.fingerprint,
+                **{key: self.manifest.get(key) for key in ("features", "lookback", "target", "created_at")}}
+
+def load_bundle(path: str) -> ModelBundle:
+    """
+    Loads the bundle in directory `path` after checking its manifest: the files'
+    checksums, and features/lookback/target against the stored data (config).
+    Raises ValueError when the bundle cannot serve predictions.
+    """
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    expected = {"features": config.FEATURES_TO_USE, "lookback": config.LOOKBACK_PERIOD, "target": config.TARGET_COLUMN}
+    for key, value in expected.items():
+        if manifest.get(key) != value:
+            raise ValueError(f"Bundle {path}: manifest {key} {manifest.get(key)!r} does not match the stored data ({value!r}).")
+    checksums = manifest.get("sha256", {})
+    for name in (manifest["model"], manifest["scalers"]):
+        if model_loader.file_sha256(os.path.join(path, name)) != checksums.get(name):
+            raise ValueError(f"Bundle {path}: checksum mismatch for {name}.")
+
+    model = model_loader.load_model_file(os.path.join(path, manifest["model"]))
+    scalers = model_loader.load_scalers_file(os.path.join(path, manifest["scalers"]))
+    version = manifest.get("version") or os.path.basename(path)
+    model_sha, scalers_sha = checksums[manifest["model"]], checksums[manifest["scalers"]]
+    # scalers_fingerprint is model_loader.file_sha256(scalers file)[:16], as in scaled_windows.
+    return ModelBundle(version, model, scalers, manifest,
+                       fingerprint=f"{version}-{model_sha[:8]}{scalers_sha[:8]}",
+                       scalers_fingerprint=scalers_sha[:16])
+
+def default_bundle() -> ModelBundle:
+    """The unversioned config.MODEL_PATH/SCALERS_PATH pair (no registry directory)."""
+    model, scalers = model_loader.load_prediction_assets(config.MODEL_PATH, config.SCALERS_PATH)
+    manifest = {"version": DEFAULT_VERSION, "features": config.FEATURES_TO_USE,
+                "lookback": config.LOOKBACK_PERIOD, "target": config.TARGET_COLUMN}
+    return ModelBundle(DEFAULT_VERSION, model, scalers, manifest,
+                       fingerprint=model_loader.file_sha256(config.MODEL_PATH, config.SCALERS_PATH)[:16],
+                       scalers_fingerprint=model_loader.file_sha256(config.SCALERS_PATH)[:16])
+
+def read_pointer(root: str = config.MODEL_REGISTRY_PATH) -> dict:
+    path = os.path.join(root, POINTER_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def active_scalers_path(root: str = config.MODEL_REGISTRY_PATH) -> str:
+    """Scalers file of the active version (what the collectors materialize windows with)."""
+    manifests = _manifests(root)
+    if not manifests:
+        return config.SCALERS_PATH
+    active = _pick_active(read_pointer(root).get("active"), manifests)
+    return os.path.join(root, active, manifests[active]["scalers"])
+
+def load_version(version: str = None, root: str = config.MODEL_REGISTRY_PATH) -> ModelBundle:
+    """Loads only this version (default: the active one), for one-shot scripts."""
+    manifests = _manifests(root)
+    if not manifests and version in (None, DEFAULT_VERSION):
+        return default_bundle()
+    version = version or _pick_active(read_pointer(root).get("active"), manifests)
+    if version not in manifests:
+        raise ValueError(f"Unknown model version {version}. Available: {sorted(manifests)}.")
+    return load_bundle(os.path.join(root, version))
+
+def _manifests(root: str) -> dict:
+    """version -> manifest of every bundle directory under root."""
+    if not os.path.isdir(root):
+        return {}
+    manifests = {}
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name, MANIFEST_FILE)
+        if not name.startswith(".") and os.path.exists(path):
+            with open(path) as f:
+                manifests[name] = json.load(f)
+    return manifests
+
+def _pick_active(requested, manifests: dict):
+    """The requested version when present, else the newest one (by created_at, then name)."""
+    if requested in manifests:
+        return requested
+    return max(manifests, key=lambda version: (manifests[version].get("created_at", ""), version))
+
+class ModelRegistry:
+    """Every valid bundle of the registry directory in memory, plus the active and shadow choice."""
+
+    def __init__(self, root: str = config.MODEL_REGISTRY_PATH):
+        self.root = root
+        self._state = ({}, None, [])  # (version -> bundle, active version, shadow versions), swapped whole
+        self._stamps = {}  # version -> manifest mtime when last loaded
+        self._refresh_lock = threading.Lock()
+        self._watcher = None
+        self._on_demand = root is not None  # until the first refresh(): get() loads single versions
+
+    @classmethod
+    def from_bundles(cls, bundles, active: str = None, shadow=()) -> "ModelRegistry":
+        """A fixed set of already loaded bundles, without a directory (benchmarks, tests)."""
+        registry = cls(root=None)
+        by_version = {bundle.version: bundle for bundle in bundles}
+        registry._state = (by_version, active or bundles[0].version, [v for v in shadow if v in by_version])
+        return registry
+
+    def refresh(self) -> bool:
+        """Loads new or changed bundles and swaps them in. Returns True when anything changed."""
+        if self.root is None:
+            return False
+        with self._refresh_lock:
+            self._on_demand = False
+            bundles, active, shadow = self._state
+            found = {}
+            for name in os.listdir(self.root) if os.path.isdir(self.root) else []:
+                manifest = os.path.join(self.root, name, MANIFEST_FILE)
+                if not name.startswith(".") and os.path.exists(manifest):
+                    found[name] = os.path.getmtime(manifest)
+            if not found:
+                if active == DEFAULT_VERSION:
+                    return False
+                self._state = ({DEFAULT_VERSION: default_bundle()}, DEFAULT_VERSION, [])
+                return True
+
+            new_bundles = {version: bundle for version, bundle in bundles.items() if version in found}
+            for version, stamp in found.items():
+                if self._stamps.get(version) == stamp:
+                    continue
+                self._stamps[version] = stamp  # a broken bundle is retried once its manifest changes
+                try:
+                    new_bundles[version] = load_bundle(os.path.join(self.root, version))
+                    metrics.inc("model_reloads_total", version=version)
+                    print(f"🔄 Loaded model version {version}", file=sys.stderr)
+                except Exception as e:
+                    metrics.inc("model_reload_errors_total", version=version)
+                    print(f"⚠️  Skipping model version {version}: {e}", file=sys.stderr)
+            for version in set(self._stamps) - set(found):
+                del self._stamps[version]
+            if not new_bundles:
+                raise ValueError(f"No loadable model version in {self.root}.")
+
+            pointer = read_pointer(self.root)
+            manifests = {version: bundle.manifest for version, bundle in new_bundles.items()}
+            new_active = _pick_active(pointer.get("active"), manifests)
+            new_shadow = [v for v in pointer.get("shadow", []) if v in new_bundles and v != new_active]
+            changed = (new_bundles != bundles or new_active != active or new_shadow != shadow)
+            self._state = (new_bundles, new_active, new_shadow)
+            return changed
+
+    def get(self, version: str = None) -> ModelBundle:
+        """The bundle of this version (default: the active one)."""
+        bundles, active, _shadow = self._state
+        if version is None:
+            version = active
+        if version not in bundles and self._on_demand:
+            return self._load_one(version)
+        if version not in bundles:
+            raise ValueError(f"Unknown model version {version}. Available: {sorted(bundles)}.")
+        return bundles[version]
+
+    def _load_one(self, version: str = None) -> ModelBundle:
+        """Loads a single version (default: the active one) without the rest of the registry."""
+        with self._refresh_lock:
+            bundle = load_version(version, self.root)
+            bundles, active, shadow = self._state
+            self._state = ({**bundles, bundle.version: bundle}, active or bundle.version, shadow)
+        return bundle
+
+    def shadows(self) -> list:
+        """Bundles scored alongside the active one for comparison."""
+        bundles, _active, shadow = self._state
+        return [bundles[version] for version in shadow]
+
+    def describe(self) -> dict:
+        bundles, active, shadow = self._state
+        return {"active": active, "shadow": shadow,
+                "versions": [bundles[version].describe() for version in sorted(bundles)]}
+
+    def watch(self, interval: float = config.MODEL_REGISTRY_POLL_SECONDS) -> threading.Thread:
+        """Polls the registry directory every `interval` seconds in a daemon thread."""
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"⚠️  Model registry refresh failed: {e}", file=sys.stderr)
+
+        if self._watcher is None and self.root is not None:
+            self._watcher = threading.Thread(target=poll, name="model-registry-watch", daemon=True)
+            self._watcher.start()
+        return self._watcher
+
+# --- Managing the registry directory ---
+
+def register(version: str, model_path: str = config.MODEL_PATH, scalers_path: str = config.SCALERS_PATH,
+             root: str = config.MODEL_REGISTRY_PATH, activate: bool = False) -> str:
+    """Copies a model and its scalers into a new version directory with its manifest."""
+    target = os.path.join(root, version)
+    if os.path.exists(target):
+        raise ValueError(f"Model version {version} already exists in {root}.")
+    staging = os.path.join(root, f".{version}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    files = [os.path.basename(model_path), os.path.basename(scalers_path)]
+    for source, name in zip((model_path, scalers_path), files):
+        shutil.copy2(source, os.path.join(staging, name))
+    manifest = {
+        "version": version,
+        "model": files[0],
+        "scalers": files[1],
+        "features": config.FEATURES_TO_USE,
+        "lookback": config.LOOKBACK_PERIOD,
+        "target": config.TARGET_COLUMN,
+        "sha256": {name: model_loader.file_sha256(os.path.join(staging, name)) for name in files},
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(staging, target)
+    if activate:
+        set_pointer(version, read_pointer(root).get("shadow", []), root)
+    return target
+
+def set_pointer(active: str, shadow=(), root: str = config.MODEL_REGISTRY_PATH):
+    """Writes registry.json (active and shadow versions) atomically."""
+    path = os.path.join(root, POINTER_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"active": active, "shadow": [v for v in shadow if v != active]}, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the versioned model registry.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    register_parser = commands.add_parser("register", help="Add a model/scalers pair as a new version.")
+    register_parser.add_argument("version")
+    register_parser.add_argument("--model", default=config.MODEL_PATH)
+    register_parser.add_argument("--scalers", default=config.SCALERS_PATH)
+    register_parser.add_argument("--activate", action="store_true")
+    activate_parser = commands.add_parser("activate", help="Serve this version (and optionally shadow-score others).")
+    activate_parser.add_argument("version")
+    activate_parser.add_argument("--shadow", nargs="*", default=[])
+    commands.add_parser("list", help="Show the versions, active and shadow.")
+    args = parser.parse_args()
+
+    if args.command == "register":
+        print(f"✅ Registered {register(args.version, args.model, args.scalers, activate=args.activate)}")
+    elif args.command == "activate":
+        manifests = _manifests(config.MODEL_REGISTRY_PATH)
+        unknown = [v for v in [args.version, *args.shadow] if v not in manifests]
+        if unknown:
+            sys.exit(f"❌ Unknown model version(s): {', '.join(unknown)}")
+        set_pointer(args.version, args.shadow)
+        print(f"✅ Active: {args.version}, shadow: {args.shadow or 'none'}")
+    else:
+        pointer = read_pointer()
+        manifests = _manifests(config.MODEL_REGISTRY_PATH)
+        active = _pick_active(pointer.get("active"), manifests) if manifests else None
+        for version, manifest in manifests.items():
+            role = "active" if version == active else "shadow" if version in pointer.get("shadow", []) else ""
+            print(f"  {version:<12} {manifest.get('created_at', ''):<20} {manifest['model']} + {manifest['scalers']} {role}")
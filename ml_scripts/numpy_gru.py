@@ -0,0 +1,78 @@
+# ml_scripts/numpy_gru.py
+"""
+Inference-only NumPy implementation of the Sequential GRU model.
+
+Loads the weight arrays written by model_export.py (a single .npz) and runs the
+forward pass without importing TensorFlow. Supports the layers the GRU model is
+built from: GRU (Keras reset_after=True, gate order z/r/h), Dropout (a no-op at
+inference) and Dense. The object exposes predict_on_batch/predict like a Keras
+model so it can be used as a drop-in replacement.
+"""
+
+import json
+import numpy as np
+
+def _sigmoid(x):
+    # tanh form: same values as 1 / (1 + exp(-x)) without overflow for large |x|.
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+_ACTIVATIONS = {
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "linear": lambda x: x,
+}
+
+class NumpyGRUModel:
+    """Stack of GRU/Dense layers evaluated with NumPy (float32)."""
+
+    def __init__(self, layers: list, weights: dict, source_sha256: str = None):
+        self.layers = layers
+        self.weights = weights
+        self.source_sha256 = source_sha256
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyGRUModel":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["__meta__"]))
+            weights = {name: data[name] for name in data.files if name != "__meta__"}
+        return cls(meta["layers"], weights, meta.get("source_sha256"))
+
+    def _gru(self, x, layer):
+        name, units = layer["name"], layer["units"]
+        kernel = self.weights[f"{name}/kernel"]
+        recurrent_kernel = self.weights[f"{name}/recurrent_kernel"]
+        input_bias, recurrent_bias = self.weights[f"{name}/bias"]
+        activation = _ACTIVATIONS[layer["activation"]]
+        recurrent_activation = _ACTIVATIONS[layer["recurrent_activation"]]
+
+        # Input projections for every timestep in one matmul: (N, T, 3 * units).
+        x_proj = x @ kernel + input_bias
+        h = np.zeros((x.shape[0], units), dtype=x.dtype)
+        outputs = []
+        for t in range(x.shape[1]):
+            xz, xr, xh = np.split(x_proj[:, t, :], 3, axis=1)
+            hz, hr, hh = np.split(h @ recurrent_kernel + recurrent_bias, 3, axis=1)
+            z = recurrent_activation(xz + hz)
+            r = recurrent_activation(xr + hr)
+            candidate = activation(xh + r * hh)
+            h = z * h + (1.0 - z) * candidate
+            if layer["return_sequences"]:
+                outputs.append(h)
+        return np.stack(outputs, axis=1) if layer["return_sequences"] else h
+
+    def _dense(self, x, layer):
+        name = layer["name"]
+        return _ACTIVATIONS[layer["activation"]](x @ self.weights[f"{name}/kernel"] + self.weights[f"{name}/bias"])
+
+    def predict_on_batch(self, X) -> np.ndarray:
+        x = np.asarray(X, dtype=np.float32)
+        for layer in self.layers:
+            if layer["type"] == "GRU":
+                x = self._gru(x, layer)
+            elif layer["type"] == "Dense":
+                x = self._dense(x, layer)
+        return x
+
+    def predict(self, X, verbose=0, **kwargs) -> np.ndarray:
+        return self.predict_on_batch(X)
@@ -0,0 +1,82 @@
+# ml_scripts/predict.py
+"""
+Multi-step (recursive) forecasting with the next-day GRU model.
+
+Each step predicts the next Close for every ticker in one batched forward pass,
+builds a synthetic bar from it and slides it into the lookback window. The
+derived features of that bar (RSI_14, MACD_12_26_9, volatility_20d) are updated
+incrementally from the ticker's indicator state instead of recomputing the
+indicators over the whole window; Volume is carried forward from the last bar.
+"""
+
+import copy
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import config
+import incremental_features
+from scaler_table import stack_scaler_params
+
+def make_multistep_forecast_batch(model, windows: dict, scalers: dict, forecast_days: int,
+                                  states: dict = None,
+                                  features_to_use=config.FEATURES_TO_USE,
+                                  target_column=config.TARGET_COLUMN) -> dict:
+    """
+    Rolls the model forward `forecast_days` steps for many tickers at once.
+    `windows` maps ticker -> the last LOOKBACK_PERIOD feature rows (indexed by Date);
+    `states` optionally maps ticker -> incremental indicator state at the window's
+    last bar (see data_handler.get_feature_states). Returns ticker -> list of prices.
+    """
+    tickers = list(windows)
+    if not tickers or forecast_days <= 0:
+        return {ticker: [] for ticker in tickers}
+
+    # Never mutate the caller's (or the collector's stored) indicator state.
+    states = {
+        ticker: copy.deepcopy(states[ticker]) if states and ticker in states
+        else incremental_features.state_from_history(ticker, windows[ticker])
+        for ticker in tickers
+    }
+
+    scale, offset = stack_scaler_params(scalers, tickers)
+    raw = np.stack([windows[t][features_to_use].to_numpy(dtype=np.float64) for t in tickers])
+    X = raw * scale[:, np.newaxis, :] + offset[:, np.newaxis, :]
+
+    col = {name: i for i, name in enumerate(features_to_use)}
+    target_index = col[target_column]
+    last_rows = raw[:, -1, :].copy()
+    last_dates = [windows[t].index[-1] for t in tickers]
+
+    forecasts = np.empty((len(tickers), forecast_days))
+    for step in range(forecast_days):
+        scaled_prediction = np.asarray(model.predict_on_batch(X))[:, 0]
+        prices = (scaled_prediction - offset[:, target_index]) / scale[:, target_index]
+        forecasts[:, step] = prices
+
+        # Synthetic next bar: predicted Close, carried Volume, incrementally updated indicators.
+        next_rows = last_rows.copy()
+        next_rows[:, target_index] = prices
+        for i, ticker in enumerate(tickers):
+            bar_date = pd.Timestamp(last_dates[i]) + timedelta(days=step + 1)
+            indicators = incremental_features.update_state(states[ticker], bar_date, prices[i])
+            for name, value in indicators.items():
+                if name in col and not np.isnan(value):
+                    next_rows[i, col[name]] = value
+        last_rows = next_rows
+
+        scaled_rows = next_rows * scale + offset
+        X = np.concatenate([X[:, 1:, :], scaled_rows[:, np.newaxis, :]], axis=1)
+
+    return {ticker: [float(p) for p in forecasts[i]] for i, ticker in enumerate(tickers)}
+
+def make_multistep_forecast(model, latest_data: pd.DataFrame, scaler, forecast_days: int,
+                            features_to_use=config.FEATURES_TO_USE,
+                            target_column=config.TARGET_COLUMN,
+                            state: dict = None) -> list:
+    """Single-ticker wrapper around make_multistep_forecast_batch; returns the forecasted prices."""
+    states = {"_": state} if state is not None else None
+    forecasts = make_multistep_forecast_batch(
+        model, {"_": latest_data}, {"_": scaler}, forecast_days, states,
+        features_to_use, target_column,
+    )
+    return forecasts["_"]
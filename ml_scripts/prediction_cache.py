@@ -0,0 +1,87 @@
+# ml_scripts/prediction_cache.py
+"""
+Two-tier cache for next-day predictions.
+
+Entries are keyed on (ticker, last Date in the lookback window, data revision,
+fingerprint of the model and scaler files), so a prediction is reused until a
+new daily bar lands, a stored bar is revised or the model artifacts change:
+  - tier 1: an in-process LRU (fast path for the long-running prediction server),
+  - tier 2: an optional MongoDB collection shared by every process.
+The revision (db_handler.fetch_data_revisions) is the time of the ticker's latest
+write, kept in one revision document per ticker, so other processes' LRU entries
+move to a new key after any write, including a same-date revision.
+db_handler.save_data_to_db also calls invalidate_tickers() after each write,
+which drops the stale entries of the persistent tier and of the writer's own LRU.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+import pandas as pd
+import config
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_indexed_collections = set()
+
+def _cache_key(ticker: str, last_date, revision, fingerprint: str) -> str:
+    return f"{ticker}|{pd.Timestamp(last_date).strftime('%Y-%m-%d')}|{revision}|{fingerprint}"
+
+def _persistent_collection(db):
+    if db is None or not config.PREDICTION_CACHE_COLLECTION:
+        return None
+    collection = db[config.PREDICTION_CACHE_COLLECTION]
+    if collection.full_name not in _indexed_collections:
+        # Entries of replaced models are never read again; let MongoDB expire them.
+        collection.create_index("created_at", expireAfterSeconds=config.PREDICTION_CACHE_TTL_SECONDS)
+        collection.create_index("ticker")
+        _indexed_collections.add(collection.full_name)
+    return collection
+
+def get(db, ticker: str, last_date, revision, fingerprint: str):
+    """Returns the cached result for this key, or None on a miss."""
+    key = _cache_key(ticker, last_date, revision, fingerprint)
+    with _memory_lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return dict(_memory[key])
+
+    persistent = _persistent_collection(db)
+    if persistent is not None:
+        doc = persistent.find_one({"_id": key}, {"result": 1})
+        if doc is not None:
+            _remember(key, doc["result"])
+            return dict(doc["result"])
+    return None
+
+def put(db, ticker: str, last_date, revision, fingerprint: str, result: dict):
+    """Stores a successful prediction in both tiers."""
+    key = _cache_key(ticker, last_date, revision, fingerprint)
+    _remember(key, result)
+
+    persistent = _persistent_collection(db)
+    if persistent is not None:
+        persistent.replace_one(
+            {"_id": key},
+            {"_id": key, "ticker": ticker, "fingerprint": fingerprint,
+             "result": result, "created_at": datetime.now(timezone.utc)},
+            upsert=True,
+        )
+
+def _remember(key: str, result: dict):
+    with _memory_lock:
+        _memory[key] = dict(result)
+        _memory.move_to_end(key)
+        while len(_memory) > config.PREDICTION_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+def invalidate_tickers(db, tickers):
+    """Drops every cached prediction for these tickers (their input windows changed)."""
+    tickers = set(tickers)
+    with _memory_lock:
+        for key in [k for k in _memory if k.split('|', 1)[0] in tickers]:
+            del _memory[key]
+
+    persistent = _persistent_collection(db)
+    if persistent is not None:
+        persistent.delete_many({"ticker": {"$in": list(tickers)}})
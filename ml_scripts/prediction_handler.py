@@ -7,78 +7,281 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import json
-import numpy as np
-import pandas as pd
+import threading
 from datetime import timedelta
 
 import config
-import db_handler
-from model_loader import load_prediction_assets
+import metrics
+import startup_profile
+from startup_profile import lazy_module
 
-def generate_single_prediction(ticker: str):
+# Heavy modules load on first use, so usage errors and thin-client runs stay fast.
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+db_handler = lazy_module("db_handler")
+prediction_cache = lazy_module("prediction_cache")
+scaled_windows = lazy_module("scaled_windows")
+scaler_table = lazy_module("scaler_table")
+
+# Process-wide assets: loaded on first use and reused by every later prediction,
+# so a long-running server pays the TensorFlow/model/Mongo startup cost only once.
+_assets = None  # (model registry, collection)
+_assets_lock = threading.Lock()
+_predict_lock = threading.Lock()
+
+def get_prediction_assets():
     """
-    Pipeline to generate a single next-day prediction using PRE-CALCULATED data from MongoDB.
+    Returns (registry, collection), created on the first call only. registry.get(version)
+    is a ModelBundle whose fingerprint is part of every cache key. Bundles load on demand,
+    so a one-shot run loads only the version it uses (and scores no shadow versions);
+    the prediction server loads them all and watches for changes (prediction_server.warm_up).
     """
-    try:
-        collection, client = db_handler.get_db_collection()
-        model, scalers = load_prediction_assets(config.MODEL_PATH, config.SCALERS_PATH)
-        
-        latest_data = db_handler.fetch_data_from_db(collection, ticker, config.LOOKBACK_PERIOD)
-        client.close()
-
-        if len(latest_data) < config.LOOKBACK_PERIOD:
-            message = f"Insufficient data in DB for {ticker}. Need {config.LOOKBACK_PERIOD}, found {len(latest_data)}."
-            raise ValueError(message)
-
-        scaler = scalers.get(ticker)
-        if not scaler:
-            raise ValueError(f"No scaler found for {ticker}.")
-
-        scaled_input = scaler.transform(latest_data[config.FEATURES_TO_USE])
-        X_pred = np.reshape(scaled_input, (1, config.LOOKBACK_PERIOD, len(config.FEATURES_TO_USE)))
-
-        scaled_prediction = model.predict(X_pred, verbose=0)
-        
-        target_col_index = config.FEATURES_TO_USE.index(config.TARGET_COLUMN)
-        dummy_array = np.zeros((1, len(config.FEATURES_TO_USE)))
-        dummy_array[0, target_col_index] = scaled_prediction[0, 0]
-        actual_prediction = scaler.inverse_transform(dummy_array)
-        predicted_price = actual_prediction[0, target_col_index]
-
-        # --- NEW: Data range ko result mein show karne ke liye ---
-        start_point_date = pd.to_datetime(latest_data['Date'].iloc[0]).strftime('%Y-%m-%d')
-        start_point_price = round(float(latest_data['Close'].iloc[0]), 2)
-
-        end_point_date = pd.to_datetime(latest_data['Date'].iloc[-1]).strftime('%Y-%m-%d')
-        end_point_price = round(float(latest_data['Close'].iloc[-1]), 2)
-        
-        prediction_date = pd.to_datetime(end_point_date) + timedelta(days=1)
-        
-        result = {
-            "status": "success",
-            "ticker": ticker,
-            "prediction_date": prediction_date.strftime('%Y-%m-%d'),
-            "predicted_price": round(float(predicted_price), 2),
-            "data_used": {
-                "start_point": {
-                    "date": start_point_date,
-                    "price": start_point_price
-                },
-                "end_point": {
-                    "date": end_point_date,
-                    "price": end_point_price
-                }
+    global _assets
+    if _assets is None:
+        with _assets_lock:
+            if _assets is None:
+                # Imported here so that thin-client runs never pay the TensorFlow import.
+                from model_registry import ModelRegistry
+
+                registry = ModelRegistry()
+                collection = db_handler.get_db_collection()  # pooled, shared
+                _assets = (registry, collection)
+    return _assets
+
+def window_summary(latest_data: "pd.DataFrame") -> dict:
+    """First/last Date and Close of a fetched window, as stored with materialized windows."""
+    return {"first_date": latest_data['Date'].iloc[0], "first_close": float(latest_data['Close'].iloc[0]),
+            "last_date": latest_data['Date'].iloc[-1], "last_close": float(latest_data['Close'].iloc[-1])}
+
+def format_prediction_result(ticker: str, window: dict, predicted_price: float, model_version: str = None) -> dict:
+    """Builds the JSON-ready result for one ticker's next-day prediction (`window`: see window_summary)."""
+    # --- NEW: Data range ko result mein show karne ke liye ---
+    start_point_date = pd.to_datetime(window['first_date']).strftime('%Y-%m-%d')
+    start_point_price = round(window['first_close'], 2)
+
+    end_point_date = pd.to_datetime(window['last_date']).strftime('%Y-%m-%d')
+    end_point_price = round(window['last_close'], 2)
+
+    prediction_date = pd.to_datetime(end_point_date) + timedelta(days=1)
+
+    result = {
+        "status": "success",
+        "ticker": ticker,
+        "prediction_date": prediction_date.strftime('%Y-%m-%d'),
+        "predicted_price": round(float(predicted_price), 2),
+        "model_version": model_version,
+        "data_used": {
+            "start_point": {
+                "date": start_point_date,
+                "price": start_point_price
+            },
+            "end_point": {
+                "date": end_point_date,
+                "price": end_point_price
             }
         }
+    }
+    return result
+
+def materialized_windows(collection, bundle, revisions: dict) -> dict:
+    """
+    Scaled windows written at ingest time (scaled_windows.py) that were read at each
+    ticker's current data revision and scaled with this bundle's scalers: ticker -> entry.
+    `revisions` is ticker -> (last Date, revision), as from db_handler.fetch_data_revisions.
+    """
+    if bundle.scalers_fingerprint is None or not revisions:
+        return {}
+    entries = scaled_windows.load(collection, list(revisions), bundle.scalers_fingerprint)
+    return {ticker: entry for ticker, entry in entries.items()
+            if entry.get("revision") == revisions[ticker][1]
+            and pd.Timestamp(entry["last_date"]) == pd.Timestamp(revisions[ticker][0])}
+
+def generate_single_prediction(ticker: str, version: str = None):
+    """
+    Pipeline to generate a single next-day prediction using PRE-CALCULATED data from MongoDB.
+    `version` picks a registered model version (default: the active one).
+    """
+    try:
+        registry, collection = get_prediction_assets()
+        # Taken once: a hot swap during this request does not change the model it uses.
+        with startup_profile.phase("model_load"):
+            bundle = registry.get(version)
+        model, scalers, fingerprint = bundle.model, bundle.scalers, bundle.fingerprint
+
+        with startup_profile.phase("fetch"):
+            # The input window only changes when the ticker's data is written: serve repeats from the cache.
+            last_date, revision = db_handler.fetch_data_revisions(collection, [ticker]).get(ticker, (None, None))
+            if last_date is not None:
+                cached = prediction_cache.get(collection.database, ticker, last_date, revision, fingerprint)
+                if cached is not None:
+                    metrics.inc("predictions_total", mode="single", status="cached")
+                    return cached
+
+            # Scaled at ingest time: the stored window goes straight into the model.
+            current = {ticker: (last_date, revision)} if last_date is not None else {}
+            entry = materialized_windows(collection, bundle, current).get(ticker)
+            if entry is None:
+                dates, values = db_handler.fetch_window_arrays(collection, ticker, config.LOOKBACK_PERIOD)
+
+        if entry is None:
+            scaler = scalers.get(ticker)
+            if not scaler:
+                raise ValueError(f"No scaler found for {ticker}.")
+            with startup_profile.phase("inference"), \
+                    metrics.timer("prediction_stage_seconds", stage="scale", mode="single"):
+                entry = scaled_windows.build_entry(ticker, dates, values, scaler, fingerprint=None)
+
+        with startup_profile.phase("inference"):
+            # predict_on_batch skips the tf.data pipeline that predict() builds on every call.
+            with _predict_lock, metrics.timer("prediction_stage_seconds", stage="predict", mode="single"):
+                scaled_prediction = model.predict_on_batch(entry["window"][np.newaxis])
+
+            with metrics.timer("prediction_stage_seconds", stage="inverse", mode="single"):
+                predicted_price = (float(scaled_prediction[0, 0]) - entry["target_offset"]) / entry["target_scale"]
+
+        result = format_prediction_result(ticker, entry, predicted_price, bundle.version)
+        prediction_cache.put(collection.database, ticker, entry["last_date"], revision, fingerprint, result)
+        metrics.inc("predictions_total", mode="single", status="success")
         return result
 
     except Exception as e:
+        metrics.inc("predictions_total", mode="single", status="error")
         return {"status": "error", "message": str(e)}
 
+def generate_batch_predictions(tickers: list, version: str = None) -> list:
+    """
+    Generates next-day predictions for many tickers with one DB query and one forward pass.
+    Returns one result dict per ticker, in the order given; failures are reported per ticker.
+    Without an explicit `version`, every shadow version of the registry scores the same
+    windows in one more forward pass; its prices are added under "shadow" (version -> price).
+    """
+    try:
+        registry, collection = get_prediction_assets()
+        with startup_profile.phase("model_load"):
+            bundle = registry.get(version)
+        shadows = registry.shadows() if version is None else []
+    except Exception as e:
+        metrics.inc("predictions_total", len(tickers), mode="batch", status="error")
+        return [{"status": "error", "ticker": ticker, "message": str(e)} for ticker in tickers]
+
+    fetched = {}  # latest dates/revisions and raw windows, shared with the shadow passes
+    results = _predict_batch(bundle, collection, tickers, fetched)
+    for shadow in shadows:
+        shadow_results = _predict_batch(shadow, collection, tickers, fetched, mode="shadow")
+        for result, shadow_result in zip(results, shadow_results):
+            if result["status"] == "success" and shadow_result["status"] == "success":
+                result.setdefault("shadow", {})[shadow.version] = shadow_result["predicted_price"]
+    return results
+
+def _predict_batch(bundle, collection, tickers: list, fetched: dict, mode: str = "batch") -> list:
+    """One bundle's batch: cache lookups, one window query for the misses, one forward pass."""
+    model, scalers, fingerprint = bundle.model, bundle.scalers, bundle.fingerprint
+    try:
+        with startup_profile.phase("fetch"):
+            results = {}
+            if "revisions" not in fetched:
+                fetched["revisions"] = db_handler.fetch_data_revisions(collection, tickers)
+            revisions = fetched["revisions"]
+            for ticker, (last_date, revision) in revisions.items():
+                cached = prediction_cache.get(collection.database, ticker, last_date, revision, fingerprint)
+                if cached is not None:
+                    results[ticker] = cached
+
+            missing = [ticker for ticker in tickers if ticker not in results]
+            metrics.inc("predictions_total", len(results), mode=mode, status="cached")
+            # Windows scaled at ingest time need no fetch; the rest are read in one query.
+            entries = materialized_windows(collection, bundle, {t: revisions[t] for t in missing if t in revisions})
+            to_fetch = [ticker for ticker in missing if ticker not in entries]
+            windows = fetched.setdefault("windows", {})
+            # Windows are read only for tickers in the revisions snapshot: one with no data
+            # then is reported as such even if its first bars land before the window query.
+            not_fetched = [ticker for ticker in to_fetch if ticker not in windows and ticker in revisions]
+            if not_fetched:
+                windows.update(db_handler.fetch_windows_from_db(collection, not_fetched, config.LOOKBACK_PERIOD))
+    except Exception as e:
+        metrics.inc("predictions_total", len(tickers), mode=mode, status="error")
+        return [{"status": "error", "ticker": ticker, "message": str(e)} for ticker in tickers]
+
+    ready = []
+    for ticker in to_fetch:
+        latest_data = windows.get(ticker)
+        found = 0 if latest_data is None else len(latest_data)
+        if found < config.LOOKBACK_PERIOD:
+            message = f"Insufficient data in DB for {ticker}. Need {config.LOOKBACK_PERIOD}, found {found}."
+            results[ticker] = {"status": "error", "ticker": ticker, "message": message}
+        elif not scalers.get(ticker):
+            results[ticker] = {"status": "error", "ticker": ticker, "message": f"No scaler found for {ticker}."}
+        else:
+            ready.append(ticker)
+
+    if ready or entries:
+        try:
+            with startup_profile.phase("inference"):
+                with metrics.timer("prediction_stage_seconds", stage="scale", mode=mode):
+                    target_col_index = config.FEATURES_TO_USE.index(config.TARGET_COLUMN)
+                    X_parts, target_scale, target_offset = [], [], []
+                    if entries:
+                        X_parts.append(np.stack([entry["window"] for entry in entries.values()]))
+                        target_scale += [entry["target_scale"] for entry in entries.values()]
+                        target_offset += [entry["target_offset"] for entry in entries.values()]
+                    if ready:
+                        # (N, LOOKBACK_PERIOD, n_features) raw windows, scaled per ticker by broadcasting.
+                        X_raw = np.stack([windows[t][config.FEATURES_TO_USE].to_numpy(dtype=np.float64) for t in ready])
+                        scale, offset = scaler_table.stack_scaler_params(scalers, ready)
+                        X_parts.append((X_raw * scale[:, np.newaxis, :] + offset[:, np.newaxis, :]).astype(np.float32))
+                        target_scale += scale[:, target_col_index].tolist()
+                        target_offset += offset[:, target_col_index].tolist()
+                    X_pred = np.concatenate(X_parts)
+
+                with _predict_lock, metrics.timer("prediction_stage_seconds", stage="predict", mode=mode):
+                    scaled_predictions = model.predict_on_batch(X_pred)[:, 0]
+
+                with metrics.timer("prediction_stage_seconds", stage="inverse", mode=mode):
+                    predicted_prices = (scaled_predictions - np.asarray(target_offset)) / np.asarray(target_scale)
+
+            # Same order as X_pred: materialized entries first, then the fetched windows.
+            summaries = {**entries, **{ticker: window_summary(windows[ticker]) for ticker in ready}}
+            for ticker, predicted_price in zip(summaries, predicted_prices):
+                results[ticker] = format_prediction_result(ticker, summaries[ticker], predicted_price, bundle.version)
+                prediction_cache.put(collection.database, ticker, summaries[ticker]["last_date"],
+                                     revisions[ticker][1], fingerprint, results[ticker])
+        except Exception as e:
+            for ticker in list(entries) + ready:
+                results[ticker] = {"status": "error", "ticker": ticker, "message": str(e)}
+
+    for ticker in missing:
+        metrics.inc("predictions_total", mode=mode, status=results[ticker]["status"])
+    return [results[ticker] for ticker in tickers]
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print(json.dumps({"status": "error", "message": "Usage: python3 prediction_handler.py <TICKER_SYMBOL.NS>"}))
+    args = metrics.enable_from_argv(startup_profile.enable_from_argv(sys.argv[1:]))
+    if not args:
+        print(json.dumps({"status": "error", "message": "Usage: python3 prediction_handler.py <TICKER_SYMBOL.NS> [<TICKER_SYMBOL.NS> ...] | --all [--profile-startup] [--metrics[=json|prometheus]]"}))
+    elif len(args) == 1 and args[0] != "--all":
+        ticker_symbol = args[0].upper()
+        # Thin client: ask a running prediction server first, predict in-process if there is none.
+        import prediction_server
+        try:
+            final_result = prediction_server.request_prediction({"ticker": ticker_symbol})
+        except prediction_server.ServerUnavailable:
+            final_result = generate_single_prediction(ticker_symbol)
+        except OSError as e:
+            # The server took the request: predicting again here could duplicate its work.
+            final_result = {"status": "error", "message": f"Prediction server failed to answer: {e}"}
+        with startup_profile.phase("serialization"):
+            output = json.dumps(final_result, indent=4)
+        print(output)
     else:
-        ticker_symbol = sys.argv[1].upper()
-        final_result = generate_single_prediction(ticker_symbol)
-        print(json.dumps(final_result, indent=4))
\ No newline at end of file
+        tickers = config.TICKERS if args == ["--all"] else [arg.upper() for arg in args]
+        import prediction_server
+        try:
+            batch_results = prediction_server.request_prediction({"tickers": tickers})
+        except prediction_server.ServerUnavailable:
+            batch_results = generate_batch_predictions(tickers)
+        except OSError as e:
+            batch_results = [{"status": "error", "message": f"Prediction server failed to answer: {e}"}]
+        with startup_profile.phase("serialization"):
+            output = json.dumps(batch_results, indent=4)
+        print(output)
+    startup_profile.emit()
+    metrics.emit()
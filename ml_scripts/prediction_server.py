@@ -0,0 +1,142 @@
+# ml_scripts/prediction_server.py
+
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import json
+import socket
+import socketserver
+
+import config
+import metrics
+
+def handle_request(request: dict):
+    """
+    Answers a single JSON request.
+    Supported requests: {"ticker": "TCS.NS"}, {"tickers": ["TCS.NS", ...]}, {"command": "ping"},
+    {"command": "metrics", "format": "json"|"prometheus"} (the server's live metrics) and
+    {"command": "models"} (loaded model versions). Prediction requests may name a
+    registered "model_version"; the active one is used otherwise.
+    """
+    # Imported lazily so the thin client (request_prediction) stays lightweight.
+    import prediction_handler
+
+    if request.get("command") == "ping":
+        return {"status": "success", "message": "pong"}
+
+    if request.get("command") == "metrics":
+        if request.get("format") == "prometheus":
+            return {"status": "success", "metrics": metrics.prometheus_text()}
+        return {"status": "success", "metrics": metrics.snapshot()}
+
+    if request.get("command") == "models":
+        registry, _collection = prediction_handler.get_prediction_assets()
+        return {"status": "success", "models": registry.describe()}
+
+    version = request.get("model_version")
+    tickers = request.get("tickers")
+    if tickers is not None:
+        if not isinstance(tickers, list) or not tickers:
+            return {"status": "error", "message": "'tickers' must be a non-empty list."}
+        return prediction_handler.generate_batch_predictions([str(t).upper() for t in tickers], version)
+
+    ticker = request.get("ticker")
+    if not ticker:
+        return {"status": "error", "message": "Request must contain a 'ticker' field."}
+    return prediction_handler.generate_single_prediction(str(ticker).upper(), version)
+
+def handle_line(line: str) -> str:
+    """Decodes one JSON-lines request and returns the encoded response line."""
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object.")
+        response = handle_request(request)
+    except ValueError as e:
+        response = {"status": "error", "message": f"Invalid request: {e}"}
+    return json.dumps(response) + "\n"
+
+class PredictionRequestHandler(socketserver.StreamRequestHandler):
+    """Serves JSON-lines requests on one client connection until it is closed."""
+
+    def handle(self):
+        for raw_line in self.rfile:
+            line = raw_line.decode("utf-8").strip()
+            if not line:
+                continue
+            self.wfile.write(handle_line(line).encode("utf-8"))
+            self.wfile.flush()
+
+class PredictionServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def warm_up():
+    """
+    Loads the model bundles and Mongo connection before the first request arrives, and
+    starts watching the model registry: new or re-activated versions are swapped in live.
+    """
+    import prediction_handler
+    registry, _collection = prediction_handler.get_prediction_assets()
+    registry.refresh()
+    registry.watch()
+
+def serve_socket(host: str = config.PREDICTION_SERVER_HOST, port: int = config.PREDICTION_SERVER_PORT):
+    """Runs the prediction server on a local TCP socket until interrupted."""
+    warm_up()
+    with PredictionServer((host, port), PredictionRequestHandler) as server:
+        print(f"🚀 Prediction server listening on {host}:{port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("🛑 Prediction server stopped", file=sys.stderr)
+
+def serve_stdio():
+    """Runs the prediction server over stdin/stdout, one JSON request per line."""
+    warm_up()
+    for raw_line in sys.stdin:
+        line = raw_line.strip()
+        if not line:
+            continue
+        sys.stdout.write(handle_line(line))
+        sys.stdout.flush()
+
+class ServerUnavailable(ConnectionError):
+    """No prediction server accepted the connection (callers may predict in-process instead)."""
+
+def request_prediction(request: dict,
+                       host: str = config.PREDICTION_SERVER_HOST,
+                       port: int = config.PREDICTION_SERVER_PORT,
+                       timeout: float = config.PREDICTION_SERVER_TIMEOUT):
+    """
+    Sends one request to a running prediction server and returns its response.
+    Raises ServerUnavailable when no server is reachable, and another OSError
+    (e.g. a timeout) when a connected server fails to answer.
+    """
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    except OSError as e:
+        raise ServerUnavailable(f"No prediction server at {host}:{port}: {e}") from e
+    with sock:
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as reader:
+            response_line = reader.readline()
+    if not response_line:
+        raise ConnectionError("Prediction server closed the connection without a response.")
+    return json.loads(response_line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-lived GRU prediction server.")
+    parser.add_argument("--stdio", action="store_true", help="Serve JSON lines over stdin/stdout instead of a socket.")
+    parser.add_argument("--host", default=config.PREDICTION_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.PREDICTION_SERVER_PORT)
+    args = parser.parse_args()
+
+    if args.stdio:
+        serve_stdio()
+    else:
+        serve_socket(args.host, args.port)
@@ -0,0 +1,129 @@
+# ml_scripts/scaled_windows.py
+"""
+Scaled lookback windows materialized at ingest time.
+
+After writing new bars, the collectors call refresh() for the tickers they
+touched. It scales each ticker's latest LOOKBACK_PERIOD rows once and stores:
+  - the window as a float32 (LOOKBACK_PERIOD, n_features) blob, ready for the model,
+  - the (scale, offset) pair of the target column: price = (y - offset) / scale,
+  - the first/last Date and Close that the prediction result reports.
+An entry is used only while its data revision (db_handler.fetch_data_revisions,
+read before the window) is still the ticker's revision and its fingerprint matches
+the scalers of the model version predicting (scalers.pkl, or the active bundle's
+scalers with a model registry); otherwise inference takes the full path. Writes
+also drop the stored entries of the written tickers (db_handler.written).
+
+Storage: one document per ticker in config.SCALED_WINDOW_COLLECTION, or
+<FEATURE_STORE_PATH>/<TICKER>/scaled_window.npz with the npy backend.
+"""
+
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import config
+import db_handler
+import feature_store
+import model_loader
+import model_registry
+from scaler_table import scaler_params
+
+WINDOW_FILE = "scaled_window.npz"
+
+_scalers = (None, None)  # (fingerprint, scalers)
+
+def _load_scalers(path: str):
+    global _scalers
+    fingerprint = model_loader.file_sha256(path)[:16]
+    if _scalers[0] != fingerprint:
+        # scalers.pkl may be served from scalers.npz; a registry bundle's file is loaded as is.
+        load = model_loader.load_scalers if path == config.SCALERS_PATH else model_loader.load_scalers_file
+        _scalers = (fingerprint, load(path))
+    return _scalers[1], fingerprint
+
+def build_entry(ticker: str, dates: np.ndarray, values: np.ndarray, scaler, fingerprint: str,
+                revision: str = None) -> dict:
+    """Scales one raw (LOOKBACK_PERIOD, n_features) window, read at data `revision`, into a stored entry."""
+    scale, offset = scaler_params(scaler)
+    close_index = config.FEATURES_TO_USE.index('Close')
+    target_index = config.FEATURES_TO_USE.index(config.TARGET_COLUMN)
+    return {
+        "ticker": ticker,
+        "window": (np.asarray(values, dtype=np.float64) * scale + offset).astype(np.float32),
+        "target_scale": float(scale[target_index]),
+        "target_offset": float(offset[target_index]),
+        "first_date": pd.Timestamp(dates[0]).to_pydatetime(),
+        "last_date": pd.Timestamp(dates[-1]).to_pydatetime(),
+        "first_close": float(values[0, close_index]),
+        "last_close": float(values[-1, close_index]),
+        "fingerprint": fingerprint,
+        "revision": revision,
+    }
+
+def _save(collection, entry: dict):
+    if isinstance(collection, feature_store.FeatureStore):
+        path = os.path.join(collection.root, entry["ticker"], WINDOW_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, window=entry["window"],
+                     dates=np.array([entry["first_date"], entry["last_date"]], dtype="datetime64[ns]"),
+                     numbers=np.array([entry["first_close"], entry["last_close"],
+                                       entry["target_scale"], entry["target_offset"]]),
+                     fingerprint=np.array(entry["fingerprint"]), revision=np.array(entry["revision"] or ""))
+        os.replace(path + ".tmp", path)
+        return
+    doc = {**entry, "_id": entry["ticker"], "window": entry["window"].tobytes(),
+           "shape": list(entry["window"].shape), "updated_at": datetime.now()}
+    collection.database[config.SCALED_WINDOW_COLLECTION].replace_one({"_id": doc["_id"]}, doc, upsert=True)
+
+def _load_file(path: str, ticker: str) -> dict:
+    with np.load(path, allow_pickle=False) as data:
+        first_date, last_date = pd.to_datetime(data["dates"])
+        first_close, last_close, target_scale, target_offset = data["numbers"].tolist()
+        return {"ticker": ticker, "window": data["window"], "target_scale": target_scale,
+                "target_offset": target_offset, "first_date": first_date.to_pydatetime(),
+                "last_date": last_date.to_pydatetime(), "first_close": first_close,
+                "last_close": last_close, "fingerprint": str(data["fingerprint"]),
+                "revision": str(data["revision"]) if "revision" in data.files else None}
+
+def load(collection, tickers, fingerprint: str) -> dict:
+    """Stored entries for these tickers that were scaled with the current scalers (ticker -> entry)."""
+    entries = {}
+    if isinstance(collection, feature_store.FeatureStore):
+        for ticker in tickers:
+            path = os.path.join(collection.root, ticker, WINDOW_FILE)
+            if os.path.exists(path):
+                entries[ticker] = _load_file(path, ticker)
+    else:
+        windows = collection.database[config.SCALED_WINDOW_COLLECTION]
+        for doc in windows.find({"_id": {"$in": list(tickers)}, "fingerprint": fingerprint}):
+            doc["window"] = np.frombuffer(doc["window"], dtype=np.float32).reshape(doc["shape"])
+            entries[doc["_id"]] = doc
+    return {ticker: entry for ticker, entry in entries.items() if entry["fingerprint"] == fingerprint}
+
+def refresh(collection, tickers, scalers: dict = None, fingerprint: str = None) -> int:
+    """
+    Re-materializes the scaled windows of these tickers from their latest stored rows,
+    with the given scalers (default: those of the active model version). Returns the
+    number written; tickers without a scaler or enough rows are skipped.
+    """
+    # Read before the windows: a write landing in between leaves the entry on an old revision.
+    revisions = db_handler.fetch_data_revisions(collection, list(tickers))
+    if scalers is None:
+        path = model_registry.active_scalers_path()
+        if not os.path.exists(path):
+            print("ℹ️  No scalers.pkl yet, scaled windows not materialized")
+            return 0
+        scalers, fingerprint = _load_scalers(path)
+    written = 0
+    for ticker in tickers:
+        scaler = scalers.get(ticker)
+        if not scaler or ticker not in revisions:
+            continue
+        try:
+            dates, values = db_handler.fetch_window_arrays(collection, ticker, config.LOOKBACK_PERIOD)
+        except ValueError:
+            continue  # fewer than LOOKBACK_PERIOD rows stored
+        _save(collection, build_entry(ticker, dates, values, scaler, fingerprint, revisions[ticker][1]))
+        written += 1
+    return written
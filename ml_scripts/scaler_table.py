@@ -0,0 +1,111 @@
+# ml_scripts/scaler_table.py
+"""
+Compact storage for the per-ticker feature scalers.
+
+scalers.pkl is a pickled dict with one sklearn scaler per ticker. model_export.py
+flattens it into one .npz (config.NUMPY_SCALERS_PATH) holding:
+    tickers  (n_tickers,)              row order of the arrays
+    scale    (n_tickers, n_features)   scaled = X * scale + offset
+    offset   (n_tickers, n_features)   (MinMaxScaler: scale_, min_; StandardScaler: 1/std, -mean/std)
+plus the feature names and the SHA-256 of the scalers.pkl it was exported from.
+ScalerTable loads it without pickle or sklearn and scales any batch of tickers
+with one broadcast op. It stands in for the dict: table.get(ticker) returns an
+AffineScaler row with the transform/inverse_transform interface.
+"""
+
+import json
+import numpy as np
+
+def scaler_params(scaler):
+    """(scale, offset) arrays of a MinMaxScaler/StandardScaler, so that scaled = X * scale + offset."""
+    if hasattr(scaler, 'min_'):  # MinMaxScaler (and AffineScaler)
+        return np.asarray(scaler.scale_, dtype=np.float64), np.asarray(scaler.min_, dtype=np.float64)
+    scale = 1.0 / np.asarray(scaler.scale_, dtype=np.float64)  # StandardScaler
+    return scale, -np.asarray(scaler.mean_, dtype=np.float64) * scale
+
+def stack_scaler_params(scalers, tickers: list):
+    """
+    Flattens the per-ticker scalers (a ScalerTable or a dict of sklearn scalers) into
+    (scale, offset) arrays of shape (n_tickers, n_features), so that scaled = X * scale + offset
+    and X = (scaled - offset) / scale.
+    """
+    if isinstance(scalers, ScalerTable):
+        return scalers.params(tickers)
+    params = [scaler_params(scalers[ticker]) for ticker in tickers]
+    scales = [scale for scale, _ in params]
+    offsets = [offset for _, offset in params]
+    return np.asarray(scales, dtype=np.float64), np.asarray(offsets, dtype=np.float64)
+
+class AffineScaler:
+    """One ticker's row of a ScalerTable, with the MinMaxScaler attributes (scaled = X * scale_ + min_)."""
+
+    def __init__(self, scale: np.ndarray, offset: np.ndarray):
+        self.scale_ = scale
+        self.min_ = offset
+
+    def transform(self, X) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+    def inverse_transform(self, X) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.min_) / self.scale_
+
+class ScalerTable:
+    """All tickers' scalers as one (n_tickers, n_features) scale/offset array pair."""
+
+    def __init__(self, tickers, scale: np.ndarray, offset: np.ndarray, features=None, source_sha256: str = None):
+        self.tickers = [str(ticker) for ticker in tickers]
+        self.index = {ticker: row for row, ticker in enumerate(self.tickers)}
+        self.scale = scale
+        self.offset = offset
+        self.features = features
+        self.source_sha256 = source_sha256
+
+    @classmethod
+    def from_scalers(cls, scalers: dict, features=None, source_sha256: str = None) -> "ScalerTable":
+        tickers = sorted(scalers)
+        params = [scaler_params(scalers[ticker]) for ticker in tickers]
+        return cls(tickers, np.array([scale for scale, _ in params]), np.array([offset for _, offset in params]),
+                   features, source_sha256)
+
+    @classmethod
+    def load(cls, path: str) -> "ScalerTable":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["__meta__"]))
+            return cls(data["tickers"].tolist(), data["scale"], data["offset"],
+                       meta.get("features"), meta.get("source_sha256"))
+
+    def save(self, path: str):
+        meta = {"features": self.features, "source_sha256": self.source_sha256}
+        np.savez(path, __meta__=np.array(json.dumps(meta)), tickers=np.array(self.tickers),
+                 scale=self.scale, offset=self.offset)
+
+    def params(self, tickers) -> tuple:
+        """(scale, offset) of shape (len(tickers), n_features), gathered in one indexing op."""
+        rows = [self.index[ticker] for ticker in tickers]
+        return self.scale[rows], self.offset[rows]
+
+    def transform(self, tickers, X) -> np.ndarray:
+        """Scales a (len(tickers), ..., n_features) batch, each ticker with its own row."""
+        scale, offset = self.params(tickers)
+        shape = (len(scale),) + (1,) * (np.ndim(X) - 2) + (-1,)
+        return np.asarray(X, dtype=np.float64) * scale.reshape(shape) + offset.reshape(shape)
+
+    # dict interface of the scalers.pkl mapping
+    def get(self, ticker, default=None):
+        row = self.index.get(ticker)
+        return default if row is None else AffineScaler(self.scale[row], self.offset[row])
+
+    def __getitem__(self, ticker):
+        scaler = self.get(ticker)
+        if scaler is None:
+            raise KeyError(ticker)
+        return scaler
+
+    def __contains__(self, ticker) -> bool:
+        return ticker in self.index
+
+    def __iter__(self):
+        return iter(self.tickers)
+
+    def __len__(self) -> int:
+        return len(self.tickers)
@@ -0,0 +1,96 @@
+# ml_scripts/startup_profile.py
+"""
+Per-phase wall-clock timings for the ml_scripts entry points.
+
+Entry points wrap their phases (imports, mongo_connect, model_load, fetch,
+inference, serialization, ...) in `phase(name)`; with --profile-startup the
+totals are written to stderr as one JSON line, so the JSON result on stdout
+stays untouched. Nested phases are exclusive: time spent in an inner phase is
+not counted again in the outer one. Disabled profiling costs a couple of
+perf_counter calls.
+
+lazy_module() defers heavy imports (numpy, pandas, pymongo, ...) to their first
+use and accounts them under the "imports" phase, so error paths and
+lightweight commands start at near-interpreter speed.
+"""
+
+import importlib
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_FLAG = "--profile-startup"
+
+_process_start = time.perf_counter()
+_phases = {}
+_enabled = False
+_local = threading.local()
+
+def enable_from_argv(argv: list) -> list:
+    """Turns profiling on if the flag is present and returns argv without it."""
+    global _enabled
+    if PROFILE_FLAG in argv:
+        _enabled = True
+        argv = [arg for arg in argv if arg != PROFILE_FLAG]
+    return argv
+
+@contextmanager
+def phase(name: str):
+    """Accumulates the time spent in the block (minus nested phases) under `name`."""
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    frame = [time.perf_counter(), 0.0]  # start, time spent in nested phases
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        elapsed = time.perf_counter() - frame[0]
+        _phases[name] = _phases.get(name, 0.0) + (elapsed - frame[1])
+        if stack:
+            stack[-1][1] += elapsed
+
+def timed_iter(name: str, iterable):
+    """Yields from `iterable`, timing each wait for the next item under `name`."""
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+class _LazyModule:
+    """Stands in for a module and imports it on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with phase("imports"):
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+def lazy_module(name: str):
+    """Returns the module if it is already imported, else a proxy that imports it on first use."""
+    return sys.modules.get(name) or _LazyModule(name)
+
+def report() -> dict:
+    """Phase timings in milliseconds, plus the total since this module was imported."""
+    timings = {name: round(seconds * 1000, 2) for name, seconds in _phases.items()}
+    timings["total"] = round((time.perf_counter() - _process_start) * 1000, 2)
+    return timings
+
+def emit():
+    """Writes the report to stderr when --profile-startup was given."""
+    if _enabled:
+        print(json.dumps({"startup_profile_ms": report()}), file=sys.stderr)
@@ -0,0 +1,64 @@
+# ml_scripts/synthetic_data.py
+"""
+Seeded synthetic market data and the in-memory MongoDB shared by the test suite
+(ml_scripts/tests) and the benchmarks (ml_scripts/benchmarks); both conftests
+import it, so the two kinds of fixtures cannot drift apart. mongomock is only
+imported by new_collection().
+"""
+
+import numpy as np
+import pandas as pd
+import config
+import features
+
+def synthetic_ohlcv(seed: int = 0, days: int = 250, end: str = "2025-06-30") -> pd.DataFrame:
+    """Daily OHLCV in the shape yfinance returns (tz-aware 'Date' index, business days)."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=end, periods=days, tz="Asia/Kolkata", name="Date")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, days)))
+    return pd.DataFrame({
+        "Open": close * (1 + rng.normal(0, 0.003, days)),
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Close": close,
+        "Volume": rng.integers(100_000, 10_000_000, days).astype(float),
+    }, index=index)
+
+def feature_records(ticker: str, days: int = 80, seed: int = 0) -> list:
+    """Stored feature documents (FEATURES_TO_USE + data_quality_score) for one ticker, random values."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2025-06-30", periods=days)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, days)))
+    return [{"Date": day.to_pydatetime(), "ticker": ticker, "Close": float(close[i]),
+             "Volume": float(rng.integers(100_000, 10_000_000)), "RSI_14": float(rng.uniform(30, 70)),
+             "MACD_12_26_9": float(rng.normal()), "volatility_20d": float(rng.uniform(0.005, 0.03)),
+             "data_quality_score": 3.5}
+            for i, day in enumerate(dates)]
+
+def computed_feature_records(tickers, rows: int = config.LOOKBACK_PERIOD, days: int = 250) -> list:
+    """The documents backfill_db stores: the last `rows` featured days of synthetic_ohlcv per ticker."""
+    records = []
+    for seed, ticker in enumerate(tickers):
+        featured = features.calculate_features(synthetic_ohlcv(seed, days)).dropna().tail(rows)
+        featured.index = features.normalize_dates(featured.index).rename("Date")
+        featured = featured.reset_index().assign(ticker=ticker, data_quality_score=3.5)
+        records.extend(featured.to_dict("records"))
+    return records
+
+_mongomock_patched = False
+
+def new_collection():
+    """An empty mongomock daily-data collection with the indexes db_handler.get_db_collection creates."""
+    global _mongomock_patched
+    import mongomock
+
+    if not _mongomock_patched:
+        # mongomock 4.3 predates the `sort` option pymongo 4.15 passes for UpdateOne in bulk writes.
+        add_update = mongomock.collection.BulkOperationBuilder.add_update
+        mongomock.collection.BulkOperationBuilder.add_update = (
+            lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs))
+        _mongomock_patched = True
+    collection = mongomock.MongoClient()[config.DATABASE_NAME][config.COLLECTION_NAME]
+    collection.create_index([("Date", 1), ("ticker", 1)], unique=True)
+    collection.create_index([("ticker", 1), ("Date", -1)])
+    return collection
@@ -0,0 +1,50 @@
+# ml_scripts/tests/conftest.py
+"""
+Shared setup for the ml_scripts tests: imports resolve from ml_scripts/, and
+mongomock stands in for MongoDB. Synthetic data comes from synthetic_data.py,
+shared with the benchmarks.
+
+    pytest ml_scripts/tests
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from synthetic_data import feature_records, new_collection
+
+class LastCloseModel:
+    """Stands in for the GRU: "predicts" the last scaled Close of each window."""
+
+    def predict_on_batch(self, X):
+        target = config.FEATURES_TO_USE.index(config.TARGET_COLUMN)
+        return np.asarray(X)[:, -1, target:target + 1]
+
+@pytest.fixture
+def collection():
+    return new_collection()
+
+@pytest.fixture
+def prediction_assets(collection, monkeypatch):
+    """prediction_handler on LastCloseModel, scalers fitted per ticker and the mongomock collection."""
+    from sklearn.preprocessing import MinMaxScaler
+    import db_handler
+    import prediction_cache
+    import prediction_handler
+    from model_registry import ModelBundle, ModelRegistry
+
+    tickers = config.TICKERS[:3]
+    scalers = {}
+    for seed, ticker in enumerate(tickers):
+        records = feature_records(ticker, seed=seed)
+        db_handler.save_data_to_db(collection, records)
+        scalers[ticker] = MinMaxScaler().fit(pd.DataFrame(records)[config.FEATURES_TO_USE])
+    registry = ModelRegistry.from_bundles([ModelBundle("test", LastCloseModel(), scalers)])
+    monkeypatch.setattr(prediction_handler, "_assets", (registry, collection))
+    monkeypatch.setattr(prediction_cache, "_memory", prediction_cache.OrderedDict())
+    return prediction_handler
@@ -0,0 +1,36 @@
+# ml_scripts/tests/test_async_collector.py
+import asyncio
+
+import pandas as pd
+
+import async_collector
+import config
+import db_handler
+import incremental_features
+import prediction_cache
+from synthetic_data import synthetic_ohlcv
+
+def recent_source(ticker, start=None, end=None):
+    """Stands in for yfinance: 150 business days up to today."""
+    history = synthetic_ohlcv(seed=config.TICKERS.index(ticker), days=150, end=pd.Timestamp.today().normalize())
+    return history[history.index.tz_localize(None) >= pd.Timestamp(start)] if start is not None else history
+
+def test_async_collection_with_threaded_writer(collection, tmp_path, monkeypatch):
+    tickers = config.TICKERS[:3]
+    monkeypatch.setattr(config, "TICKERS", tickers)
+    monkeypatch.setattr(config, "COLLECTOR_PROGRESS_PATH", str(tmp_path / "progress.json"))
+    monkeypatch.setattr(db_handler, "get_db_collection", lambda: collection)
+    monkeypatch.setattr(prediction_cache, "_memory", prediction_cache.OrderedDict())
+    prediction_cache._memory["|".join([tickers[0], "2025-06-30", "r", "f"])] = {"status": "success"}
+    state_collection = incremental_features.get_state_collection(collection.database)
+    writer = async_collector.ThreadedWriter(collection, state_collection)
+
+    summary = asyncio.run(async_collector.collect_latest_data_async(source=recent_source, writer=writer))
+    assert summary["successful"] == 3 and summary["failed"] == 0
+    assert summary["new_records"] == collection.count_documents({}) == 15  # the last 5 bars of each
+    assert sorted(incremental_features.load_states(state_collection, tickers)) == sorted(tickers)
+    assert not prediction_cache._memory  # writes invalidate the written tickers' predictions
+
+    # A second run continues from the stored states and only revises the latest bars.
+    summary = asyncio.run(async_collector.collect_latest_data_async(source=recent_source, writer=writer))
+    assert summary["successful"] == 3 and summary["new_records"] == 0
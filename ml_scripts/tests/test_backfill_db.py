@@ -0,0 +1,63 @@
+# ml_scripts/tests/test_backfill_db.py
+from datetime import date
+
+import pandas as pd
+
+import backfill_db
+import config
+import db_handler
+from synthetic_data import synthetic_ohlcv
+
+START, END = date(2023, 1, 1), date(2024, 7, 1)
+TICKERS = ["A.NS", "B.NS"]
+
+class FakeDownloader:
+    """Stands in for yfinance: slices of one long synthetic history per ticker; records each request."""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, ticker, start=None, end=None):
+        self.requests.append((ticker, start, end))
+        history = synthetic_ohlcv(seed=TICKERS.index(ticker), days=1000, end="2024-06-28")
+        dates = history.index.tz_localize(None)
+        return history[(dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end))]
+
+def _stored(collection) -> pd.DataFrame:
+    return pd.DataFrame(list(collection.find({}, {"_id": 0, "ticker": 1, "Date": 1})))
+
+def test_backfill_history_skips_completed_chunks_on_rerun(collection, monkeypatch):
+    monkeypatch.setattr(db_handler, "get_db_collection", lambda: collection)
+    checkpoints = collection.database[config.BACKFILL_CHECKPOINT_COLLECTION]
+    source = FakeDownloader()
+
+    backfill_db.backfill_history(START, END, TICKERS, chunk_days=180, workers=0, source=source)
+    chunks = backfill_db.plan_chunks(TICKERS, START, END, 180)
+    assert len(chunks) == 8 and checkpoints.count_documents({}) == 8
+    assert len(source.requests) == 2  # one download per ticker, warm-up included
+    assert all(start == START - pd.Timedelta(days=config.BACKFILL_WARMUP_DAYS) for _t, start, _e in source.requests)
+
+    # Warm-up rows are trimmed from every chunk: the chunks' rows add up to the stored
+    # rows (no two chunks wrote the same day) and nothing precedes the backfill range.
+    stored = _stored(collection)
+    assert sum(doc["rows"] for doc in checkpoints.find()) == len(stored) > 0
+    assert stored["Date"].min() >= pd.Timestamp(START) and stored["Date"].max() < pd.Timestamp(END)
+    for checkpoint in checkpoints.find():
+        in_chunk = stored[(stored["ticker"] == checkpoint["ticker"]) &
+                          (stored["Date"] >= checkpoint["start"]) & (stored["Date"] < checkpoint["end"])]
+        assert len(in_chunk) == checkpoint["rows"]
+
+    # A crash lost one chunk's checkpoint: the rerun downloads and processes only that chunk.
+    lost = backfill_db.chunk_id(chunks[5])
+    checkpoints.delete_one({"_id": lost})
+    source.requests.clear()
+    backfill_db.backfill_history(START, END, TICKERS, chunk_days=180, workers=0, source=source)
+    ticker, chunk_start, chunk_end = chunks[5]
+    assert source.requests == [(ticker, chunk_start - pd.Timedelta(days=config.BACKFILL_WARMUP_DAYS), chunk_end)]
+    assert checkpoints.count_documents({}) == 8
+    assert len(_stored(collection)) == len(stored)
+
+    # Everything completed: a third run downloads nothing.
+    source.requests.clear()
+    backfill_db.backfill_history(START, END, TICKERS, chunk_days=180, workers=0, source=source)
+    assert source.requests == []
@@ -0,0 +1,86 @@
+# ml_scripts/tests/test_backtest.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+import config
+import db_handler
+import incremental_features
+import predict
+from synthetic_data import computed_feature_records
+
+TICKERS = ["A.NS", "B.NS"]
+
+class FeatureMixModel:
+    """Stands in for the GRU with a prediction that reads every feature, so the indicator rollout matters."""
+
+    def predict_on_batch(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        close = config.FEATURES_TO_USE.index(config.TARGET_COLUMN)
+        drift = X[:, -1, :].mean(axis=1) - X[:, -5:, :].mean(axis=(1, 2))
+        return (X[:, -1, close] + 0.05 * drift)[:, np.newaxis]
+
+@pytest.fixture
+def history(collection):
+    """Stored synthetic history (110 featured rows per ticker) and MinMaxScalers fitted on it."""
+    from sklearn.preprocessing import MinMaxScaler
+
+    db_handler.save_data_to_db(collection, computed_feature_records(TICKERS, rows=110))
+    stored = db_handler.fetch_feature_history(collection, TICKERS)
+    scalers = {ticker: MinMaxScaler().fit(pd.DataFrame(values, columns=config.FEATURES_TO_USE))
+               for ticker, (_dates, values) in stored.items()}
+    return stored, scalers
+
+def test_rollout_matches_predict(history):
+    stored, scalers = history
+    dates, values = stored["A.NS"]
+    result = backtest.verify_rollout(FeatureMixModel(), scalers, "A.NS", dates, values, forecast_days=5)
+    assert result["ok"], result
+
+def test_window_states_match_a_per_window_replay(history):
+    stored, scalers = history
+    dates, values = stored["A.NS"]
+    scale, offset = scalers["A.NS"].scale_, scalers["A.NS"].min_
+    ticker_history = backtest.TickerHistory("A.NS", dates, values, scale, offset)
+    frame = pd.DataFrame(values, columns=config.FEATURES_TO_USE, index=pd.DatetimeIndex(dates))
+
+    w0, w1 = 3, 40
+    states = ticker_history.window_states(w0, w1)
+    for row, w in enumerate(range(w0, w1)):
+        last_bar = w + config.LOOKBACK_PERIOD - 1
+        expected = incremental_features.state_from_history("A.NS", frame.iloc[:last_bar + 1])
+        assert states["avg_gain"][row] == pytest.approx(expected["rsi"]["avg_gain"])
+        assert states["avg_loss"][row] == pytest.approx(expected["rsi"]["avg_loss"])
+        assert states["fast"][row] == pytest.approx(expected["macd"]["fast"]["value"])
+        assert states["slow"][row] == pytest.approx(expected["macd"]["slow"]["value"])
+        assert states["returns"][row] == pytest.approx(expected["volatility"]["window"])
+        assert np.array_equal(ticker_history.windows[w], (values[w:last_bar + 1] * scale + offset).astype(np.float32))
+
+def test_run_backtest_matches_a_per_window_loop(collection, history):
+    stored, scalers = history
+    model, forecast_days = FeatureMixModel(), 3
+    # A batch size that splits tickers across batches and packs both into one.
+    report = backtest.run_backtest(TICKERS + ["NOSCALER.NS"], forecast_days, model=model, scalers=scalers,
+                                   collection=collection, batch_size=7, version="test")
+    assert report["skipped"] == {"NOSCALER.NS": "no scaler"}
+
+    for ticker in TICKERS:
+        dates, values = stored[ticker]
+        ticker_history = backtest.TickerHistory(ticker, dates, values, scalers[ticker].scale_, scalers[ticker].min_)
+        origins = ticker_history.origins()
+        frame = pd.DataFrame(values, columns=config.FEATURES_TO_USE, index=pd.DatetimeIndex(dates))
+        forecasts = []
+        for w in origins:
+            last_bar = w + config.LOOKBACK_PERIOD - 1
+            state = incremental_features.state_from_history(ticker, frame.iloc[:last_bar + 1])
+            forecasts.append(predict.make_multistep_forecast_batch(
+                model, {ticker: frame.iloc[w:last_bar + 1]}, scalers, forecast_days, {ticker: state})[ticker])
+        expected = backtest.score_metrics(ticker_history, origins, np.array(forecasts))
+
+        actual = report["tickers"][ticker]
+        assert actual["windows"] == expected["windows"] == len(values) - config.LOOKBACK_PERIOD
+        for key in ("mae", "rmse", "mape_pct"):
+            assert actual[key] == pytest.approx(expected[key], abs=config.BACKTEST_TOLERANCE)
+        for key in ("direction_accuracy", "best_day_windows", "best_day_hit_rate"):
+            assert actual[key] == expected[key]
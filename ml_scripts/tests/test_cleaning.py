@@ -0,0 +1,75 @@
+# ml_scripts/tests/test_cleaning.py
+import numpy as np
+import pandas as pd
+
+import cleaning
+from synthetic_data import synthetic_ohlcv
+
+def baseline_clean_raw_data(df: pd.DataFrame) -> pd.DataFrame:
+    """backfill_db.clean_raw_data/fill_small_gaps as they were before clean_panel (prints removed)."""
+    df = df[(df['Close'] > 0) & (df['Open'] > 0) &
+            (df['High'] > 0) & (df['Low'] > 0) & (df['Volume'] > 0)]
+    df = df[df['Volume'] >= df['Volume'].quantile(0.05)]
+    df = df.assign(returns=df['Close'].pct_change())
+    df = df[abs(df['returns']) <= 0.20]
+    df.index = pd.to_datetime(df.index).tz_localize(None)
+    df = df[df.index.dayofweek < 5]
+    df = df.sort_index()
+
+    business_days = pd.bdate_range(start=df.index.min(), end=df.index.max())
+    missing_days = business_days.difference(df.index)
+    if len(missing_days) > 0 and len(missing_days) / len(business_days) * 100 < 5.0:
+        df = df.reindex(business_days).ffill()
+    return df
+
+def _raw(seed: int) -> pd.DataFrame:
+    """synthetic_ohlcv with volumes on a coarse grid, so the 5% volume quantile only drops thin days."""
+    raw = synthetic_ohlcv(seed=seed, days=300)
+    raw["Volume"] = np.random.default_rng(seed).choice([1e6, 2e6, 3e6], len(raw))
+    return raw
+
+def _raw_histories() -> dict:
+    """One history per defect; the baseline cleans each ticker on its own."""
+    clean = _raw(0)
+
+    gaps = _raw(1).drop(index=_raw(1).index[[40, 41, 120, 200]])        # < 5% missing: filled
+    gaps.iloc[60, gaps.columns.get_loc("Close")] *= 1.5                  # spike: it and the next day go
+    gaps.iloc[150, gaps.columns.get_loc("Volume")] = 0                   # bad print
+    gaps.iloc[[30, 90], gaps.columns.get_loc("Volume")] = 1e4            # partial sessions
+
+    # Over 5% missing, so nothing is filled and the baseline keeps duplicate dates too.
+    sparse = _raw(2).iloc[::3]
+    sparse.iloc[70, sparse.columns.get_loc("Low")] = -1.0                # bad print
+    friday = sparse.index[sparse.index.dayofweek == 4][5]
+    saturday = sparse.loc[[friday]].set_axis([friday + pd.Timedelta(days=1)])           # stray weekend row
+    sparse = pd.concat([sparse, sparse.iloc[[20, 60]], saturday]).sort_index(kind="stable")  # re-sent bars
+
+    return {"CLEAN.NS": clean, "GAPS.NS": gaps, "SPARSE.NS": sparse}
+
+def test_clean_panel_matches_the_per_ticker_baseline():
+    histories = _raw_histories()
+    panel = pd.concat([raw.rename_axis("Date").reset_index().assign(ticker=ticker)
+                       for ticker, raw in histories.items()], ignore_index=True)
+    cleaned, counters = cleaning.clean_panel(panel.sample(frac=1, random_state=0))  # any row order
+
+    columns = ["Date", "Open", "High", "Low", "Close", "Volume", "returns"]
+    for ticker, raw in histories.items():
+        expected = baseline_clean_raw_data(raw).rename_axis("Date").reset_index()[columns]
+        actual = cleaned[cleaned["ticker"] == ticker].reset_index(drop=True)[columns]
+        pd.testing.assert_frame_equal(actual, expected, check_freq=False)
+        assert counters.loc[ticker, "final"] == len(expected)
+
+    dropped = ["invalid_price_volume", "low_volume", "outliers", "weekends"]
+    assert counters.loc["GAPS.NS", dropped].tolist() == [1, 2, 3, 0]     # outliers: first row, spike, reversal
+    assert counters.loc["SPARSE.NS", dropped].tolist() == [1, 0, 1, 1]
+    assert counters.loc["GAPS.NS", "gaps_filled"] and not counters.loc["SPARSE.NS", "gaps_filled"]
+
+def test_duplicate_dates_in_a_filled_ticker_keep_one_row_per_business_day():
+    # The baseline raised here ("cannot reindex on an axis with duplicate labels").
+    raw = _raw_histories()["GAPS.NS"]
+    raw = pd.concat([raw, raw.iloc[[100, 101]]]).sort_index(kind="stable")
+    cleaned, counters = cleaning.clean_panel(raw.rename_axis("Date").reset_index().assign(ticker="GAPS.NS"))
+
+    assert counters.loc["GAPS.NS", "gaps_filled"]
+    expected_days = pd.bdate_range(cleaned["Date"].iloc[0], cleaned["Date"].iloc[-1])
+    assert cleaned["Date"].tolist() == expected_days.tolist()
@@ -0,0 +1,94 @@
+# ml_scripts/tests/test_collector_daemon.py
+import threading
+import time
+from datetime import datetime, timedelta
+
+import collector_daemon
+import config
+import market_calendar
+
+def test_catch_up_only_without_a_scheduled_run_today(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "COLLECTOR_SCHEDULE_STATE_PATH", str(tmp_path / "schedule.json"))
+    scheduler = collector_daemon.CollectorScheduler()
+    due = market_calendar.scheduled_time(datetime(2025, 6, 30).date())  # a Monday
+    later = due + timedelta(hours=2)
+
+    assert not scheduler.needs_catch_up(due - timedelta(minutes=1))
+    assert scheduler.needs_catch_up(later)
+    collector_daemon.save_last_scheduled_run(due - timedelta(days=3))  # Friday's run
+    assert scheduler.needs_catch_up(later)
+    # A manual run earlier today (e.g. during market hours) does not count; today's scheduled run does.
+    collector_daemon.save_last_scheduled_run(due + timedelta(seconds=5))
+    assert not scheduler.needs_catch_up(later)
+    assert not scheduler.needs_catch_up(later.replace(day=29))  # Sunday
+
+def test_full_trigger_joining_a_resumed_run_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "COLLECTOR_SCHEDULE_STATE_PATH", str(tmp_path / "schedule.json"))
+    release = threading.Event()
+    scheduler = collector_daemon.CollectorScheduler(collect=lambda events, resume: release.wait(5) and {})
+    monkeypatch.setattr(collector_daemon, "scheduler", scheduler)
+
+    job, started = scheduler.trigger("catch-up", resume=True)
+    assert started
+    full, = collector_daemon.responses({"command": "trigger"})
+    resumed, = collector_daemon.responses({"command": "trigger", "resume": True})
+    release.set()
+    job.finished.wait(5)
+
+    assert not full["started"] and full["run"]["id"] == job.id
+    assert "resumes an interrupted run" in full["message"]
+    assert "message" not in resumed
+    assert collector_daemon.load_last_scheduled_run() is not None
+
+def _wait_for_runs(scheduler, runs: int):
+    deadline = time.monotonic() + 5
+    while scheduler.runs < runs and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert scheduler.runs == runs
+
+def test_scheduled_trigger_joins_only_a_run_started_after_the_schedule(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "COLLECTOR_SCHEDULE_STATE_PATH", str(tmp_path / "schedule.json"))
+    due = market_calendar.scheduled_time(datetime(2025, 6, 30).date())
+    now = [due + timedelta(minutes=10)]
+    monkeypatch.setattr(market_calendar, "exchange_now", lambda: now[0])
+    release = threading.Event()
+    calls = []
+    scheduler = collector_daemon.CollectorScheduler(
+        collect=lambda events, resume: calls.append(resume) or release.wait(5) and {})
+
+    # A manual full run that started after the scheduled time is today's scheduled run.
+    manual, _ = scheduler.trigger()
+    now[0] = due + timedelta(minutes=11)
+    joined, started = scheduler.trigger("schedule")
+    assert joined is manual and not started and manual.joined == 1
+    release.set()
+    _wait_for_runs(scheduler, 1)
+    assert collector_daemon.load_last_scheduled_run() == due + timedelta(minutes=10)
+    assert calls == [False]
+
+    # One started before it predates the close: the scheduled run follows it.
+    release.clear()
+    now[0] = due + timedelta(days=1, minutes=-30)
+    earlier, _ = scheduler.trigger()
+    now[0] = due + timedelta(days=1)
+    assert scheduler.trigger("schedule") == (earlier, False)
+    assert earlier.joined == 0 and scheduler.status()["queued"] == "schedule"
+    release.set()
+    _wait_for_runs(scheduler, 3)
+    assert scheduler.last_run.reason == "schedule" and scheduler.status()["queued"] is None
+    assert collector_daemon.load_last_scheduled_run() == due + timedelta(days=1)
+    assert calls == [False, False, False]
+
+def test_full_scheduled_trigger_does_not_join_a_resumed_manual_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "COLLECTOR_SCHEDULE_STATE_PATH", str(tmp_path / "schedule.json"))
+    due = market_calendar.scheduled_time(datetime(2025, 6, 30).date())
+    monkeypatch.setattr(market_calendar, "exchange_now", lambda: due + timedelta(minutes=10))
+    release = threading.Event()
+    scheduler = collector_daemon.CollectorScheduler(collect=lambda events, resume: release.wait(5) and {})
+
+    resumed, _ = scheduler.trigger(resume=True)
+    assert scheduler.trigger("schedule") == (resumed, False) and scheduler.follow_up == ("schedule", False)
+    release.set()
+    _wait_for_runs(scheduler, 2)
+    assert not resumed.scheduled and scheduler.last_run.reason == "schedule"
+
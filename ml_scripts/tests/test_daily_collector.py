@@ -0,0 +1,33 @@
+# ml_scripts/tests/test_daily_collector.py
+
+import config
+import daily_collector
+
+def interrupted_run(tickers):
+    run = daily_collector.CollectionRun()
+    for ticker in tickers:
+        run.report(ticker, "success")
+    return run
+
+def test_resume_continues_an_interrupted_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "COLLECTOR_PROGRESS_PATH", str(tmp_path / "progress.json"))
+    first = interrupted_run(config.TICKERS[:3])
+
+    resumed = daily_collector.CollectionRun(resume=True)
+    assert resumed.run_id == first.run_id
+    assert resumed.tickers == config.TICKERS[3:]
+
+def test_finished_run_is_never_resumed(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "COLLECTOR_PROGRESS_PATH", str(tmp_path / "progress.json"))
+    interrupted_run(config.TICKERS[:3]).finish()
+
+    # e.g. a trigger after the close following one during market hours
+    later = daily_collector.CollectionRun(resume=True)
+    assert later.tickers == config.TICKERS
+    assert daily_collector.load_progress()["finished"]
+
+def test_without_resume_every_ticker_is_collected(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "COLLECTOR_PROGRESS_PATH", str(tmp_path / "progress.json"))
+    interrupted_run(config.TICKERS[:3])
+
+    assert daily_collector.CollectionRun().tickers == config.TICKERS
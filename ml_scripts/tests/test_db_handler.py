@@ -0,0 +1,101 @@
+# ml_scripts/tests/test_db_handler.py
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+import config
+import db_handler
+from synthetic_data import computed_feature_records, feature_records, new_collection
+
+def test_fetch_windows_reads_the_latest_rows_per_ticker(collection):
+    tickers = config.TICKERS[:2]
+    db_handler.save_data_to_db(collection, feature_records(tickers[0], days=80)
+                               + feature_records(tickers[1], days=10, seed=1))
+
+    windows = db_handler.fetch_windows_from_db(collection, tickers + ["MISSING.NS"], 60)
+    assert sorted(windows) == sorted(tickers)
+    assert len(windows[tickers[0]]) == 60 and len(windows[tickers[1]]) == 10
+
+    expected = feature_records(tickers[0], days=80)[-60:]
+    assert list(windows[tickers[0]]["Date"]) == [record["Date"] for record in expected]
+    assert list(windows[tickers[0]]["Close"]) == [record["Close"] for record in expected]
+    assert set(windows[tickers[0]].columns) == {"Date", *config.FEATURES_TO_USE}
+
+class FlakyCollection:
+    """
+    Wraps a collection whose first bulk_write fails: with AutoReconnect before writing
+    anything, or with a BulkWriteError after applying the first `applied` operations.
+    """
+
+    def __init__(self, collection, applied=None):
+        self.collection, self.applied = collection, applied
+        self.database = collection.database
+        self.calls = 0
+
+    def bulk_write(self, operations, ordered=True):
+        self.calls += 1
+        if self.calls > 1:
+            return self.collection.bulk_write(operations, ordered=ordered)
+        if self.applied is None:
+            raise AutoReconnect("connection reset")
+        result = self.collection.bulk_write(operations[:self.applied], ordered=ordered)
+        raise BulkWriteError({"nUpserted": result.upserted_count, "nMatched": result.matched_count,
+                              "writeErrors": [{"index": self.applied, "code": 91, "errmsg": "shutdown"}]})
+
+@pytest.mark.parametrize("applied", [None, 3, 8])
+def test_retried_chunk_counts_each_insert_once(collection, monkeypatch, applied):
+    monkeypatch.setattr(config, "DB_WRITE_RETRY_DELAY", 0)
+    records = feature_records(config.TICKERS[0], days=8)
+    db_handler.save_data_to_db(collection, records[:2])  # two of the eight are updates
+
+    flaky = FlakyCollection(collection, applied)
+    assert db_handler.save_data_to_db(flaky, records) == 6
+    assert flaky.calls == 2 and collection.count_documents({}) == 8
+
+def test_chunk_failing_every_attempt_raises(collection, monkeypatch):
+    monkeypatch.setattr(config, "DB_WRITE_RETRY_DELAY", 0)
+
+    class DownCollection:
+        database = collection.database
+        def bulk_write(self, operations, ordered=True):
+            raise AutoReconnect("no primary")
+
+    with pytest.raises(AutoReconnect):
+        db_handler.save_data_to_db(DownCollection(), feature_records(config.TICKERS[0], days=3), max_retries=2)
+
+def _documents(collection) -> list:
+    return list(collection.find({}, {"_id": 0}).sort([("ticker", 1), ("Date", 1)]))
+
+@pytest.mark.parametrize("dtype", ["float64", "float32"])
+def test_save_panel_stores_the_documents_of_save_data_to_db(monkeypatch, dtype):
+    monkeypatch.setattr(config, "INGEST_FLOAT_DTYPE", dtype)
+    panel = pd.DataFrame(computed_feature_records(config.TICKERS[:2], rows=30))
+    panel = panel[["Date", "ticker", *config.FEATURE_STORE_COLUMNS]]
+    records = [{**record, "Date": record["Date"].to_pydatetime()} for record in panel.to_dict("records")]
+    by_records, by_panel = new_collection(), new_collection()
+
+    assert db_handler.save_data_to_db(by_records, records) == 60
+    assert db_handler.save_panel(by_panel, db_handler.compact_panel(panel), chunk_size=25) == 60
+    expected, actual = _documents(by_records), _documents(by_panel)
+    for want, got in zip(expected, actual):
+        assert got.keys() == want.keys()
+        assert {key: type(value) for key, value in got.items()} == {key: type(value) for key, value in want.items()}
+        assert (got["Date"], got["ticker"]) == (want["Date"], want["ticker"])
+        assert isinstance(got["updated_at"], datetime)
+        values = np.array([[got[column], want[column]] for column in config.FEATURE_STORE_COLUMNS])
+        if dtype == "float64":
+            assert np.array_equal(values[:, 0], values[:, 1])
+        else:  # float32 ingest keeps ~7 significant digits
+            np.testing.assert_allclose(values[:, 0], values[:, 1], rtol=1e-6)
+    assert len(actual) == len(expected)
+
+    # Rewrites update in place and stamp a new updated_at, like save_data_to_db.
+    stamped = {doc["updated_at"] for doc in actual}
+    time.sleep(0.01)  # mongomock keeps millisecond timestamps
+    assert db_handler.save_panel(by_panel, db_handler.compact_panel(panel)) == 0
+    assert len(stamped) == 1 and {doc["updated_at"] for doc in _documents(by_panel)} != stamped
+
@@ -0,0 +1,45 @@
+# ml_scripts/tests/test_feature_store.py
+
+import os
+import numpy as np
+import pandas as pd
+
+import config
+import feature_store
+from feature_store import FeatureStore
+
+def rows(start: str, n: int, offset: float = 0.0):
+    dates = pd.bdate_range(start, periods=n).to_numpy(dtype="datetime64[ns]")
+    values = np.arange(n * len(config.FEATURE_STORE_COLUMNS), dtype=np.float64).reshape(n, -1) + offset
+    return dates, values
+
+def tear_append(store: FeatureStore, ticker: str, values: np.ndarray):
+    """An append that stopped after values.npy (the writer's first file)."""
+    path = os.path.join(store.root, ticker, feature_store.VALUES_FILE)
+    assert feature_store._append_npy(path, values)
+
+def test_torn_append_is_invisible_to_readers(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    dates, values = rows("2025-01-01", 10)
+    store.upsert_arrays("TCS.NS", dates, values)
+    tear_append(store, "TCS.NS", rows("2025-01-15", 3, offset=1000.0)[1])
+
+    window_dates, window = store.window("TCS.NS", 4)
+    np.testing.assert_array_equal(window_dates, dates[-4:])
+    np.testing.assert_array_equal(window, values[-4:, :len(config.FEATURES_TO_USE)])
+    assert len(store.to_frame("TCS.NS")) == 10
+
+def test_upsert_after_torn_append_keeps_rows_aligned(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    dates, values = rows("2025-01-01", 10)
+    store.upsert_arrays("TCS.NS", dates, values)
+    tear_append(store, "TCS.NS", rows("2025-01-15", 3, offset=1000.0)[1])
+
+    new_dates, new_values = rows("2025-01-15", 2, offset=2000.0)
+    assert store.upsert_arrays("TCS.NS", new_dates, new_values) == 2
+
+    stored_dates, stored_values = store.read("TCS.NS")
+    np.testing.assert_array_equal(stored_dates, np.concatenate([dates, new_dates]))
+    np.testing.assert_array_equal(stored_values, np.concatenate([values, new_values]))
+    raw = np.load(os.path.join(store.root, "TCS.NS", feature_store.VALUES_FILE))
+    assert raw.shape[0] == len(stored_dates)
@@ -0,0 +1,45 @@
+# ml_scripts/tests/test_features.py
+"""
+features.py against pandas_ta: live when pandas_ta is installed, and always against
+tests/fixtures/pandas_ta_features.csv, pandas_ta_features() of the same synthetic history
+saved with pandas_ta 0.4.71b0. With pandas_ta installed, rewrite it with
+
+    python ml_scripts/tests/test_features.py
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # also run as a script
+
+import pandas as pd
+import pytest
+
+import config
+import features
+from synthetic_data import synthetic_ohlcv
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pandas_ta_features.csv")
+
+def parity_history() -> pd.DataFrame:
+    return synthetic_ohlcv(seed=7, days=250)
+
+def test_feature_parity_with_pandas_ta():
+    pytest.importorskip("pandas_ta")
+    parity = features.verify_feature_parity(parity_history())
+    assert parity["ok"], parity
+    assert all(diff <= config.FEATURE_PARITY_TOLERANCE for diff in parity["max_abs_diff"].values())
+
+def test_feature_parity_with_saved_pandas_ta_output():
+    history = parity_history()
+    golden = pd.read_csv(GOLDEN_PATH, index_col="Date")
+    assert list(golden.columns) == config.FEATURES_TO_USE and len(golden) == len(history)
+    golden.index = history.index  # the rows are the history's days, in order
+    assert golden[config.FEATURES_TO_USE[2:]].dropna().shape[0] > 200  # indicators past their warm-up
+
+    parity = features.verify_feature_parity(history, expected=golden)
+    assert parity["ok"], parity
+
+if __name__ == "__main__":
+    os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+    features.pandas_ta_features(parity_history()).to_csv(GOLDEN_PATH, float_format="%.17g")
+    print(f"✅ Wrote {GOLDEN_PATH}")
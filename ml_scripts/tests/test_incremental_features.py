@@ -0,0 +1,43 @@
+# ml_scripts/tests/test_incremental_features.py
+import numpy as np
+
+import config
+import features
+import incremental_features
+from synthetic_data import synthetic_ohlcv
+
+def _max_drift(actual, expected) -> float:
+    return float(np.nanmax(np.abs(actual[config.FEATURES_TO_USE].to_numpy()
+                                  - expected.loc[actual.index, config.FEATURES_TO_USE].to_numpy())))
+
+def test_revised_provisional_bar_does_not_drift():
+    history = synthetic_ohlcv(seed=3, days=152)
+    state = incremental_features.state_from_history("TEST.NS", history.iloc[:150])
+
+    # Run A, before the close: bar 150 is provisional with a close later revised.
+    provisional = history.iloc[:151].copy()
+    provisional.iloc[150, provisional.columns.get_loc("Close")] *= 1.05
+    bars = incremental_features.new_bars(state, provisional)
+    incremental_features.apply_bars(state, bars, closed_through=history.index[149].date())
+    assert state["last_date"] == incremental_features.to_state_date(history.index[149])
+
+    # Run B: the final bar 150 and a new, closed bar 151.
+    bars = incremental_features.new_bars(state, history)
+    actual = incremental_features.apply_bars(state, bars, closed_through=history.index[151].date())
+    assert list(actual.index) == list(history.index[150:])
+    assert _max_drift(actual, features.calculate_features(history)) <= config.INCREMENTAL_FEATURE_TOLERANCE
+
+def test_adjusted_history_forces_full_recompute():
+    history = synthetic_ohlcv(seed=4, days=120)
+    state = incremental_features.state_from_history("TEST.NS", history.iloc[:110])
+
+    assert incremental_features.new_bars(state, history) is not None
+    adjusted = history.copy()
+    adjusted[["Open", "High", "Low", "Close"]] *= 0.98   # a dividend adjustment of the whole history
+    assert incremental_features.new_bars(state, adjusted) is None
+
+def test_state_of_an_older_version_forces_full_recompute():
+    history = synthetic_ohlcv(seed=5, days=120)
+    state = incremental_features.state_from_history("TEST.NS", history.iloc[:110])
+    state["version"] = incremental_features.STATE_VERSION - 1
+    assert incremental_features.new_bars(state, history) is None
@@ -0,0 +1,29 @@
+# ml_scripts/tests/test_main.py
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+import config
+import db_handler
+import main
+import model_registry
+from conftest import LastCloseModel
+from synthetic_data import feature_records
+
+def test_short_ticker_does_not_fail_the_batch(collection, monkeypatch):
+    tickers = config.TICKERS[:3]
+    scalers = {}
+    for seed, ticker in enumerate(tickers):
+        records = feature_records(ticker, days=10 if ticker == tickers[1] else 80, seed=seed)
+        db_handler.save_data_to_db(collection, records)
+        scalers[ticker] = MinMaxScaler().fit(pd.DataFrame(records)[config.FEATURES_TO_USE])
+    bundle = model_registry.ModelBundle("test", LastCloseModel(), scalers)
+    monkeypatch.setattr(model_registry, "load_version", lambda version=None: bundle)
+    monkeypatch.setattr(db_handler, "get_db_collection", lambda: collection)
+    monkeypatch.setattr(db_handler, "get_database", lambda: collection.database)
+
+    requested = [tickers[1], "NOSCALER.NS", tickers[2], tickers[0]]
+    results = main.generate_recommendations(requested, 3)
+    assert [result["ticker"] for result in results] == requested  # input order, errors in place
+    assert [result["status"] for result in results] == ["error", "error", "success", "success"]
+    assert "Need 60, found 10" in results[0]["message"]
+    assert "No scaler" in results[1]["message"]
@@ -0,0 +1,62 @@
+# ml_scripts/tests/test_market_data.py
+import functools
+
+import pandas as pd
+
+import market_data
+
+class FakeClock:
+    """time.monotonic/time.sleep stand-in: sleeping advances the clock instantly."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def test_token_bucket_allows_a_burst_then_the_refill_rate():
+    clock = FakeClock()
+    limiter = market_data.TokenBucket(rate=2.0, capacity=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    limiter.acquire()
+    assert clock.sleeps == [0.5] and clock.now == 0.5
+
+    # An idle period refills the bucket only up to its capacity.
+    clock.now += 60
+    for _ in range(3):
+        limiter.acquire()
+    limiter.acquire()
+    assert clock.sleeps == [0.5, 0.5]
+
+def test_fetch_ranges_rate_limits_and_isolates_ticker_errors(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(market_data, "TokenBucket",
+                        functools.partial(market_data.TokenBucket, clock=clock, sleep=clock.sleep))
+    started = {}
+
+    def source(ticker, start=None, end=None):
+        started[ticker] = clock.now
+        if ticker == "BAD.NS":
+            raise ConnectionError("no data")
+        return pd.DataFrame({"Open": [1.0], "High": [1.0], "Low": [1.0], "Close": [1.0],
+                             "Volume": [10.0], "Dividends": [0.0]})
+
+    tickers = ["A.NS", "B.NS", "BAD.NS", "C.NS", "D.NS"]
+    requests = [(ticker, "2025-01-01", None) for ticker in tickers]
+    results = {request[0]: (df, error) for request, df, error in
+               market_data.fetch_ranges(requests, source, max_workers=1, rate=1.0, burst=2)}
+
+    # Two requests in the burst, then one per second.
+    assert [started[ticker] for ticker in tickers] == [0.0, 0.0, 1.0, 2.0, 3.0]
+    assert isinstance(results["BAD.NS"][1], ConnectionError) and results["BAD.NS"][0] is None
+    for ticker in ["A.NS", "B.NS", "C.NS", "D.NS"]:
+        df, error = results[ticker]
+        assert error is None and list(df.columns) == market_data.OHLCV_COLUMNS
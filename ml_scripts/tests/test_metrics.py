@@ -0,0 +1,109 @@
+# ml_scripts/tests/test_metrics.py
+import json
+
+import pytest
+
+import config
+import metrics
+import startup_profile
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "_histograms", {})
+    monkeypatch.setattr(metrics, "_counters", {})
+    monkeypatch.setattr(metrics, "_format", None)
+
+def _series(snapshot: dict, kind: str, name: str, **labels) -> dict:
+    return next(s for s in snapshot[kind] if s["name"] == name and s["labels"] == labels)
+
+def test_timed_and_inc_record_labelled_series():
+    @metrics.timed("work_seconds", stage="fit")
+    def work(fail):
+        if fail:
+            raise RuntimeError("boom")
+        return "done"
+
+    assert work(False) == "done"
+    with pytest.raises(RuntimeError):
+        work(True)  # timed as well
+    metrics.inc("failures_total", ticker="A.NS")
+    metrics.inc("failures_total", 2, ticker="A.NS")
+    metrics.inc("failures_total", ticker="B.NS")
+
+    snapshot = metrics.snapshot()
+    histogram = _series(snapshot, "histograms", "work_seconds", stage="fit")
+    assert histogram["count"] == 2 and histogram["buckets"]["+Inf"] == 2 and histogram["sum"] >= 0
+    assert _series(snapshot, "counters", "failures_total", ticker="A.NS")["value"] == 3
+    assert _series(snapshot, "counters", "failures_total", ticker="B.NS")["value"] == 1
+
+def test_json_and_prometheus_snapshots():
+    metrics.observe("db_write_seconds", 0.003)
+    metrics.observe("db_write_seconds", 20.0)
+    metrics.inc("ticker_failures_total", collector="daily", ticker='A"B')
+
+    histogram = json.loads(metrics.render("json"))["metrics"]["histograms"][0]
+    assert histogram["count"] == 2 and histogram["sum"] == pytest.approx(20.003)
+    assert (histogram["buckets"]["0.0025"], histogram["buckets"]["0.005"],
+            histogram["buckets"]["10.0"], histogram["buckets"]["30.0"], histogram["buckets"]["+Inf"]) == (0, 1, 1, 2, 2)
+
+    lines = metrics.render("prometheus").splitlines()
+    assert lines[:2] == ["# TYPE ticker_failures_total counter",
+                         'ticker_failures_total{collector="daily",ticker="A\\"B"} 1']
+    assert lines[2] == "# TYPE db_write_seconds histogram"
+    assert 'db_write_seconds_bucket{le="0.005"} 1' in lines
+    assert 'db_write_seconds_bucket{le="+Inf"} 2' in lines
+    assert lines[-2:] == [f"db_write_seconds_sum {20.003}", "db_write_seconds_count 2"]
+
+def test_emit_appends_json_and_replaces_prometheus_files(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "metrics.out"
+    monkeypatch.setattr(config, "METRICS_PATH", str(path))
+    metrics.inc("runs_total")
+
+    metrics.emit()  # export off
+    assert not path.exists()
+
+    assert metrics.enable_from_argv(["--all", "--metrics", "5"]) == ["--all", "5"]
+    metrics.emit()
+    metrics.emit()
+    assert [json.loads(line)["metrics"]["counters"][0]["value"] for line in path.read_text().splitlines()] == [1, 1]
+
+    metrics.enable_from_argv(["--metrics=prometheus"])
+    metrics.emit()
+    metrics.emit()
+    assert path.read_text() == "# TYPE runs_total counter\nruns_total 1\n"
+    assert capsys.readouterr().out == ""  # stdout carries the JSON results
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_startup_phases_are_exclusive_and_emitted_to_stderr(monkeypatch, capsys):
+    clock = FakeClock()
+    monkeypatch.setattr(startup_profile.time, "perf_counter", clock)
+    monkeypatch.setattr(startup_profile, "_phases", {})
+    monkeypatch.setattr(startup_profile, "_process_start", 0.0)
+    monkeypatch.setattr(startup_profile, "_enabled", False)
+
+    with startup_profile.phase("fetch"):
+        clock.now += 1.0
+        with startup_profile.phase("mongo_connect"):
+            clock.now += 0.25
+
+    def slow_items():
+        for item in (1, 2):
+            clock.now += 0.5
+            yield item
+    assert list(startup_profile.timed_iter("fetch", slow_items())) == [1, 2]
+
+    assert startup_profile.report() == {"fetch": 2000.0, "mongo_connect": 250.0, "total": 2250.0}
+    startup_profile.emit()
+    assert capsys.readouterr().err == ""
+
+    assert startup_profile.enable_from_argv(["A.NS", "--profile-startup"]) == ["A.NS"]
+    startup_profile.emit()
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert json.loads(captured.err)["startup_profile_ms"]["fetch"] == 2000.0
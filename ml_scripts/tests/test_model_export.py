@@ -0,0 +1,25 @@
+# ml_scripts/tests/test_model_export.py
+import pytest
+
+import config
+import model_export
+import model_loader
+from numpy_gru import NumpyGRUModel
+
+def test_numpy_gru_matches_keras(tmp_path):
+    keras = pytest.importorskip("tensorflow").keras
+    keras.utils.set_random_seed(0)
+    model = keras.Sequential([
+        keras.Input((config.LOOKBACK_PERIOD, len(config.FEATURES_TO_USE))),
+        keras.layers.GRU(8, return_sequences=True),
+        keras.layers.Dropout(0.2),
+        keras.layers.GRU(4),
+        keras.layers.Dense(1),
+    ])
+    model_path, numpy_path = str(tmp_path / "model.h5"), str(tmp_path / "model.npz")
+    model.save(model_path)
+
+    model_export.export_numpy_model(model_path, numpy_path)
+    assert NumpyGRUModel.load(numpy_path).source_sha256 == model_loader.file_sha256(model_path)
+    parity = model_export.verify_numpy_model(model_path, numpy_path, n_samples=32)
+    assert parity["max_abs_diff"] <= config.NUMPY_MODEL_TOLERANCE, parity
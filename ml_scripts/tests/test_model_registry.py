@@ -0,0 +1,33 @@
+# ml_scripts/tests/test_model_registry.py
+import json
+import os
+
+import model_registry
+
+def _registry_dir(root, versions):
+    for i, version in enumerate(versions):
+        os.makedirs(root / version)
+        with open(root / version / model_registry.MANIFEST_FILE, "w") as f:
+            json.dump({"version": version, "created_at": f"2025-01-0{i + 1}T00:00:00"}, f)
+
+def test_one_shot_registry_loads_only_the_requested_version(tmp_path, monkeypatch):
+    _registry_dir(tmp_path, ["v1", "v2", "v3"])
+    with open(tmp_path / model_registry.POINTER_FILE, "w") as f:
+        json.dump({"active": "v2", "shadow": ["v3"]}, f)
+    loaded = []
+
+    def load_bundle(path):
+        loaded.append(os.path.basename(path))
+        return model_registry.ModelBundle(os.path.basename(path), model=None, scalers={})
+    monkeypatch.setattr(model_registry, "load_bundle", load_bundle)
+
+    registry = model_registry.ModelRegistry(str(tmp_path))
+    assert registry.get().version == "v2" and loaded == ["v2"]
+    assert registry.get().version == "v2" and loaded == ["v2"]
+    assert registry.get("v1").version == "v1" and loaded == ["v2", "v1"]
+    assert registry.shadows() == []
+
+    # The server refreshes: every version, with the pointer's shadows.
+    registry.refresh()
+    assert sorted(loaded) == ["v1", "v1", "v2", "v2", "v3"]
+    assert registry.get().version == "v2" and [b.version for b in registry.shadows()] == ["v3"]
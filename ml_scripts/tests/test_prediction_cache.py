@@ -0,0 +1,71 @@
+# ml_scripts/tests/test_prediction_cache.py
+
+import pytest
+
+import config
+import db_handler
+import prediction_cache
+from synthetic_data import feature_records
+
+def test_revised_bar_misses_another_process_lru(prediction_assets, collection, monkeypatch):
+    ticker = config.TICKERS[0]
+    first = prediction_assets.generate_single_prediction(ticker)
+    assert first["status"] == "success"
+    assert prediction_assets.generate_single_prediction(ticker) == first
+
+    # The collector revises today's bar from another process: this process's LRU
+    # and the persistent tier are not invalidated.
+    monkeypatch.setattr(prediction_cache, "invalidate_tickers", lambda db, tickers: None)
+    last = feature_records(ticker)[-1]
+    db_handler.save_data_to_db(collection, [{**last, "Close": last["Close"] * 1.1}])
+
+    revised = prediction_assets.generate_single_prediction(ticker)
+    assert revised["data_used"]["end_point"]["date"] == first["data_used"]["end_point"]["date"]
+    assert revised["predicted_price"] != first["predicted_price"]
+
+def test_batch_uses_revisions_too(prediction_assets, collection, monkeypatch):
+    tickers = config.TICKERS[:3]
+    first = prediction_assets.generate_batch_predictions(tickers)
+    assert [result["status"] for result in first] == ["success"] * 3
+
+    monkeypatch.setattr(prediction_cache, "invalidate_tickers", lambda db, tickers: None)
+    last = feature_records(tickers[1], seed=1)[-1]
+    db_handler.save_data_to_db(collection, [{**last, "Close": last["Close"] * 1.1}])
+
+    revised = prediction_assets.generate_batch_predictions(tickers)
+    assert revised[0] == first[0] and revised[2] == first[2]
+    assert revised[1]["predicted_price"] != first[1]["predicted_price"]
+
+def test_same_date_revision_misses_the_cache_and_the_materialized_window(prediction_assets, collection, monkeypatch):
+    import scaled_windows
+
+    ticker = config.TICKERS[0]
+    registry, _ = prediction_assets._assets
+    bundle = registry.get()
+    monkeypatch.setattr(bundle, "scalers_fingerprint", "test")
+    scaled_windows.refresh(collection, [ticker], bundle.scalers, "test")
+    first = prediction_assets.generate_single_prediction(ticker)
+    assert prediction_assets.generate_single_prediction(ticker) == first
+
+    last = feature_records(ticker)[-1]
+    db_handler.save_data_to_db(collection, [{**last, "Close": last["Close"] * 1.1}])
+
+    revised = prediction_assets.generate_single_prediction(ticker)
+    assert revised["data_used"]["end_point"]["price"] == round(last["Close"] * 1.1, 2)
+    assert revised["predicted_price"] != first["predicted_price"]
+
+def test_revisions_come_from_revision_documents(collection, monkeypatch):
+    tickers = config.TICKERS[:2]
+    # Stored before revisions were recorded: seeded once on the first read.
+    collection.insert_many(feature_records(tickers[0], days=30))
+    monkeypatch.setattr(collection, "aggregate", lambda *args, **kwargs: pytest.fail("history scan"))
+    revisions = db_handler.fetch_data_revisions(collection, tickers)
+    assert list(revisions) == [tickers[0]]
+    assert revisions[tickers[0]][0] == feature_records(tickers[0], days=30)[-1]["Date"]
+    assert db_handler.fetch_data_revisions(collection, tickers) == revisions
+
+    # A backfill of older bars changes the revision but not the latest Date.
+    older = feature_records(tickers[0], days=60)[:30]
+    db_handler.save_data_to_db(collection, older)
+    date, revision = db_handler.fetch_data_revisions(collection, tickers)[tickers[0]]
+    assert date == revisions[tickers[0]][0] and revision != revisions[tickers[0]][1]
@@ -0,0 +1,15 @@
+# ml_scripts/tests/test_prediction_handler.py
+import config
+import db_handler
+
+def test_ticker_written_after_the_revisions_read_is_a_per_ticker_error(prediction_assets, monkeypatch):
+    tickers = config.TICKERS[:3]
+    # The revisions are read before tickers[2]'s first bars land; its window query would find them.
+    fetch_data_revisions = db_handler.fetch_data_revisions
+    monkeypatch.setattr(db_handler, "fetch_data_revisions", lambda collection, names: {
+        ticker: revision for ticker, revision in fetch_data_revisions(collection, names).items()
+        if ticker != tickers[2]})
+
+    results = prediction_assets.generate_batch_predictions(tickers)
+    assert [result["status"] for result in results] == ["success", "success", "error"]
+    assert results[2]["ticker"] == tickers[2] and "found 0" in results[2]["message"]
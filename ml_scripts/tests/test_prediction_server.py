@@ -0,0 +1,23 @@
+# ml_scripts/tests/test_prediction_server.py
+import socket
+
+import pytest
+
+import prediction_server
+
+def test_no_server_is_unavailable():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    with pytest.raises(prediction_server.ServerUnavailable):
+        prediction_server.request_prediction({"command": "ping"}, port=port, timeout=1.0)
+
+def test_read_timeout_is_not_unavailable():
+    # A server that accepts the connection but never answers.
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        with pytest.raises(OSError) as raised:
+            prediction_server.request_prediction({"command": "ping"}, port=listener.getsockname()[1], timeout=0.2)
+    assert isinstance(raised.value, socket.timeout)
+    assert not isinstance(raised.value, prediction_server.ServerUnavailable)
@@ -0,0 +1,45 @@
+# ml_scripts/tests/test_scaled_windows.py
+import pytest
+
+import config
+import db_handler
+import prediction_cache
+import scaled_windows
+from synthetic_data import feature_records
+
+def predict(prediction_assets, ticker, mode):
+    if mode == "single":
+        return prediction_assets.generate_single_prediction(ticker)
+    return prediction_assets.generate_batch_predictions([ticker])[0]
+
+@pytest.mark.parametrize("mode", ["single", "batch"])
+def test_revised_bar_is_not_served_from_a_stale_window(prediction_assets, collection, monkeypatch, mode):
+    # No prediction cache: every call goes through the window lookup.
+    monkeypatch.setattr(prediction_cache, "get", lambda *args: None)
+    ticker = config.TICKERS[0]
+    registry, _ = prediction_assets._assets
+    bundle = registry.get()
+    monkeypatch.setattr(bundle, "scalers_fingerprint", "test")
+    windows = collection.database[config.SCALED_WINDOW_COLLECTION]
+
+    assert scaled_windows.refresh(collection, [ticker], bundle.scalers, "test") == 1
+    stale = windows.find_one({"_id": ticker})
+    first = predict(prediction_assets, ticker, mode)
+
+    last = feature_records(ticker)[-1]
+    revised_close = last["Close"] * 1.1
+    db_handler.save_data_to_db(collection, [{**last, "Close": revised_close}])
+    assert windows.find_one({"_id": ticker}) is None  # dropped by the write
+
+    # The pre-revision window is back (e.g. a refresh that read the rows before the write):
+    # its revision no longer matches, so the full path reads the revised bar.
+    windows.replace_one({"_id": ticker}, stale, upsert=True)
+    revised = predict(prediction_assets, ticker, mode)
+    assert revised["data_used"]["end_point"]["date"] == first["data_used"]["end_point"]["date"]
+    assert revised["predicted_price"] == round(revised_close, 2) != first["predicted_price"]
+
+    # After the collector's refresh the materialized window serves the revised bar.
+    assert scaled_windows.refresh(collection, [ticker], bundle.scalers, "test") == 1
+    monkeypatch.setattr(db_handler, "fetch_window_arrays", lambda *args, **kwargs: pytest.fail("full path"))
+    monkeypatch.setattr(db_handler, "fetch_windows_from_db", lambda *args, **kwargs: pytest.fail("full path"))
+    assert predict(prediction_assets, ticker, mode) == revised
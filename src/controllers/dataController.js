@@ -3,93 +3,247 @@ import { ApiError } from "../utils/ApiError.js";
 import { ApiResponse } from "../utils/ApiResponse.js";
 import { asyncHandler } from "../utils/asyncHandler.js";
 import { spawn } from "child_process";
+import net from "net";
 import path from "path";
 
-export const triggerDataCollection = asyncHandler(async (req, res) => {
-    console.log("✅ Request reached triggerDataCollection controller");
+const COLLECTION_TIMEOUT_MS = 300000; // 5 minutes
+const STDERR_TAIL_LINES = 20;
+
+// collector_daemon.py (config.COLLECTOR_DAEMON_HOST/PORT), used when it is running.
+const DAEMON_HOST = process.env.COLLECTOR_DAEMON_HOST || "127.0.0.1";
+const DAEMON_PORT = Number(process.env.COLLECTOR_DAEMON_PORT || 8766);
+
+// Sends one JSON-lines request to the collector daemon and calls onLine for every
+// response line until onLine returns true. Resolves to false when no daemon is
+// listening (the caller falls back), true once the exchange is complete.
+const requestDaemon = (request, { onLine, timeoutMs, onTimeout }) => {
+    return new Promise((resolve, reject) => {
+        const socket = net.createConnection({ host: DAEMON_HOST, port: DAEMON_PORT });
+        let connected = false;
+        let finished = false;
+        let pending = "";
+
+        const finish = (settle) => {
+            if (finished) return;
+            finished = true;
+            clearTimeout(timeout);
+            socket.destroy();
+            settle();
+        };
+
+        const timeout = setTimeout(() => finish(() => {
+            onTimeout();
+            resolve(true);
+        }), timeoutMs);
+
+        socket.on("connect", () => {
+            connected = true;
+            socket.write(JSON.stringify(request) + "\n");
+        });
 
-    const runPythonScript = () => {
-        return new Promise((resolve, reject) => {
-            const scriptPath = path.resolve("ml_scripts", "daily_collector.py");
-            console.log(`📂 Resolved Python script path: ${scriptPath}`);
-
-            const pythonProcess = spawn("python3", [scriptPath]);
-
-            let stdoutOutput = "";
-            let stderrOutput = "";
-
-            console.log("🐍 Python script started...");
-
-            // Timeout (5 minutes)
-            const timeout = setTimeout(() => {
-                console.error("⏳ Python script timed out, killing process...");
-                pythonProcess.kill();
-                reject(
-                    new ApiError(
-                        500,
-                        "Data collection script timed out after 5 minutes."
-                    )
-                );
-            }, 300000);
-
-            // STDOUT
-            pythonProcess.stdout.on("data", (data) => {
-                const msg = data.toString();
-                console.log("📢 Python STDOUT:", msg.trim());
-                stdoutOutput += msg;
-            });
-
-            // STDERR
-            pythonProcess.stderr.on("data", (data) => {
-                const errMsg = data.toString();
-                console.error("⚠️ Python STDERR:", errMsg.trim());
-                stderrOutput += errMsg;
-            });
-
-            // Process closed
-            pythonProcess.on("close", (code) => {
-                clearTimeout(timeout);
-                console.log(`🚪 Python process closed with exit code: ${code}`);
-
-                if (code !== 0) {
-                    const errorMessage = `Data collection script failed with exit code ${code}. \nError: ${stderrOutput}`;
-                    return reject(new ApiError(500, errorMessage));
+        socket.on("data", (data) => {
+            const lines = (pending + data.toString()).split("\n");
+            pending = lines.pop();
+            for (const line of lines) {
+                if (!line.trim() || finished) continue;
+                try {
+                    if (onLine(JSON.parse(line))) return finish(() => resolve(true));
+                } catch (err) {
+                    return finish(() => reject(err));
                 }
+            }
+        });
 
-                if (stderrOutput) {
-                    console.warn(
-                        "⚠️ Python script produced warnings (stderr):",
-                        stderrOutput
-                    );
+        socket.on("error", (err) => finish(() => {
+            if (!connected) return resolve(false);
+            reject(new ApiError(500, `Collector daemon connection failed: ${err.message}`));
+        }));
+
+        socket.on("close", () => finish(() =>
+            reject(new ApiError(500, "Collector daemon closed the connection before the run finished."))
+        ));
+    });
+};
+
+// Asks the warm collector daemon for a run and streams its events. Triggers that
+// arrive while a run is in progress join it. On timeout the run keeps going in the
+// daemon; only the wait is abandoned. Resolves to null when no daemon is running.
+const runCollectorViaDaemon = async ({ resume, onEvent }) => {
+    let timedOut = false;
+    const reached = await requestDaemon(
+        { command: "trigger", resume, stream: true },
+        {
+            timeoutMs: COLLECTION_TIMEOUT_MS,
+            onTimeout: () => { timedOut = true; },
+            onLine: (event) => {
+                if (event.type !== "run") {
+                    onEvent(event);
+                    return false;
+                }
+                if (event.status === "error") {
+                    throw new ApiError(500, `Data collection failed: ${event.run.error}`);
                 }
+                console.log(`✅ Collector daemon run ${event.run.id} finished${event.started ? "" : " (joined a run in progress)"}.`);
+                // e.g. a full collection was asked for but a resumed run was joined
+                if (event.message) onEvent({ type: "notice", message: event.message });
+                return true;
+            },
+        }
+    );
+    return reached ? { timedOut } : null;
+};
+
+// Runs daily_collector.py in --jsonl mode and calls onEvent for every JSON line
+// (one per ticker as it finishes, then a summary). Completed tickers are
+// checkpointed by the collector, so a run cut short by the timeout can be
+// resumed by triggering the collection again with --resume.
+const spawnCollector = ({ resume, onEvent }) => {
+    return new Promise((resolve, reject) => {
+        const scriptPath = path.resolve("ml_scripts", "daily_collector.py");
+        console.log(`📂 Resolved Python script path: ${scriptPath}`);
+
+        const scriptArgs = ["--jsonl"];
+        if (resume) scriptArgs.push("--resume");
+        const pythonProcess = spawn("python3", [scriptPath, ...scriptArgs]);
+
+        let pending = ""; // incomplete trailing stdout line
+        const stderrTail = [];
+        let timedOut = false;
+
+        console.log("🐍 Python script started...");
+
+        // Timeout: stop the run but keep what was reported so far.
+        const timeout = setTimeout(() => {
+            console.error("⏳ Python script timed out, killing process...");
+            timedOut = true;
+            pythonProcess.kill();
+        }, COLLECTION_TIMEOUT_MS);
+
+        // STDOUT: JSON lines, parsed as soon as each line is complete
+        pythonProcess.stdout.on("data", (data) => {
+            const lines = (pending + data.toString()).split("\n");
+            pending = lines.pop();
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                try {
+                    onEvent(JSON.parse(line));
+                } catch (err) {
+                    console.warn("⚠️ Unparseable collector line:", line);
+                }
+            }
+        });
 
-                console.log("✅ Python script finished successfully.");
-                resolve(stdoutOutput);
-            });
-
-            // Process error
-            pythonProcess.on("error", (err) => {
-                clearTimeout(timeout);
-                console.error("❌ Failed to start Python script:", err.message);
-                reject(
-                    new ApiError(
-                        500,
-                        `Failed to start Python script: ${err.message}`
-                    )
-                );
-            });
+        // STDERR: the human-readable log; only the last lines are kept for error reports
+        pythonProcess.stderr.on("data", (data) => {
+            for (const line of data.toString().split("\n")) {
+                if (!line.trim()) continue;
+                console.log("📢 Python:", line);
+                stderrTail.push(line);
+                if (stderrTail.length > STDERR_TAIL_LINES) stderrTail.shift();
+            }
         });
-    };
+
+        // Process closed
+        pythonProcess.on("close", (code) => {
+            clearTimeout(timeout);
+            console.log(`🚪 Python process closed with exit code: ${code}`);
+
+            if (code !== 0 && !timedOut) {
+                const errorMessage = `Data collection script failed with exit code ${code}. \nError: ${stderrTail.join("\n")}`;
+                return reject(new ApiError(500, errorMessage));
+            }
+
+            console.log("✅ Python script finished.");
+            resolve({ timedOut });
+        });
+
+        // Process error
+        pythonProcess.on("error", (err) => {
+            clearTimeout(timeout);
+            console.error("❌ Failed to start Python script:", err.message);
+            reject(
+                new ApiError(
+                    500,
+                    `Failed to start Python script: ${err.message}`
+                )
+            );
+        });
+    });
+};
+
+// The daemon when it is running, else a one-off daily_collector.py process.
+const runCollector = async (options) => {
+    const result = await runCollectorViaDaemon(options);
+    if (result) return result;
+    console.log("ℹ️ Collector daemon not running, spawning daily_collector.py");
+    return spawnCollector(options);
+};
+
+// POST /collect            -> one JSON response with per-ticker results and the summary
+// POST /collect?stream=1   -> NDJSON: collector events are forwarded as they happen
+// ?resume=1 continues today's last run if it was cut short (timeout, crash), skipping
+// the tickers it completed; otherwise every trigger collects every ticker.
+export const triggerDataCollection = asyncHandler(async (req, res) => {
+    console.log("✅ Request reached triggerDataCollection controller");
+
+    const resume = req.query.resume === "1" || req.query.resume === "true";
+    const stream = req.query.stream === "1" || req.query.stream === "true";
 
     console.log("➡️ Triggering Python script execution...");
-    const scriptOutput = await runPythonScript();
+
+    if (stream) {
+        res.status(200).set("Content-Type", "application/x-ndjson");
+        const write = (event) => res.write(JSON.stringify(event) + "\n");
+        try {
+            const { timedOut } = await runCollector({ resume, onEvent: write });
+            if (timedOut) {
+                write({ type: "timeout", message: "Data collection timed out after 5 minutes; trigger again with ?resume=1 to continue it." });
+            }
+        } catch (err) {
+            write({ type: "error", message: err.message });
+        }
+        return res.end();
+    }
+
+    const results = [];
+    let summary = null;
+    const { timedOut } = await runCollector({
+        resume,
+        onEvent: (event) => {
+            if (event.type === "summary") summary = event;
+            else results.push(event);
+        },
+    });
 
     console.log("📦 Sending response back to client...");
     return res.status(200).json(
         new ApiResponse(
             200,
-            { log: scriptOutput },
-            "Data collection process finished successfully."
+            { summary, results, complete: !timedOut },
+            timedOut
+                ? "Data collection timed out after 5 minutes; trigger again with ?resume=1 to continue it."
+                : "Data collection process finished successfully."
         )
     );
 });
+
+// GET /collect/status -> the collector daemon's current run, last run with its
+// timings and the next scheduled (trading-day) collection.
+export const getCollectionStatus = asyncHandler(async (req, res) => {
+    let status = null;
+    const reached = await requestDaemon(
+        { command: "status" },
+        {
+            timeoutMs: 10000,
+            onTimeout: () => {},
+            onLine: (line) => { status = line; return true; },
+        }
+    );
+    if (!reached) {
+        throw new ApiError(503, "Collector daemon is not running (python ml_scripts/collector_daemon.py).");
+    }
+    if (!status) {
+        throw new ApiError(504, "Collector daemon did not answer the status request in time.");
+    }
+    return res.status(200).json(new ApiResponse(200, status, "Collector daemon status."));
+});
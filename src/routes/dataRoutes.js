@@ -1,9 +1,10 @@
 import { Router } from "express";
-import {triggerDataCollection} from '../controllers/dataController.js';
+import {triggerDataCollection, getCollectionStatus} from '../controllers/dataController.js';
 
 
 const router = Router();
 
 router.route('/collect').post(triggerDataCollection);
+router.route('/collect/status').get(getCollectionStatus);
 
 export default router;
\ No newline at end of file